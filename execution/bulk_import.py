@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from postgrest.exceptions import APIError
+
+from execution.supabase_client import get_async_client, run_sync
+from execution.workflow_core import CLIENT_FIELDS, PROJECT_FIELDS, PROJECT_STATUSES
+
+# Bulk creation of clients and projects (CRM imports). Rows are validated one
+# by one as they arrive, then written in multi-row inserts of IMPORT_BATCH_SIZE,
+# up to IMPORT_CONCURRENCY chunks at a time. A bad row is reported in the
+# results instead of failing the request.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_CONCURRENCY = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+# Rows per request; larger imports are split by the caller
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "50000"))
+
+# Idempotency: a row's import_key (the caller's id for it, e.g. the CRM record
+# id) determines its primary key, the way seed_data derives its ids. A retried
+# import re-sends the same keys, and the rows already written are reported as
+# "existing" instead of being duplicated.
+IMPORT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "import.projexnest")
+
+# Columns a caller may set, per table (everything else is server-managed)
+WRITABLE = {
+    "clients": tuple(f for f in CLIENT_FIELDS if f not in ("id", "org_id", "created_at")),
+    "projects": tuple(f for f in PROJECT_FIELDS if f not in ("id", "org_id", "created_at")),
+}
+
+
+class ImportTooLarge(ValueError):
+    pass
+
+
+class InvalidLine:
+    """An NDJSON line that didn't parse; reported as that row's error."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def import_id(org_id: str, table: str, import_key: str) -> str:
+    """The id a row imported with `import_key` gets (stable across retries)."""
+    return str(uuid.uuid5(IMPORT_NAMESPACE, f"{org_id}:{table}:{import_key}"))
+
+
+# --- Validation ---
+
+def _is_uuid(value: Any) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _validate(table: str, org_id: str, row: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Returns (record to insert, None) or (None, error)."""
+    if isinstance(row, InvalidLine):
+        return None, row.error
+    if not isinstance(row, dict):
+        return None, "row must be an object"
+    row = dict(row)
+    import_key = row.pop("import_key", None)
+    client_import_key = row.pop("client_import_key", None) if table == "projects" else None
+    unknown = sorted(set(row) - set(WRITABLE[table]))
+    if unknown:
+        return None, f"unknown fields: {', '.join(unknown)}"
+    if not isinstance(row.get("name"), str) or not row["name"].strip():
+        return None, "name is required"
+    for column, value in row.items():
+        if value is not None and not isinstance(value, str):
+            return None, f"{column} must be a string"
+    if import_key is not None and (not isinstance(import_key, str) or not import_key):
+        return None, "import_key must be a non-empty string"
+
+    if table == "projects":
+        status = row.setdefault("status", "lead")
+        if status not in PROJECT_STATUSES:
+            return None, f"status must be one of: {', '.join(PROJECT_STATUSES)}"
+        if client_import_key is not None:
+            if row.get("client_id"):
+                return None, "give client_id or client_import_key, not both"
+            # Links to a client imported (now or earlier) with that key
+            row["client_id"] = import_id(org_id, "clients", str(client_import_key))
+        elif row.get("client_id") and not _is_uuid(row["client_id"]):
+            return None, "client_id must be a uuid"
+
+    row["org_id"] = org_id
+    row["id"] = import_id(org_id, table, import_key) if import_key else str(uuid.uuid4())
+    return row, None
+
+
+# --- Writing ---
+
+async def _insert(table: str, records: List[Dict[str, Any]]) -> List[str]:
+    """Inserts records, skipping ids that already exist; returns the ids inserted."""
+    response = await get_async_client().table(table).upsert(
+        records, on_conflict="id", ignore_duplicates=True
+    ).execute()
+    return [row["id"] for row in response.data or []]
+
+
+async def _write_chunk(table: str, chunk: List[Tuple[int, Dict[str, Any]]], results: List[Dict[str, Any]]) -> None:
+    records = [record for _, record in chunk]
+    try:
+        try:
+            created = set(await _insert(table, records))
+            outcomes = {record["id"]: None for record in records}
+        except APIError:
+            # The database refused the statement (e.g. an unknown client_id);
+            # retry row by row so only the offending rows fail
+            created, outcomes = set(), {}
+            for record in records:
+                try:
+                    created.update(await _insert(table, [record]))
+                    outcomes[record["id"]] = None
+                except APIError as e:
+                    outcomes[record["id"]] = e.message or str(e)
+    except Exception as e:
+        print(f"Error importing {len(chunk)} {table}: {e}")
+        created, outcomes = set(), {record["id"]: str(e) for record in records}
+
+    for index, record in chunk:
+        error = outcomes[record["id"]]
+        if error:
+            results.append({"index": index, "status": "error", "error": error})
+        else:
+            results.append({"index": index, "id": record["id"], "status": "created" if record["id"] in created else "existing"})
+
+
+async def _aiter(rows: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+async def bulk_create_async(table: str, org_id: str, rows: Union[Iterable[Any], AsyncIterable[Any]]) -> Dict[str, Any]:
+    """
+    Creates many clients or projects for an org. `rows` may be a list or an
+    async iterator (an NDJSON upload is written while it is still arriving).
+    Each row is a client/project body plus an optional import_key (and, for
+    projects, client_import_key to link to an imported client).
+
+    Returns {"created", "existing", "failed", "results"}; results has one
+    entry per row, in input order: {"index", "id", "status"} or
+    {"index", "status": "error", "error"}.
+    """
+    if table not in WRITABLE:
+        raise ValueError(f"bulk import is not supported for {table}")
+    results: List[Dict[str, Any]] = []
+    seen_keys = set()
+    chunk: List[Tuple[int, Dict[str, Any]]] = []
+    pending: set = set()
+    slots = asyncio.Semaphore(IMPORT_CONCURRENCY)
+
+    async def write(batch):
+        try:
+            await _write_chunk(table, batch, results)
+        finally:
+            slots.release()
+
+    async def submit(batch):
+        # Waits for a free slot before reading more input, so a large upload
+        # is never buffered faster than it can be written
+        await slots.acquire()
+        task = asyncio.create_task(write(batch))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    try:
+        async for index, row in _enumerate(_aiter(rows)):
+            if index >= IMPORT_MAX_ROWS:
+                raise ImportTooLarge(f"at most {IMPORT_MAX_ROWS} rows per request")
+            record, error = _validate(table, org_id, row)
+            if record and record["id"] in seen_keys:
+                record, error = None, "duplicate import_key in this request"
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            seen_keys.add(record["id"])
+            chunk.append((index, record))
+            if len(chunk) >= IMPORT_BATCH_SIZE:
+                await submit(chunk)
+                chunk = []
+        if chunk:
+            await submit(chunk)
+        await asyncio.gather(*pending)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+
+    results.sort(key=lambda r: r["index"])
+    return {
+        "created": sum(r["status"] == "created" for r in results),
+        "existing": sum(r["status"] == "existing" for r in results),
+        "failed": sum(r["status"] == "error" for r in results),
+        "results": results,
+    }
+
+
+async def _enumerate(rows: AsyncIterator[Any]) -> AsyncIterator[Tuple[int, Any]]:
+    index = 0
+    async for row in rows:
+        yield index, row
+        index += 1
+
+
+async def parse_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """Rows of an NDJSON byte stream; a line that isn't JSON yields an InvalidLine."""
+    buffer = b""
+    async for data in chunks:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return InvalidLine(f"invalid JSON: {e}")
+
+
+def bulk_create(table: str, org_id: str, rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    return run_sync(bulk_create_async(table, org_id, rows))
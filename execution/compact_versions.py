@@ -0,0 +1,53 @@
+import argparse
+import os
+from execution.supabase_client import get_client
+
+BATCH_SIZE = 200
+
+def iter_proposal_ids(org_id: str = None):
+    """Yields proposal ids in id order, one page at a time."""
+    last_id = None
+    while True:
+        query = get_client().table("proposals").select("id").order("id").limit(BATCH_SIZE)
+        if org_id:
+            query = query.eq("org_id", org_id)
+        if last_id:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        for row in rows:
+            yield row["id"]
+        if len(rows) < BATCH_SIZE:
+            return
+        last_id = rows[-1]["id"]
+
+def compact(org_id: str = None, proposal_id: str = None, interval: int = 20):
+    """
+    Converts existing full-copy proposal versions into snapshots every
+    `interval` versions plus deltas (compact_proposal_versions in schema.sql).
+    Safe to re-run; each proposal is rewritten in its own transaction.
+    """
+    ids = [proposal_id] if proposal_id else iter_proposal_ids(org_id)
+    proposals = converted = 0
+    for pid in ids:
+        try:
+            resp = get_client().rpc("compact_proposal_versions", {
+                "proposal_id_input": pid,
+                "snapshot_interval_input": interval
+            }).execute()
+            converted += resp.data or 0
+        except Exception as e:
+            print(f"Error compacting proposal {pid}: {e}")
+        proposals += 1
+        if proposals % 100 == 0:
+            print(f"{proposals} proposals, {converted} versions converted to deltas")
+    print(f"Done: {proposals} proposals, {converted} versions converted to deltas")
+    return converted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact proposal versions into snapshots + deltas")
+    parser.add_argument("--org-id", help="Only compact this org's proposals")
+    parser.add_argument("--proposal-id", help="Only compact this proposal")
+    parser.add_argument("--interval", type=int, default=int(os.getenv("PROPOSAL_SNAPSHOT_INTERVAL", "20")),
+                        help="Store every Nth version in full (default: PROPOSAL_SNAPSHOT_INTERVAL or 20)")
+    args = parser.parse_args()
+    compact(args.org_id, args.proposal_id, args.interval)
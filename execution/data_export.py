@@ -0,0 +1,128 @@
+import asyncio
+import csv
+import datetime
+import io
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from execution.pagination import InvalidQuery
+from execution.supabase_client import get_async_client
+from execution.workflow_core import CLIENT_FIELDS, PROJECT_FIELDS
+from execution.workflow_proposals import PROPOSAL_FIELDS
+
+# Full and incremental dumps of an org's data (backups, BI). Rows are read in
+# keyset-paginated pages, oldest change first, and streamed out page by page
+# with the next page already being fetched, so memory stays at about two
+# pages whatever the table size.
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000")) # PostgREST caps responses at db-max-rows (1000 on Supabase)
+EXPORT_RETRIES = 2
+
+VERSION_EXPORT_FIELDS = (
+    "id", "org_id", "proposal_id", "version_number", "storage_kind", "content_json", "delta_json",
+    "content_hash", "pinned", "pdf_file_id", "created_by", "created_at",
+)
+
+# dataset -> (table, columns, change column). `since` and the page order use
+# the change column: proposals are edited in place, the rest only inserted.
+# Versions are exported as stored: delta rows carry delta_json, not content.
+DATASETS: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    "clients": ("clients", CLIENT_FIELDS, "created_at"),
+    "projects": ("projects", PROJECT_FIELDS, "created_at"),
+    "proposals": ("proposals", PROPOSAL_FIELDS, "updated_at"),
+    "versions": ("proposal_versions", VERSION_EXPORT_FIELDS, "created_at"),
+}
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _parse_since(since: Optional[str]) -> Optional[str]:
+    if not since:
+        return None
+    try:
+        when = datetime.datetime.fromisoformat(since)
+    except ValueError:
+        raise InvalidQuery("since must be an ISO 8601 timestamp")
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return when.isoformat()
+
+
+async def _fetch_page(table: str, columns: Tuple[str, ...], change_column: str, org_id: str,
+                      since: Optional[str], after: Optional[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    query = get_async_client().table(table).select(", ".join(columns)).eq("org_id", org_id)
+    if since:
+        query = query.gte(change_column, since)
+    if after:
+        changed_at, row_id = after
+        query = query.or_(f'{change_column}.gt."{changed_at}",and({change_column}.eq."{changed_at}",id.gt."{row_id}")')
+    query = query.order(change_column).order("id").limit(EXPORT_PAGE_SIZE)
+
+    for attempt in range(EXPORT_RETRIES + 1):
+        try:
+            return (await query.execute()).data or []
+        except Exception as e:
+            # A dump can run for minutes; don't cut it on one failed page
+            if attempt == EXPORT_RETRIES:
+                raise
+            print(f"Error exporting {table} page, retrying: {e}")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+
+async def iter_rows_async(dataset: str, org_id: str, since: Optional[str] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yields the dataset's rows for an org one page at a time, oldest change first."""
+    table, columns, change_column = DATASETS[dataset]
+    page = await _fetch_page(table, columns, change_column, org_id, since, None)
+    while page:
+        following = None
+        if len(page) == EXPORT_PAGE_SIZE:
+            last = page[-1]
+            following = asyncio.ensure_future(
+                _fetch_page(table, columns, change_column, org_id, since, (last[change_column], last["id"]))
+            )
+        try:
+            yield page
+        except BaseException:
+            if following:
+                following.cancel()
+            raise
+        page = await following if following else []
+
+
+def _csv_cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+
+async def _encode(pages: AsyncIterator[List[Dict[str, Any]]], columns: Tuple[str, ...], fmt: str) -> AsyncIterator[bytes]:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue().encode("utf-8")
+        async for page in pages:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_csv_cell(row.get(column)) for column in columns] for row in page)
+            yield buffer.getvalue().encode("utf-8")
+    else:
+        async for page in pages:
+            yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in page).encode("utf-8")
+
+
+def stream_export(dataset: str, org_id: str, fmt: str = "ndjson", since: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Validates the request (raising InvalidQuery) and returns the encoded
+    byte stream. With `since`, only rows created (proposals: updated) at or
+    after it are exported; the next incremental run passes the newest
+    created_at/updated_at it received. Boundary rows come again rather than
+    being missed, so consumers should upsert by id.
+    """
+    if dataset not in DATASETS:
+        raise InvalidQuery(f"Unknown export: {dataset} (one of {', '.join(DATASETS)})")
+    if fmt not in FORMATS:
+        raise InvalidQuery(f"format must be one of {', '.join(FORMATS)}")
+    columns = DATASETS[dataset][1]
+    return _encode(iter_rows_async(dataset, org_id, _parse_since(since)), columns, fmt)
@@ -0,0 +1,327 @@
+import asyncio
+import atexit
+import datetime
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from prometheus_client import Counter, Gauge
+
+from execution.supabase_client import get_client
+
+# Event log (public.events). emit() never waits on the database: events are
+# queued in memory, appended to an on-disk spool and written by a background
+# thread in multi-row inserts, every EVENTS_FLUSH_INTERVAL_SECONDS or as soon
+# as EVENTS_BATCH_SIZE are waiting. Event ids are generated here, so inserts
+# are idempotent and a spool left by a crashed worker is replayed by the next
+# one to start (per gunicorn worker; point EVENTS_SPOOL_DIR at durable disk).
+EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "200"))
+EVENTS_FLUSH_INTERVAL_SECONDS = float(os.getenv("EVENTS_FLUSH_INTERVAL_SECONDS", "2"))
+# Events held in memory (waiting plus being written); beyond it, emit() drops
+# the event, or with EVENTS_FULL_POLICY=block waits up to EVENTS_BLOCK_SECONDS.
+# emit() is called from async handlers too: on an event loop thread it never
+# waits (that would stall every request on the loop) and drops instead
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "10000"))
+EVENTS_FULL_POLICY = os.getenv("EVENTS_FULL_POLICY", "drop")
+EVENTS_BLOCK_SECONDS = float(os.getenv("EVENTS_BLOCK_SECONDS", "0.1"))
+SPOOL_DIR = os.getenv("EVENTS_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "projexnest_events"))
+
+MAX_RETRY_DELAY_SECONDS = 30
+
+EVENTS = Counter("projexnest_events", "Event log activity", ["outcome"])
+QUEUED = Gauge("projexnest_events_queued", "Events held in memory", multiprocess_mode="livesum")
+
+_SEGMENT = re.compile(r"^events-(\d+)-(\d+)\.ndjson$")
+
+_cond = threading.Condition()
+_queue: Deque[Dict[str, Any]] = deque()
+_in_flight = 0
+_segment = None # open spool file for the events in _queue
+_segment_path: Optional[str] = None
+_segment_seq = 0
+_flusher: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+_stats = {"emitted": 0, "dropped": 0, "blocked": 0, "flushed": 0, "batches": 0, "flush_failures": 0, "rejected": 0, "recovered": 0}
+
+
+def _bump(stat: str, amount: int = 1) -> None:
+    # Caller holds _cond
+    _stats[stat] += amount
+    EVENTS.labels(stat).inc(amount)
+
+
+def emit(event_type: str, org_id: Optional[str], entity_type: str = None, entity_id: str = None,
+         actor_id: str = None, payload: Dict[str, Any] = None) -> bool:
+    """
+    Queues an event for the next batch. Never raises and never touches the
+    database; returns False if the event was not queued (queue full, no org).
+    """
+    if not org_id:
+        print(f"Error queueing {event_type} event: missing org_id")
+        return False
+    event = {
+        "id": str(uuid.uuid4()),
+        "org_id": org_id,
+        "event_type": event_type,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "actor_id": actor_id,
+        "payload": payload or {},
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    try:
+        with _cond:
+            _ensure_started()
+            if not _has_room():
+                _bump("dropped")
+                return False
+            _spool(event)
+            _queue.append(event)
+            QUEUED.inc()
+            _bump("emitted")
+            if len(_queue) >= EVENTS_BATCH_SIZE:
+                _cond.notify_all()
+        return True
+    except Exception as e:
+        print(f"Error queueing {event_type} event: {e}")
+        return False
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _has_room() -> bool:
+    # Caller holds _cond
+    if len(_queue) + _in_flight < EVENTS_QUEUE_SIZE:
+        return True
+    if EVENTS_FULL_POLICY != "block" or _on_event_loop():
+        return False
+    _bump("blocked")
+    return _cond.wait_for(lambda: len(_queue) + _in_flight < EVENTS_QUEUE_SIZE, timeout=EVENTS_BLOCK_SECONDS)
+
+
+def _ensure_started() -> None:
+    # Caller holds _cond. Started on first use, so each gunicorn worker (and
+    # any forked process) gets its own flusher and spool segments
+    global _flusher, _pid, _segment, _segment_path, _in_flight
+    if _flusher is not None and _pid == os.getpid():
+        return
+    if _pid is not None:
+        # Forked child: the parent's queue and spool belong to the parent
+        _queue.clear()
+        _segment, _segment_path, _in_flight = None, None, 0
+    _pid = os.getpid()
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    _flusher = threading.Thread(target=_run, name="event-flusher", daemon=True)
+    _flusher.start()
+
+
+# --- Spool ---
+
+def _spool(event: Dict[str, Any]) -> None:
+    # Caller holds _cond. Written through to the OS (survives a worker crash);
+    # a failing disk only costs durability, the event is still queued
+    global _segment, _segment_path, _segment_seq
+    try:
+        if _segment is None:
+            _segment_seq += 1
+            _segment_path = os.path.join(SPOOL_DIR, f"events-{_pid}-{_segment_seq}.ndjson")
+            _segment = open(_segment_path, "a")
+        _segment.write(json.dumps(event) + "\n")
+        _segment.flush()
+    except Exception as e:
+        print(f"Error spooling event: {e}")
+
+
+def _rotate() -> Optional[str]:
+    """Closes the current segment (it holds exactly the events being drained); returns its path."""
+    global _segment, _segment_path
+    path = _segment_path
+    if _segment is not None:
+        try:
+            _segment.close()
+        except Exception as e:
+            print(f"Error closing event spool: {e}")
+    _segment, _segment_path = None, None
+    return path
+
+
+def _read_segment(path: str) -> List[Dict[str, Any]]:
+    events = []
+    with open(path) as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                pass # torn last line from a crash mid-write
+    return events
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _recover_orphans() -> None:
+    """Replays spool segments left by workers that died before flushing them."""
+    global _segment_seq
+    try:
+        names = sorted(os.listdir(SPOOL_DIR))
+    except FileNotFoundError:
+        return
+    for name in names:
+        match = _SEGMENT.match(name)
+        if not match:
+            continue
+        owner = int(match.group(1))
+        if owner == _pid or _pid_alive(owner):
+            continue
+        # Claim it by renaming into our own namespace; another worker
+        # recovering at the same time loses the rename and skips it
+        with _cond:
+            _segment_seq += 1
+            claimed = os.path.join(SPOOL_DIR, f"events-{_pid}-{_segment_seq}.ndjson")
+        try:
+            os.rename(os.path.join(SPOOL_DIR, name), claimed)
+        except FileNotFoundError:
+            continue
+        events = _read_segment(claimed)
+        with _cond:
+            _bump("recovered", len(events))
+        if _deliver(events):
+            os.remove(claimed)
+
+
+# --- Flushing ---
+
+def _insert(rows: List[Dict[str, Any]]) -> None:
+    get_client().table("events").upsert(rows, ignore_duplicates=True, returning=ReturnMethod.minimal).execute()
+
+
+def _insert_each(rows: List[Dict[str, Any]]) -> int:
+    """After the database refused a batch: inserts rows one at a time, skipping the ones it refuses."""
+    rejected = 0
+    for row in rows:
+        try:
+            _insert([row])
+        except APIError as e:
+            rejected += 1
+            print(f"Error writing {row.get('event_type')} event {row.get('id')}, dropped: {e}")
+    return rejected
+
+
+def _deliver(events: List[Dict[str, Any]], retry: bool = True) -> bool:
+    """Inserts events in batches, retrying with backoff while the database is unreachable."""
+    delay = 1.0
+    sent = 0
+    while sent < len(events):
+        batch = events[sent:sent + EVENTS_BATCH_SIZE]
+        rejected = 0
+        try:
+            try:
+                _insert(batch)
+            except APIError:
+                # The database answered but refused the batch (a bad row);
+                # retrying as-is would wedge the log, so isolate the bad row
+                rejected = _insert_each(batch)
+        except Exception as e:
+            with _cond:
+                _bump("flush_failures")
+            print(f"Error writing {len(batch)} events: {e}")
+            if not retry:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+            continue
+        sent += len(batch)
+        with _cond:
+            _bump("flushed", len(batch) - rejected)
+            _bump("batches")
+            if rejected:
+                _bump("rejected", rejected)
+    return True
+
+
+def _drain(retry: bool = True) -> None:
+    global _in_flight
+    with _cond:
+        events = list(_queue)
+        _queue.clear()
+        _in_flight += len(events)
+        path = _rotate()
+    if not events:
+        return
+    # While this runs (and retries), new events queue up behind it; once the
+    # queue bound is reached emit() starts dropping or blocking
+    delivered = _deliver(events, retry=retry)
+    if delivered and path:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Error removing event spool {path}: {e}")
+    with _cond:
+        _in_flight -= len(events)
+        QUEUED.dec(len(events))
+        _cond.notify_all()
+
+
+def _run() -> None:
+    try:
+        _recover_orphans()
+    except Exception as e:
+        print(f"Error recovering event spool: {e}")
+    while True:
+        with _cond:
+            _cond.wait_for(lambda: len(_queue) >= EVENTS_BATCH_SIZE, timeout=EVENTS_FLUSH_INTERVAL_SECONDS)
+        try:
+            _drain()
+        except Exception as e:
+            print(f"Error flushing events: {e}")
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """
+    Writes everything queued so far (app shutdown, end of a script). Gives up
+    after one attempt per batch; whatever fails stays in the spool for the
+    next worker to replay. Returns True if nothing is left in memory.
+    """
+    if _pid != os.getpid():
+        return True
+    deadline = time.monotonic() + timeout
+    _drain(retry=False)
+    with _cond:
+        # A batch the flusher thread is writing right now
+        return _cond.wait_for(lambda: _in_flight == 0, timeout=max(0.0, deadline - time.monotonic())) and not _queue
+
+
+def stats() -> Dict[str, Any]:
+    with _cond:
+        return {
+            **_stats,
+            "queued": len(_queue),
+            "in_flight": _in_flight,
+            "queue_size": EVENTS_QUEUE_SIZE,
+            "full_policy": EVENTS_FULL_POLICY,
+            "spool_dir": SPOOL_DIR,
+        }
+
+
+atexit.register(flush)
@@ -0,0 +1,36 @@
+import copy
+from typing import Any, Dict, List
+
+# Python side of the version deltas produced by jsonb_diff (schema.sql):
+# a list of {"op": "add" | "remove" | "replace", "path": [key or index, ...], "value": ...}.
+# Used to materialize a run of delta versions that was already fetched, without
+# one get_proposal_version_content call per row.
+
+
+def apply_delta(doc: Any, ops: List[Dict[str, Any]]) -> Any:
+    """Returns a copy of `doc` with the patch operations applied in order."""
+    doc = copy.deepcopy(doc)
+    for op in ops or []:
+        path = op["path"]
+        if not path:
+            doc = copy.deepcopy(op.get("value"))
+            continue
+
+        parent = doc
+        for part in path[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        last = path[-1]
+
+        if isinstance(parent, list):
+            index = int(last)
+            if op["op"] == "remove":
+                del parent[index]
+            elif index == len(parent):
+                parent.append(copy.deepcopy(op.get("value")))
+            else:
+                parent[index] = copy.deepcopy(op.get("value"))
+        elif op["op"] == "remove":
+            parent.pop(last, None)
+        else:
+            parent[last] = copy.deepcopy(op.get("value"))
+    return doc
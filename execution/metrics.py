@@ -0,0 +1,151 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+
+# Requests slower than this are logged with their span breakdown (0 = off)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Under gunicorn each worker writes its samples to PROMETHEUS_MULTIPROC_DIR
+# (see orchestration/gunicorn_conf.py) and /metrics merges them, so a scrape
+# sees every worker no matter which one answers it
+REQUEST_SECONDS = Histogram(
+    "projexnest_http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+SPAN_SECONDS = Histogram(
+    "projexnest_span_duration_seconds", "Time spent in backend calls, HTML render and PDF layout",
+    ["span"], buckets=LATENCY_BUCKETS,
+)
+SLOW_REQUESTS = Counter("projexnest_slow_requests", "Requests slower than SLOW_REQUEST_SECONDS", ["route"])
+
+# Spans of the request being handled. A list rather than a tuple so tasks and
+# threadpool calls spawned by the handler (which copy the context) append to it
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+def record_span(name: str, seconds: float) -> None:
+    SPAN_SECONDS.labels(name).observe(seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block as one span of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def render_latest() -> bytes:
+    """Prometheus text exposition, merged across gunicorn workers when multiprocess mode is on."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+# --- Backend calls ---
+# Every Supabase call goes through the pooled httpx client, so two event hooks
+# time them all: each table(...).execute(), RPC and Storage request.
+
+_OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+def _backend_span_name(request: httpx.Request) -> str:
+    parts = request.url.path.strip("/").split("/")
+    if parts[:2] == ["rest", "v1"] and len(parts) > 2:
+        if parts[2] == "rpc" and len(parts) > 3:
+            return f"rpc {parts[3]}"
+        return f"db {_OPERATIONS.get(request.method, request.method.lower())} {parts[2]}"
+    if parts[:2] == ["storage", "v1"]:
+        return f"storage {request.method.lower()}"
+    return f"http {request.method.lower()}"
+
+
+async def _on_request(request: httpx.Request) -> None:
+    request.extensions["projexnest_started"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response) -> None:
+    # Ends at the response headers; bodies from PostgREST are read right after
+    started = response.request.extensions.get("projexnest_started")
+    if started is not None:
+        record_span(_backend_span_name(response.request), time.perf_counter() - started)
+
+
+HTTPX_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
+
+
+class TimedJSONResponse(JSONResponse):
+    """Default response class; times JSON encoding of the response body."""
+
+    def render(self, content: Any) -> bytes:
+        with span("json serialize"):
+            return super().render(content)
+
+
+# --- ASGI middleware ---
+
+def _summarize_spans(spans: List[Tuple[str, float]]) -> str:
+    totals: Dict[str, List[float]] = {}
+    for name, seconds in spans:
+        total = totals.setdefault(name, [0, 0.0])
+        total[0] += 1
+        total[1] += seconds
+    ordered = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+    # Spans can overlap (gathered calls), so they may add up to more than the request
+    return ", ".join(f"{name} {count}x {seconds * 1000:.0f}ms" for name, (count, seconds) in ordered) or "no spans"
+
+
+class MetricsMiddleware:
+    """
+    Records a latency histogram per route template and collects the request's
+    spans; requests over SLOW_REQUEST_SECONDS are logged with their breakdown.
+    Plain ASGI (not BaseHTTPMiddleware) so it adds no extra task per request.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        status = {"code": 500}
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_spans.reset(token)
+            # The router stores the matched route in the scope; label by its
+            # template so ids don't explode the series count
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.labels(scope["method"], route, str(status["code"])).observe(elapsed)
+            if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+                SLOW_REQUESTS.labels(route).inc()
+                print(f"Slow request: {scope['method']} {route} {status['code']} {elapsed * 1000:.0f}ms "
+                      f"({_summarize_spans(spans)})")
@@ -0,0 +1,147 @@
+import base64
+import datetime
+import json
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+COUNT_METHODS = ("estimated", "exact", "planned", "none")
+# Filter values PostgREST would cast (and answer a bad one with an error, not an empty page)
+TIMESTAMP_COLUMNS = ("created_at", "updated_at")
+UUID_COLUMNS = ("id", "org_id", "client_id", "project_id")
+
+
+class InvalidQuery(ValueError):
+    """Bad cursor, unknown field or filter value; the API answers 400."""
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    The (created_at, id) a cursor points at. Both end up in a PostgREST
+    filter string, so they must be an ISO timestamp and a UUID.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        datetime.datetime.fromisoformat(created_at)
+        return created_at, str(uuid.UUID(row_id))
+    except Exception:
+        raise InvalidQuery("Invalid cursor")
+
+
+def _check_filter(column: str, value: Any) -> None:
+    try:
+        if column in TIMESTAMP_COLUMNS:
+            datetime.datetime.fromisoformat(value)
+        elif column in UUID_COLUMNS:
+            uuid.UUID(value)
+    except (TypeError, ValueError):
+        kind = "an ISO timestamp" if column in TIMESTAMP_COLUMNS else "a UUID"
+        raise InvalidQuery(f"{column} filter must be {kind}: {value!r}")
+
+
+def select_fields(fields: Optional[str], columns: Iterable[str], default: str, embeds: Dict[str, str] = None) -> str:
+    """
+    Builds a PostgREST select from a comma-separated `fields=` parameter.
+    Only whitelisted columns (and named embeds, e.g. clients -> clients(name))
+    are allowed; id and created_at are always included for the cursor.
+    """
+    if not fields:
+        return default
+
+    embeds = embeds or {}
+    allowed = set(columns)
+    selected: List[str] = []
+    for name in (part.strip() for part in fields.split(",")):
+        if not name:
+            continue
+        if name in embeds:
+            selected.append(embeds[name])
+        elif name in allowed:
+            selected.append(name)
+        else:
+            raise InvalidQuery(f"Unknown field: {name}")
+
+    for required in ("created_at", "id"):
+        if required not in selected:
+            selected.append(required)
+    return ", ".join(dict.fromkeys(selected))
+
+
+def _page_query(client, table, select, filters, cursor, limit, count, modify=None):
+    if count not in COUNT_METHODS:
+        raise InvalidQuery(f"count must be one of {', '.join(COUNT_METHODS)}")
+    limit = max(1, min(limit, MAX_LIMIT))
+
+    want_count = count != "none" and cursor is None
+    query = client.table(table).select(select, count=count if want_count else None)
+    for op, column, value in filters:
+        if value is not None:
+            _check_filter(column, value)
+            query = getattr(query, op)(column, value)
+    if modify is not None:
+        query = modify(query)
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+        )
+
+    # One extra row tells us whether there is a next page
+    query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+    return query, limit, want_count
+
+
+def _page_result(response, limit: int, want_count: bool) -> Dict[str, Any]:
+    rows = response.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "data": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+        "count": response.count if want_count else None,
+    }
+
+
+async def fetch_page_async(
+    client,
+    table: str,
+    select: str,
+    filters: List[Tuple[str, str, Any]],
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+    count: str = "estimated",
+) -> Dict[str, Any]:
+    """
+    Keyset-paginated read ordered by (created_at, id) newest first.
+    `filters` are (operator, column, value) triples applied with the query
+    builder (None values are skipped). The total count is only computed for
+    the first page, using the cheap planner estimate unless asked otherwise.
+    """
+    query, limit, want_count = _page_query(client, table, select, filters, cursor, limit, count)
+    return _page_result(await query.execute(), limit, want_count)
+
+
+def fetch_page(
+    client,
+    table: str,
+    select: str,
+    filters: List[Tuple[str, str, Any]],
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+    count: str = "estimated",
+    modify: Optional[Callable[[Any], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    fetch_page_async for the sync client. `modify` gets the filtered query
+    before paging is applied, e.g. to order or limit an embedded resource.
+    """
+    query, limit, want_count = _page_query(client, table, select, filters, cursor, limit, count, modify)
+    return _page_result(query.execute(), limit, want_count)
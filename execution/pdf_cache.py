@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from execution.cache import LRUCache
+
+# Bump when the PDF output changes without the HTML changing (CSS, WeasyPrint options...)
+TEMPLATE_REVISION = "1"
+
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "projexnest_pdf_cache"))
+MEMORY_ITEMS = int(os.getenv("PDF_CACHE_MEMORY_ITEMS", "64"))
+DISK_MAX_BYTES = int(os.getenv("PDF_CACHE_DISK_MAX_MB", "512")) * 1024 * 1024
+PRUNE_EVERY = 50  # disk writes between size checks
+
+# Keys are sha256 hex digests; they double as file names and async job ids
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+_memory = LRUCache(maxsize=MEMORY_ITEMS)
+_lock = threading.Lock()
+_stats = {"disk_hits": 0, "disk_misses": 0, "renders": 0, "disk_writes": 0}
+
+
+def cache_key(html: str) -> str:
+    """Content address for a rendered proposal: sha256 of the template revision + HTML."""
+    digest = hashlib.sha256()
+    digest.update(TEMPLATE_REVISION.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(html.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    """Evaluates an If-None-Match header against the cache key."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison is fine for a content-addressed body
+    candidates = [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+    return etag_for(key) in candidates
+
+
+def is_key(value: str) -> bool:
+    """Whether `value` can be a cache key (and so is safe to put in a path)."""
+    return isinstance(value, str) and KEY_PATTERN.fullmatch(value) is not None
+
+
+def _disk_path(key: str) -> str:
+    if not is_key(key):
+        raise ValueError(f"Invalid PDF cache key: {key!r}")
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def _bump(stat: str) -> None:
+    with _lock:
+        _stats[stat] += 1
+
+
+def get(key: str) -> Optional[bytes]:
+    """Looks the PDF up in memory first, then on disk (promoting disk hits to memory)."""
+    if not is_key(key):
+        return None
+    pdf_bytes = _memory.get(key)
+    if pdf_bytes is not None:
+        return pdf_bytes
+    return _get_from_disk(key)
+
+
+def _get_from_disk(key: str) -> Optional[bytes]:
+    path = _disk_path(key)
+    try:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+    except OSError:
+        _bump("disk_misses")
+        return None
+
+    _bump("disk_hits")
+    _memory.set(key, pdf_bytes)
+    return pdf_bytes
+
+
+def put(key: str, pdf_bytes: bytes) -> None:
+    _memory.set(key, pdf_bytes)
+
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so concurrent workers never read a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+        _bump("disk_writes")
+        if _stats["disk_writes"] % PRUNE_EVERY == 0:
+            _prune_disk()
+    except OSError as e:
+        print(f"Error writing PDF cache entry: {e}")
+
+
+def get_or_render(key: str, render) -> bytes:
+    """Returns the cached PDF for `key`, calling `render()` and storing the result on a miss."""
+    pdf_bytes = get(key)
+    if pdf_bytes is not None:
+        return pdf_bytes
+
+    _bump("renders")
+    pdf_bytes = render()
+    put(key, pdf_bytes)
+    return pdf_bytes
+
+
+async def get_or_render_async(key: str, render) -> bytes:
+    """get_or_render for async handlers; `render` is a coroutine function and disk I/O runs in a thread."""
+    pdf_bytes = _memory.get(key)
+    if pdf_bytes is None:
+        pdf_bytes = await asyncio.to_thread(_get_from_disk, key)
+    if pdf_bytes is not None:
+        return pdf_bytes
+
+    _bump("renders")
+    pdf_bytes = await render()
+    await asyncio.to_thread(put, key, pdf_bytes)
+    return pdf_bytes
+
+
+def _prune_disk() -> None:
+    """Drops the oldest files once the disk tier grows past DISK_MAX_BYTES."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not name.endswith(".pdf"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    if total <= DISK_MAX_BYTES:
+        return
+
+    entries.sort()
+    for _, size, path in entries:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        if total <= DISK_MAX_BYTES:
+            break
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        disk = dict(_stats)
+    return {"memory": _memory.stats(), **disk}
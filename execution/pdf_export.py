@@ -0,0 +1,153 @@
+import json
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from execution.pagination import fetch_page
+from execution.supabase_client import get_client
+import execution.pdf_cache as pdf_cache
+import execution.pdf_generator as pdf
+import execution.render_service as render_service
+import execution.workflow_proposals as wp
+
+PAGE_SIZE = 200
+# Stored-PDF downloads are I/O bound; renders are capped by the render pool
+_download_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pdf-export")
+
+
+class _ZipStream:
+    """Write-only buffer handed to ZipFile; drained after every entry so nothing accumulates."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_export_rows(org_id: str, status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Pages through an org's proposals (newest first, keyset-paginated) with
+    client, project and the latest version (plus its stored PDF) embedded,
+    so each page is one round trip.
+    """
+    select = (
+        "*, clients(id, name, email), projects(id, name), "
+        "latest_version:proposal_versions(id, version_number, content_json, pdf_file_id, "
+        "files(storage_path, sha256))"
+    )
+
+    def latest_only(query):
+        return query.order("version_number", desc=True, foreign_table="latest_version").limit(
+            1, foreign_table="latest_version"
+        )
+
+    cursor = None
+    while True:
+        page = fetch_page(
+            get_client(), "proposals", select, [("eq", "org_id", org_id), ("eq", "status", status)],
+            cursor=cursor, limit=PAGE_SIZE, count="none", modify=latest_only,
+        )
+        for row in page["data"]:
+            yield row
+        cursor = page["next_cursor"]
+        if not cursor:
+            return
+
+
+def _entry_name(proposal: Dict[str, Any]) -> str:
+    title = proposal.get("name") or proposal.get("title") or "proposal"
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", title).strip("_")[:60] or "proposal"
+    return f"{slug}_{proposal['id'][:8]}.pdf"
+
+
+def _start_pdf(row: Dict[str, Any], layout: Optional[Dict[str, Any]]) -> Future:
+    """Returns a future for the row's PDF bytes: stored object, cached render or a new render."""
+    versions = row.get("latest_version") or []
+    version = versions[0] if versions else {}
+    stored = version.get("files")
+    if stored and stored.get("sha256"):
+        return _download_executor.submit(
+            pdf_cache.get_or_render, stored["sha256"], lambda: wp.download_stored_pdf(stored["storage_path"], stored["sha256"])
+        )
+
+    html = pdf.render_proposal_html(
+        row, version.get("content_json") or {}, row.get("clients"), row.get("projects"), layout
+    )
+    key = pdf_cache.cache_key(html)
+    cached = pdf_cache.get(key)
+    if cached is not None:
+        done: Future = Future()
+        done.set_result(cached)
+        return done
+
+    future = render_service.submit(html, block=True)
+
+    def _keep(f: Future) -> None:
+        if f.exception() is None:
+            pdf_cache.put(key, f.result())
+            if version.get("id"):
+                wp.schedule_version_pdf(version["id"], f.result())
+
+    future.add_done_callback(_keep)
+    return future
+
+
+def stream_proposals_zip(org_id: str, status: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Yields a ZIP archive of every matching proposal's PDF, entry by entry.
+    Renders run on the render pool with a bounded window in flight, and the
+    archive is streamed without ever being held in memory as a whole.
+    A manifest.json at the end lists each entry and any failures.
+    """
+    layout = wp.get_org_layout(org_id)
+    window = max(1, render_service.RENDER_WORKERS * 2)
+    in_flight: "deque[Tuple[Dict[str, Any], Future]]" = deque()
+    manifest: List[Dict[str, Any]] = []
+
+    stream = _ZipStream()
+    archive = zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED)
+
+    def _write_next() -> bytes:
+        row, future = in_flight.popleft()
+        entry = {"proposal_id": row["id"], "file": _entry_name(row)}
+        try:
+            pdf_bytes = future.result(timeout=render_service.RENDER_TIMEOUT_SECONDS * 2)
+            archive.writestr(entry["file"], pdf_bytes)
+        except Exception as e:
+            entry = {"proposal_id": row["id"], "error": str(e)}
+        manifest.append(entry)
+        return stream.drain()
+
+    for row in iter_export_rows(org_id, status):
+        try:
+            future = _start_pdf(row, layout)
+        except Exception as e:
+            # e.g. a layout that fails to render for this row; _write_next records it
+            future = Future()
+            future.set_exception(e)
+        in_flight.append((row, future))
+        if len(in_flight) >= window:
+            chunk = _write_next()
+            if chunk:
+                yield chunk
+
+    while in_flight:
+        chunk = _write_next()
+        if chunk:
+            yield chunk
+
+    archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+    archive.close()
+    yield stream.drain()
@@ -1,199 +1,178 @@
-from weasyprint import HTML, CSS
-from typing import Dict, Any
-import json
+import hashlib
+import io
+import os
+import threading
+from jinja2 import Environment, FileSystemLoader, TemplateSyntaxError, select_autoescape
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from execution.cache import LRUCache
 
-def render_proposal_html(proposal: Dict[str, Any], content_json: Dict[str, Any], client: Dict[str, Any] = None, project: Dict[str, Any] = None) -> str:
+# WeasyPrint (and Pango/cairo behind it) is imported on first layout, which
+# only happens in the render pool processes; the API workers never load it
+if TYPE_CHECKING:
+    from weasyprint import CSS
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+DEFAULT_TEMPLATE = "proposal.html"
+SIGNATURE_TEMPLATE = "signature_page.html"
+STYLESHEET_FILE = os.path.join(TEMPLATES_DIR, "proposal.css")
+
+with open(STYLESHEET_FILE, "r") as f:
+    STYLESHEET_SOURCE = f.read()
+
+# Stamped into the HTML so a stylesheet change also changes the PDF cache key
+LAYOUT_REVISION = hashlib.sha256(STYLESHEET_SOURCE.encode("utf-8")).hexdigest()[:12]
+
+def _money(value: Any) -> str:
+    return f"${float(value or 0):,.2f}"
+
+# auto_reload off: templates are compiled once per process
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    autoescape=select_autoescape(default=True, default_for_string=True),
+    auto_reload=False,
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+_env.filters["money"] = _money
+
+# Org layout overrides are written by users (POST/PATCH /workflow/templates),
+# so they compile in a sandbox: no access to Python internals, no mutation
+_override_env = ImmutableSandboxedEnvironment(
+    autoescape=select_autoescape(default=True, default_for_string=True),
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+_override_env.filters["money"] = _money
+
+class InvalidLayout(ValueError):
+    pass
+
+# Org layout overrides, compiled once per (template id, revision)
+_override_templates = LRUCache(maxsize=int(os.getenv("LAYOUT_TEMPLATE_CACHE_SIZE", "64")))
+
+_stylesheet: Optional["CSS"] = None
+_stylesheet_lock = threading.Lock()
+
+def get_stylesheet() -> "CSS":
+    """The proposal stylesheet, parsed once per process and shared by every render."""
+    global _stylesheet
+    if _stylesheet is None:
+        with _stylesheet_lock:
+            if _stylesheet is None:
+                from weasyprint import CSS
+                _stylesheet = CSS(string=STYLESHEET_SOURCE)
+    return _stylesheet
+
+def preload() -> None:
+    """Imports WeasyPrint and parses the stylesheet ahead of the first render."""
+    get_stylesheet()
+
+def get_template(layout: Optional[Dict[str, Any]] = None):
+    """
+    Returns the compiled proposal template.
+    `layout` is an org override row from proposal_templates (id, updated_at,
+    content_json.layout_html); anything else falls back to the default template.
+    """
+    source = ((layout or {}).get("content_json") or {}).get("layout_html")
+    if not source:
+        return _env.get_template(DEFAULT_TEMPLATE)
+
+    key = (layout.get("id"), layout.get("updated_at"))
+    template = _override_templates.get(key)
+    if template is None:
+        template = compile_layout(source)
+        _override_templates.set(key, template)
+    return template
+
+def compile_layout(source: str):
+    """Compiles an org layout override (sandboxed); raises InvalidLayout if it isn't a valid template."""
+    if not isinstance(source, str):
+        raise InvalidLayout("layout_html must be a string")
+    try:
+        return _override_env.from_string(source)
+    except TemplateSyntaxError as e:
+        raise InvalidLayout(f"layout_html line {e.lineno}: {e.message}")
+
+def validate_layout(content_json: Optional[Dict[str, Any]]) -> None:
+    """Checks a template's layout_html (if any) compiles, so bad layouts fail when saved, not when rendered."""
+    source = (content_json or {}).get("layout_html")
+    if source is not None:
+        compile_layout(source)
+
+def render_proposal_html(proposal: Dict[str, Any], content_json: Dict[str, Any], client: Dict[str, Any] = None, project: Dict[str, Any] = None, layout: Dict[str, Any] = None) -> str:
     """
     Renders a proposal's data into an HTML string suitable for PDF conversion.
     Uses fields from the proposal table directly (scope_of_work, total, etc.)
     Falls back to content_json for template-based content.
+    Styling lives in the shared stylesheet (see get_stylesheet), not in the HTML.
+    """
+    pricing: List[Dict[str, Any]] = content_json.get("pricing", [])
+    context = {
+        # Primary data from proposals table
+        "title": proposal.get("name", proposal.get("title", "Proposal")),
+        "scope": proposal.get("scope_of_work", "") or content_json.get("scope", ""),
+        "total": proposal.get("total", 0) or 0,
+        "legal_terms": proposal.get("legal_terms", "") or content_json.get("terms", ""),
+        "payment_schedule": proposal.get("payment_schedule", "") or "",
+        # Related data
+        "client_name": client.get("name", "Client") if client else "Client",
+        "client_email": client.get("email", "") if client else "",
+        "project_name": project.get("name", "Project") if project else "Project",
+        # Template-based content
+        "sections": content_json.get("sections", []),
+        "pricing": pricing,
+        "pricing_total": sum(item.get("amount", 0) or 0 for item in pricing),
+        "content": content_json,
+        "layout_revision": LAYOUT_REVISION,
+    }
+    return get_template(layout).render(context)
+
+def render_signature_page_html(proposal: Dict[str, Any], version: Dict[str, Any], session: Dict[str, Any], document_sha256: str) -> str:
+    """
+    Renders the page appended to a signed proposal's PDF: the signatures
+    captured on the signing session and the hash of the document they signed.
+    """
+    context = {
+        "title": proposal.get("name") or proposal.get("title") or "Proposal",
+        "version_number": version.get("version_number"),
+        "document_sha256": document_sha256,
+        "signer_email": session.get("signer_email"),
+        "signed_at": session.get("signed_at"),
+        "signatures": session.get("signatures") or [],
+        "layout_revision": LAYOUT_REVISION,
+    }
+    return _env.get_template(SIGNATURE_TEMPLATE).render(context)
+
+def append_pdf_pages(base_pdf: bytes, extra_pdf: bytes) -> bytes:
     """
-    # Primary data from proposals table
-    title = proposal.get("name", proposal.get("title", "Proposal"))
-    scope = proposal.get("scope_of_work", "") or content_json.get("scope", "")
-    total = proposal.get("total", 0) or 0
-    legal_terms = proposal.get("legal_terms", "") or content_json.get("terms", "")
-    payment_schedule = proposal.get("payment_schedule", "") or ""
-    
-    # Related data
-    client_name = client.get("name", "Client") if client else "Client"
-    client_email = client.get("email", "") if client else ""
-    project_name = project.get("name", "Project") if project else "Project"
-    
-    # Extract sections from content_json (if template-based)
-    sections = content_json.get("sections", [])
-    pricing = content_json.get("pricing", [])
-    
-    # Build sections HTML
-    sections_html = ""
-    for section in sections:
-        sections_html += f"""
-        <div class="section">
-            <h2>{section.get('title', 'Section')}</h2>
-            <p>{section.get('content', '')}</p>
-        </div>
-        """
-    
-    # Build pricing table (from content_json if available, otherwise use total)
-    pricing_html = ""
-    if pricing:
-        pricing_html = """
-        <div class="section">
-            <h2>Pricing</h2>
-            <table>
-                <thead>
-                    <tr><th>Item</th><th>Description</th><th>Amount</th></tr>
-                </thead>
-                <tbody>
-        """
-        total_sum = 0
-        for item in pricing:
-            amount = item.get('amount', 0)
-            total_sum += amount
-            pricing_html += f"""
-                <tr>
-                    <td>{item.get('name', '')}</td>
-                    <td>{item.get('description', '')}</td>
-                    <td>${amount:,.2f}</td>
-                </tr>
-            """
-        pricing_html += f"""
-                </tbody>
-                <tfoot>
-                    <tr><td colspan="2"><strong>Total</strong></td><td><strong>${total_sum:,.2f}</strong></td></tr>
-                </tfoot>
-            </table>
-        </div>
-        """
-    elif total:
-        # Simple total from proposal table
-        pricing_html = f"""
-        <div class="section">
-            <h2>Pricing</h2>
-            <table>
-                <tbody>
-                    <tr><td><strong>Total</strong></td><td><strong>${total:,.2f}</strong></td></tr>
-                </tbody>
-            </table>
-        </div>
-        """
-    
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>{title}</title>
-        <style>
-            body {{
-                font-family: 'Helvetica Neue', Arial, sans-serif;
-                margin: 40px;
-                color: #333;
-                line-height: 1.6;
-            }}
-            .header {{
-                text-align: center;
-                border-bottom: 2px solid #2563eb;
-                padding-bottom: 20px;
-                margin-bottom: 30px;
-            }}
-            .header h1 {{
-                color: #2563eb;
-                margin-bottom: 5px;
-            }}
-            .section {{
-                margin-bottom: 25px;
-            }}
-            .section h2 {{
-                color: #1e40af;
-                border-bottom: 1px solid #e5e7eb;
-                padding-bottom: 5px;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 10px;
-            }}
-            th, td {{
-                padding: 10px;
-                border: 1px solid #e5e7eb;
-                text-align: left;
-            }}
-            th {{
-                background-color: #f3f4f6;
-            }}
-            tfoot td {{
-                font-weight: bold;
-                background-color: #f9fafb;
-            }}
-            .terms {{
-                font-size: 0.9em;
-                color: #6b7280;
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 1px solid #e5e7eb;
-            }}
-            .signature-block {{
-                margin-top: 50px;
-                padding: 20px;
-                border: 1px dashed #9ca3af;
-            }}
-            .signature-line {{
-                margin-top: 40px;
-                border-top: 1px solid #333;
-                width: 300px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>{title}</h1>
-            <p>Professional Proposal</p>
-        </div>
-        
-        <div class="section">
-            <h2>Project Details</h2>
-            <table>
-                <tr><td><strong>Client</strong></td><td>{client_name}</td></tr>
-                <tr><td><strong>Project</strong></td><td>{project_name}</td></tr>
-            </table>
-        </div>
-        
-        {sections_html}
-        
-        {f'<div class="section"><h2>Scope of Work</h2><p>{scope}</p></div>' if scope else ''}
-        
-        {pricing_html}
-        
-        {f'<div class="section"><h2>Payment Schedule</h2><p>{payment_schedule}</p></div>' if payment_schedule else ''}
-        
-        {f'<div class="terms"><h3>Terms & Conditions</h3><p>{legal_terms}</p></div>' if legal_terms else ''}
-        
-        <div class="signature-block">
-            <p><strong>Acceptance</strong></p>
-            <p>By signing below, you agree to the terms outlined in this proposal.</p>
-            <div class="signature-line"></div>
-            <p>Signature & Date</p>
-        </div>
-    </body>
-    </html>
+    Appends the pages of `extra_pdf` to `base_pdf` as a PDF incremental
+    update: the original bytes are kept as-is (a prefix of the result) and
+    only the new objects, a new xref section and trailer are written after them.
     """
-    return html
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter(io.BytesIO(base_pdf), incremental=True)
+    for page in PdfReader(io.BytesIO(extra_pdf)).pages:
+        writer.add_page(page)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
 
 def generate_pdf_from_html(html_content: str) -> bytes:
     """
     Generates a PDF from HTML content using WeasyPrint.
     Returns the PDF as bytes.
     """
+    from weasyprint import HTML
     html = HTML(string=html_content)
-    pdf_bytes = html.write_pdf()
+    pdf_bytes = html.write_pdf(stylesheets=[get_stylesheet()])
     return pdf_bytes
 
-def generate_proposal_pdf(proposal: Dict[str, Any], content_json: Dict[str, Any], client: Dict[str, Any] = None, project: Dict[str, Any] = None) -> bytes:
+def generate_proposal_pdf(proposal: Dict[str, Any], content_json: Dict[str, Any], client: Dict[str, Any] = None, project: Dict[str, Any] = None, layout: Dict[str, Any] = None) -> bytes:
     """
     High-level function: Takes a proposal and its content, returns PDF bytes.
     """
-    html = render_proposal_html(proposal, content_json, client, project)
+    html = render_proposal_html(proposal, content_json, client, project, layout)
     return generate_pdf_from_html(html)
 
 def upload_pdf_to_storage(client, bucket_name: str, path: str, pdf_bytes: bytes) -> Dict[str, Any]:
@@ -204,7 +183,7 @@ def upload_pdf_to_storage(client, bucket_name: str, path: str, pdf_bytes: bytes)
         resp = client.storage.from_(bucket_name).upload(
             file=pdf_bytes,
             path=path,
-            file_options={"content-type": "application/pdf"}
+            file_options={"content-type": "application/pdf", "upsert": "true"}
         )
         return resp
     except Exception as e:
@@ -0,0 +1,254 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+import execution.metrics as metrics
+import execution.pdf_cache as pdf_cache
+import execution.pdf_generator as pdf
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", str(RENDER_WORKERS * 4)))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "30"))
+RETRY_AFTER_SECONDS = int(os.getenv("RENDER_RETRY_AFTER_SECONDS", "5"))
+# Start the render processes (and load WeasyPrint in them) at boot instead of on the first PDF request
+PRELOAD = os.getenv("RENDER_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+JOBS_DIR = os.path.join(pdf_cache.CACHE_DIR, "jobs")
+
+
+class RenderQueueFull(Exception):
+    """Raised when every render slot is taken; callers should answer 503 + Retry-After."""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish within RENDER_TIMEOUT_SECONDS."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Running + queued jobs share one bounded pool of slots
+_slots = threading.BoundedSemaphore(RENDER_QUEUE_SIZE)
+_stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timeouts": 0, "recycled": 0}
+_stats_lock = threading.Lock()
+
+
+def _bump(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    # Created lazily so each gunicorn worker gets its own pool after forking
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor(kill: bool = False) -> None:
+    """
+    Drops the current pool; the next submit starts a fresh one. With `kill`,
+    its processes are terminated first, which fails every render still on it
+    (BrokenProcessPool) and so hands back their slots.
+    """
+    global _executor
+    with _executor_lock:
+        old, _executor = _executor, None
+    if old is None:
+        return
+    if kill:
+        for process in list((old._processes or {}).values()):
+            process.terminate()
+    old.shutdown(wait=False, cancel_futures=True)
+
+
+def _abandon(future: Future) -> None:
+    """
+    Gives up on a render that timed out. A queued one is just cancelled; one
+    already running can't be, so its pool is recycled: the stuck WeasyPrint
+    process would otherwise keep a worker and a slot until it finished.
+    """
+    _bump("timeouts")
+    if future.cancel() or future.done():
+        return
+    _bump("recycled")
+    _reset_executor(kill=True)
+
+
+def warm_up() -> None:
+    """
+    Spawns the render processes and loads WeasyPrint in each, without waiting.
+    Bypasses the render slots: nothing is queued behind it but real renders.
+    """
+    executor = _get_executor()
+    for _ in range(RENDER_WORKERS):
+        executor.submit(pdf.preload)
+
+
+def submit(html: str, block: bool = False) -> Future:
+    """
+    Queues an HTML -> PDF layout on the render pool.
+    Raises RenderQueueFull when the queue is saturated, unless `block` is set
+    (background callers may wait for a slot instead).
+    """
+    if not _slots.acquire(blocking=block):
+        _bump("rejected")
+        raise RenderQueueFull("Render queue is full")
+
+    try:
+        try:
+            future = _get_executor().submit(pdf.generate_pdf_from_html, html)
+        except BrokenProcessPool:
+            # A render process died (OOM, segfault in Pango...); start a fresh pool
+            _reset_executor()
+            future = _get_executor().submit(pdf.generate_pdf_from_html, html)
+    except Exception:
+        _slots.release()
+        raise
+
+    _bump("submitted")
+
+    def _release(f: Future) -> None:
+        _slots.release()
+        _bump("failed" if f.exception() else "completed")
+
+    future.add_done_callback(_release)
+    return future
+
+
+def render(html: str, block: bool = False, timeout: float = None) -> bytes:
+    """Renders on the pool and waits for the result."""
+    future = submit(html, block=block)
+    try:
+        with metrics.span("pdf layout"):
+            return future.result(timeout=timeout or RENDER_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        _abandon(future)
+        raise RenderTimeout(f"PDF render exceeded {timeout or RENDER_TIMEOUT_SECONDS}s")
+
+
+async def render_async(html: str, timeout: float = None) -> bytes:
+    """render() for async handlers: awaits the pool without tying up a thread."""
+    future = submit(html)
+    try:
+        # Includes time queued for a render slot
+        with metrics.span("pdf layout"):
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or RENDER_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        _abandon(future)
+        raise RenderTimeout(f"PDF render exceeded {timeout or RENDER_TIMEOUT_SECONDS}s")
+
+
+# --- Async jobs ---
+# Job ids are the PDF cache key, so finished results live in the shared disk
+# tier and any gunicorn worker can answer a status poll. Pending/failed state
+# is kept as marker files next to it for the same reason.
+
+def _marker(job_id: str, suffix: str) -> str:
+    # Job ids come from URLs; only cache keys may become file names
+    if not pdf_cache.is_key(job_id):
+        raise ValueError(f"Invalid job id: {job_id!r}")
+    return os.path.join(JOBS_DIR, f"{job_id}.{suffix}")
+
+
+def _write_marker(job_id: str, suffix: str, payload: Dict[str, Any]) -> None:
+    try:
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        with open(_marker(job_id, suffix), "w") as f:
+            json.dump(payload, f)
+    except OSError as e:
+        print(f"Error writing render job marker: {e}")
+
+
+def _read_marker(job_id: str, suffix: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_marker(job_id, suffix)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_marker(job_id: str, suffix: str) -> None:
+    try:
+        os.remove(_marker(job_id, suffix))
+    except OSError:
+        pass
+
+
+def submit_job(job_id: str, html: str, on_done: Callable[[bytes], None] = None) -> Dict[str, Any]:
+    """
+    Starts a background render for `html` under `job_id` (its cache key).
+    Returns the job status; already-rendered or in-flight jobs are not resubmitted.
+    """
+    status = job_status(job_id)
+    if status["status"] in ("done", "pending"):
+        return status
+
+    _remove_marker(job_id, "failed")
+    # Marked before submitting so a fast render can't finish ahead of its marker
+    _write_marker(job_id, "pending", {"submitted_at": time.time()})
+    try:
+        future = submit(html)
+    except Exception:
+        _remove_marker(job_id, "pending")
+        raise
+
+    def _finish(f: Future) -> None:
+        try:
+            pdf_bytes = f.result()
+        except Exception as e:
+            _write_marker(job_id, "failed", {"error": str(e)})
+            _remove_marker(job_id, "pending")
+            return
+        pdf_cache.put(job_id, pdf_bytes)
+        _remove_marker(job_id, "pending")
+        if on_done:
+            try:
+                on_done(pdf_bytes)
+            except Exception as e:
+                print(f"Error in render job callback: {e}")
+
+    future.add_done_callback(_finish)
+    return {"job_id": job_id, "status": "pending"}
+
+
+def job_status(job_id: str) -> Dict[str, Any]:
+    if not pdf_cache.is_key(job_id):
+        return {"job_id": job_id, "status": "unknown"}
+    if pdf_cache.get(job_id) is not None:
+        return {"job_id": job_id, "status": "done"}
+
+    failed = _read_marker(job_id, "failed")
+    if failed:
+        return {"job_id": job_id, "status": "failed", "error": failed.get("error")}
+
+    pending = _read_marker(job_id, "pending")
+    if pending:
+        # A worker that died mid-render leaves its marker behind
+        if time.time() - pending.get("submitted_at", 0) > RENDER_TIMEOUT_SECONDS * 2:
+            return {"job_id": job_id, "status": "failed", "error": "Render timed out"}
+        return {"job_id": job_id, "status": "pending"}
+
+    return {"job_id": job_id, "status": "unknown"}
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        counters = dict(_stats)
+    return {
+        "workers": RENDER_WORKERS,
+        "queue_size": RENDER_QUEUE_SIZE,
+        "timeout_seconds": RENDER_TIMEOUT_SECONDS,
+        **counters,
+    }
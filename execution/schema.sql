@@ -66,6 +66,9 @@ create table if not exists files (
   created_at timestamptz default now()
 );
 
+-- Content hash of stored objects (rendered proposal PDFs)
+alter table files add column if not exists sha256 text;
+
 create table if not exists proposals (
   id uuid primary key default uuid_generate_v4(),
   org_id uuid references organizations(id) not null,
@@ -76,6 +79,23 @@ create table if not exists proposals (
   updated_at timestamptz default now()
 );
 
+-- Proposal value, summed into the dashboard pipeline (the live schema already has it)
+alter table proposals add column if not exists total numeric;
+
+-- The live schema names proposals by `name` (the app writes it) and links the
+-- client directly; older databases created from this file only have `title`
+alter table proposals add column if not exists name text;
+alter table proposals add column if not exists client_id uuid references clients(id);
+do $$
+begin
+  if exists (
+    select 1 from information_schema.columns
+    where table_schema = 'public' and table_name = 'proposals' and column_name = 'title' and is_nullable = 'NO'
+  ) then
+    alter table proposals alter column title drop not null;
+  end if;
+end$$;
+
 -- ==============================================================================
 -- 2. Proposal & Signing Tables
 -- ==============================================================================
@@ -91,6 +111,9 @@ create table if not exists proposal_templates (
   updated_at timestamptz default now()
 );
 
+-- 'client_proposal' templates seed proposal content; 'pdf_layout' templates override the PDF layout
+alter table proposal_templates add column if not exists template_type text default 'client_proposal';
+
 -- Proposal Versions
 create table if not exists proposal_versions (
   id uuid primary key default uuid_generate_v4(),
@@ -102,6 +125,35 @@ create table if not exists proposal_versions (
   created_by uuid references auth.users(id)
 );
 
+-- Denormalized owner org (the live schema already has it)
+alter table proposal_versions add column if not exists org_id uuid references organizations(id);
+
+-- Delta storage: a 'snapshot' row holds the full content_json; a 'delta' row
+-- holds a patch (delta_json, see jsonb_diff) against the previous version and
+-- only keeps content_json while it is the latest version or while pinned
+-- (signing sessions point at it)
+alter table proposal_versions add column if not exists storage_kind text not null default 'snapshot';
+alter table proposal_versions add column if not exists delta_json jsonb;
+alter table proposal_versions add column if not exists pinned boolean not null default false;
+alter table proposal_versions alter column content_json drop not null;
+
+-- Hash of the version's full content (jsonb_content_hash), for skipping no-op saves
+alter table proposal_versions add column if not exists content_hash text;
+
+-- Working drafts: rapid autosaves by one user overwrite this slot and become a
+-- numbered version after a quiet period, on publish, or when the slot gets
+-- too old (flush_working_drafts)
+create table if not exists proposal_working_drafts (
+  proposal_id uuid references proposals(id) on delete cascade not null,
+  user_id uuid not null,
+  content_json jsonb not null,
+  content_hash text not null,
+  first_saved_at timestamptz default now(),
+  updated_at timestamptz default now(),
+  primary key (proposal_id, user_id)
+);
+create index if not exists proposal_working_drafts_updated_idx on proposal_working_drafts (updated_at);
+
 -- Signing Sessions (The link sent to a user)
 create table if not exists signing_sessions (
   id uuid primary key default uuid_generate_v4(),
@@ -117,6 +169,58 @@ create table if not exists signing_sessions (
   created_at timestamptz default now()
 );
 
+-- Signed-PDF finalization (execution/signing_finalize.py): signing marks the
+-- session 'pending', a background worker claims it ('rendering'), appends the
+-- signature page to the version PDF and links the result ('done'), or gives
+-- up after a few attempts ('failed')
+alter table signing_sessions add column if not exists finalization_status text;
+alter table signing_sessions add column if not exists finalization_attempts int not null default 0;
+alter table signing_sessions add column if not exists finalization_started_at timestamptz;
+alter table signing_sessions add column if not exists finalization_error text;
+alter table signing_sessions add column if not exists final_file_id uuid references files(id);
+-- Workers resuming after a restart look for unfinished sessions only
+create index if not exists signing_sessions_finalization_idx on signing_sessions (finalization_status)
+  where finalization_status in ('pending', 'rendering');
+
+-- Expiry sweeps (execution/sweeper.py) find lapsed links by status and expiry
+create index if not exists signing_sessions_status_expires_idx on signing_sessions (status, expires_at);
+
+-- Signing-link changes are announced to the API workers, which cache the
+-- public signing view per token (execution/workflow_signing.py). The payload
+-- is the sha256 of the token, so tokens themselves never go over NOTIFY.
+-- A first view (pending -> viewed) doesn't change what the view shows.
+create or replace function notify_signing_change()
+returns trigger
+language plpgsql
+as $$
+begin
+  if old.expires_at = new.expires_at
+     and (old.status = new.status or (old.status = 'pending' and new.status = 'viewed')) then
+    return null;
+  end if;
+  perform pg_notify('signing_changes', encode(sha256(convert_to(old.token, 'UTF8')), 'hex'));
+  return null;
+end;
+$$;
+
+drop trigger if exists signing_sessions_notify on signing_sessions;
+create trigger signing_sessions_notify
+  after update on signing_sessions
+  for each row execute function notify_signing_change();
+
+-- Expired links moved out of signing_sessions by archive_signing_sessions,
+-- with the full row as it was (so later column changes don't matter here).
+-- They still count in the dashboard (see the counter triggers below).
+create table if not exists signing_sessions_archive (
+  id uuid primary key,
+  proposal_version_id uuid not null,
+  token text not null,
+  status text not null,
+  expires_at timestamptz,
+  archived_at timestamptz not null default now(),
+  session jsonb not null
+);
+
 -- Signatures (The actual capture)
 create table if not exists signatures (
   id uuid primary key default uuid_generate_v4(),
@@ -129,6 +233,93 @@ create table if not exists signatures (
   ip_address text
 );
 
+-- Event log (execution/events.py writes it in batches with client-generated
+-- ids, so replaying a spool is idempotent). The live table predates this
+-- file, hence the column-by-column adds
+create table if not exists events (
+  id uuid primary key default uuid_generate_v4(),
+  org_id uuid references organizations(id) not null,
+  created_at timestamptz default now()
+);
+alter table events add column if not exists event_type text;
+alter table events add column if not exists entity_type text;
+alter table events add column if not exists entity_id uuid;
+alter table events add column if not exists actor_id uuid;
+alter table events add column if not exists payload jsonb not null default '{}'::jsonb;
+create index if not exists events_org_created_idx on events (org_id, created_at desc, id desc);
+
+-- Keyset pagination indexes for the list endpoints (org_id, created_at desc, id desc)
+create index if not exists clients_org_created_idx on clients (org_id, created_at desc, id desc);
+create index if not exists projects_org_created_idx on projects (org_id, created_at desc, id desc);
+create index if not exists proposals_org_created_idx on proposals (org_id, created_at desc, id desc);
+create index if not exists proposal_templates_org_created_idx on proposal_templates (org_id, created_at desc, id desc);
+-- Export paging (data_export.py): oldest change first
+create index if not exists proposals_org_updated_idx on proposals (org_id, updated_at, id);
+create index if not exists proposal_versions_org_created_idx on proposal_versions (org_id, created_at, id);
+
+-- Incremental exports pick up changed proposals by updated_at, so every
+-- update bumps it, whichever path makes it (RPCs, PostgREST)
+create or replace function touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists proposals_touch_updated_at on proposals;
+create trigger proposals_touch_updated_at
+  before update on proposals
+  for each row execute function touch_updated_at();
+
+drop trigger if exists proposal_templates_touch_updated_at on proposal_templates;
+create trigger proposal_templates_touch_updated_at
+  before update on proposal_templates
+  for each row execute function touch_updated_at();
+
+-- Template changes are announced to the API workers, which cache template
+-- reads per org (execution/template_cache.py). The payload is the org id;
+-- Postgres folds identical notifications within a transaction into one.
+create or replace function notify_template_change()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform pg_notify('template_changes', old.org_id::text);
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform pg_notify('template_changes', new.org_id::text);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists proposal_templates_notify on proposal_templates;
+create trigger proposal_templates_notify
+  after insert or update or delete on proposal_templates
+  for each row execute function notify_template_change();
+-- Version numbers are allocated by append_proposal_version; the unique index
+-- backs it up (and serves latest-version lookups)
+drop index if exists proposal_versions_proposal_number_idx;
+-- Renumber proposals that already collided (earlier racing saves) so the
+-- index can be built; versions keep their order and ids
+update proposal_versions pv
+set version_number = renumbered.rn
+from (
+  select id, row_number() over (partition by proposal_id order by version_number, created_at, id) as rn
+  from proposal_versions
+  where proposal_id in (
+    select proposal_id from proposal_versions
+    group by proposal_id, version_number having count(*) > 1
+  )
+) renumbered
+where pv.id = renumbered.id
+and pv.version_number <> renumbered.rn;
+create unique index if not exists proposal_versions_proposal_number_key on proposal_versions (proposal_id, version_number);
+
 -- ==============================================================================
 -- 3. RLS Policies
 -- ==============================================================================
@@ -144,6 +335,9 @@ alter table proposal_templates enable row level security;
 alter table proposal_versions enable row level security;
 alter table signing_sessions enable row level security;
 alter table signatures enable row level security;
+alter table proposal_working_drafts enable row level security;
+alter table events enable row level security;
+alter table signing_sessions_archive enable row level security; -- service role only
 
 -- Helper Function: is_org_member
 create or replace function is_org_member(_org_id uuid)
@@ -239,6 +433,11 @@ create policy "Org members can view signing sessions"
   );
 
 -- Signatures RLS
+drop policy if exists "Org members can view events" on events;
+create policy "Org members can view events"
+  on events for select
+  using ( is_org_member(org_id) );
+
 drop policy if exists "Org members can view signatures" on signatures;
 create policy "Org members can view signatures"
   on signatures for select
@@ -257,12 +456,27 @@ create policy "Org members can view signatures"
 -- ==============================================================================
 
 -- GET PROPOSAL FOR SIGNING (Security Definer to bypass RLS for token holding guests)
+-- proposal_id / org_id were added for the event log; result columns can't
+-- change in place, so drop the older definition first
+do $$
+begin
+  if exists (
+    select 1 from pg_proc
+    where proname = 'get_proposal_for_signing'
+    and not ('org_id' = any(coalesce(proargnames, '{}')))
+  ) then
+    drop function get_proposal_for_signing(text);
+  end if;
+end$$;
+
 create or replace function get_proposal_for_signing(token_input text)
 returns table (
   proposal_title text,
   content_json jsonb,
   status proposal_status,
-  signer_email text
+  signer_email text,
+  proposal_id uuid,
+  org_id uuid
 ) 
 language plpgsql
 security definer
@@ -293,7 +507,9 @@ begin
     p.title as proposal_title,
     pv.content_json,
     session_record.status::proposal_status, -- cast text if needed, or if enum matches
-    session_record.signer_email
+    session_record.signer_email,
+    p.id,
+    coalesce(pv.org_id, p.org_id)
   from proposal_versions pv
   join proposals p on p.id = pv.proposal_id
   where pv.id = session_record.proposal_version_id;
@@ -349,7 +565,8 @@ begin
   set 
     status = 'signed',
     signed_at = now(),
-    viewer_user_agent = user_agent_input
+    viewer_user_agent = user_agent_input,
+    finalization_status = 'pending' -- picked up by signing_finalize.py
   where id = session_record.id;
   
   -- Update Proposal Status
@@ -362,3 +579,820 @@ begin
   return true;
 end;
 $$;
+
+-- JSON DELTAS
+-- A delta is a JSON array of patch operations in the spirit of RFC 6902:
+--   {"op": "add" | "remove" | "replace", "path": ["sections", 2, "body"], "value": ...}
+-- Paths are arrays of object keys / array indexes rather than JSON pointers.
+-- Arrays are diffed by position: shared indexes recursively, then appends or
+-- removals at the tail (removals from the end backwards).
+create or replace function jsonb_diff(old_doc jsonb, new_doc jsonb, path_input jsonb default '[]'::jsonb)
+returns jsonb
+language plpgsql
+immutable
+as $$
+declare
+  ops jsonb := '[]'::jsonb;
+  k text;
+  i int;
+  old_len int;
+  new_len int;
+begin
+  if old_doc = new_doc then
+    return ops;
+  end if;
+
+  if jsonb_typeof(old_doc) = 'object' and jsonb_typeof(new_doc) = 'object' then
+    for k in select jsonb_object_keys(old_doc) loop
+      if not new_doc ? k then
+        ops := ops || jsonb_build_array(jsonb_build_object('op', 'remove', 'path', path_input || to_jsonb(k)));
+      end if;
+    end loop;
+    for k in select jsonb_object_keys(new_doc) loop
+      if not old_doc ? k then
+        ops := ops || jsonb_build_array(jsonb_build_object('op', 'add', 'path', path_input || to_jsonb(k), 'value', new_doc -> k));
+      else
+        ops := ops || jsonb_diff(old_doc -> k, new_doc -> k, path_input || to_jsonb(k));
+      end if;
+    end loop;
+    return ops;
+  end if;
+
+  if jsonb_typeof(old_doc) = 'array' and jsonb_typeof(new_doc) = 'array' then
+    old_len := jsonb_array_length(old_doc);
+    new_len := jsonb_array_length(new_doc);
+    for i in 0 .. least(old_len, new_len) - 1 loop
+      ops := ops || jsonb_diff(old_doc -> i, new_doc -> i, path_input || to_jsonb(i));
+    end loop;
+    for i in old_len .. new_len - 1 loop
+      ops := ops || jsonb_build_array(jsonb_build_object('op', 'add', 'path', path_input || to_jsonb(i), 'value', new_doc -> i));
+    end loop;
+    for i in reverse old_len - 1 .. new_len loop
+      ops := ops || jsonb_build_array(jsonb_build_object('op', 'remove', 'path', path_input || to_jsonb(i)));
+    end loop;
+    return ops;
+  end if;
+
+  return jsonb_build_array(jsonb_build_object('op', 'replace', 'path', path_input, 'value', new_doc));
+end;
+$$;
+
+create or replace function jsonb_patch(doc jsonb, ops jsonb)
+returns jsonb
+language plpgsql
+immutable
+as $$
+declare
+  op jsonb;
+  op_path text[];
+begin
+  for op in select value from jsonb_array_elements(ops) loop
+    op_path := array(select jsonb_array_elements_text(op -> 'path'));
+    if cardinality(op_path) = 0 then
+      doc := op -> 'value';
+    elsif op ->> 'op' = 'remove' then
+      doc := doc #- op_path;
+    else
+      -- jsonb_set appends when an array index is one past the end
+      doc := jsonb_set(doc, op_path, op -> 'value', true);
+    end if;
+  end loop;
+  return doc;
+end;
+$$;
+
+-- PROPOSAL VERSION CONTENT
+-- Materializes any version: the nearest stored content at or below it, with
+-- the deltas after that applied in order
+create or replace function get_proposal_version_content(proposal_id_input uuid, version_number_input int)
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+  base_number int;
+  doc jsonb;
+  delta jsonb;
+begin
+  select version_number, content_json into base_number, doc
+  from proposal_versions
+  where proposal_id = proposal_id_input
+  and version_number <= version_number_input
+  and content_json is not null
+  order by version_number desc
+  limit 1;
+
+  if not found then
+    return null;
+  end if;
+
+  for delta in
+    select delta_json from proposal_versions
+    where proposal_id = proposal_id_input
+    and version_number > base_number
+    and version_number <= version_number_input
+    order by version_number
+  loop
+    doc := jsonb_patch(doc, delta);
+  end loop;
+  return doc;
+end;
+$$;
+
+-- PIN PROPOSAL VERSION
+-- Keeps a version's full content stored for good (signing sessions, exports)
+-- Returns the version's proposal_id, org_id and version_number (used to log
+-- proposal_sent); older deployments return void, which can't change in place
+do $$
+begin
+  if exists (select 1 from pg_proc where proname = 'pin_proposal_version' and prorettype = 'void'::regtype) then
+    drop function pin_proposal_version(uuid);
+  end if;
+end$$;
+
+create or replace function pin_proposal_version(version_id_input uuid)
+returns jsonb
+language plpgsql
+as $$
+declare
+  pinned_version record;
+begin
+  update proposal_versions pv
+  set pinned = true,
+      content_json = coalesce(pv.content_json, get_proposal_version_content(pv.proposal_id, pv.version_number))
+  where pv.id = version_id_input
+  returning pv.proposal_id, pv.org_id, pv.version_number into pinned_version;
+
+  if not found then
+    return null;
+  end if;
+  return jsonb_build_object(
+    'proposal_id', pinned_version.proposal_id,
+    'org_id', coalesce(pinned_version.org_id, (select org_id from proposals where id = pinned_version.proposal_id)),
+    'version_number', pinned_version.version_number
+  );
+end;
+$$;
+
+-- Versions that signing sessions already point at keep their content
+update proposal_versions set pinned = true
+where not pinned
+and id in (select proposal_version_id from signing_sessions);
+
+-- PIN PROPOSAL VERSIONS
+-- Batch form of pin_proposal_version, for bulk signing links: one row per
+-- version found (missing ids are simply absent).
+create or replace function pin_proposal_versions(version_ids_input uuid[])
+returns table (version_id uuid, proposal_id uuid, org_id uuid, version_number int)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  return query
+  update proposal_versions pv
+  set pinned = true,
+      content_json = coalesce(pv.content_json, get_proposal_version_content(pv.proposal_id, pv.version_number))
+  where pv.id = any(version_ids_input)
+  returning pv.id, pv.proposal_id,
+    coalesce(pv.org_id, (select p.org_id from proposals p where p.id = pv.proposal_id)),
+    pv.version_number;
+end;
+$$;
+
+create or replace function jsonb_content_hash(doc jsonb)
+returns text
+language sql
+immutable
+as $$
+  -- jsonb's text form is canonical (key order, whitespace), so equal content hashes equally
+  select encode(sha256(convert_to(doc::text, 'UTF8')), 'hex');
+$$;
+
+-- APPEND PROPOSAL VERSION
+-- Allocates the next version number, inserts the version and bumps the
+-- proposal's updated_at in one transaction. The update takes the proposal's
+-- row lock first, so concurrent saves of one proposal queue up instead of
+-- reading the same max(version_number).
+-- Every snapshot_interval_input-th version (and any version whose delta
+-- would not be smaller) is stored as a snapshot, the rest as deltas against
+-- the previous version. The new version always carries its full content;
+-- the previous one drops it unless it is a snapshot or pinned.
+drop function if exists append_proposal_version(uuid, jsonb, uuid);
+create or replace function append_proposal_version(
+  proposal_id_input uuid,
+  content_input jsonb,
+  created_by_input uuid default null,
+  snapshot_interval_input int default 20
+)
+returns setof proposal_versions
+language plpgsql
+as $$
+declare
+  proposal_org_id uuid;
+  previous proposal_versions%rowtype;
+  last_snapshot_number int;
+  next_kind text := 'snapshot';
+  next_delta jsonb;
+begin
+  update proposals
+  set updated_at = now()
+  where id = proposal_id_input
+  returning org_id into proposal_org_id;
+
+  if not found then
+    raise exception 'Proposal % not found', proposal_id_input using errcode = 'P0002';
+  end if;
+
+  select * into previous
+  from proposal_versions
+  where proposal_id = proposal_id_input
+  order by version_number desc
+  limit 1;
+
+  if found and previous.content_json is not null then
+    select max(version_number) into last_snapshot_number
+    from proposal_versions
+    where proposal_id = proposal_id_input
+    and storage_kind = 'snapshot';
+
+    if previous.version_number + 1 - coalesce(last_snapshot_number, 0) < greatest(snapshot_interval_input, 1) then
+      next_delta := jsonb_diff(previous.content_json, content_input);
+      if octet_length(next_delta::text) < octet_length(content_input::text) then
+        next_kind := 'delta';
+      else
+        next_delta := null;
+      end if;
+    end if;
+  end if;
+
+  if previous.id is not null and previous.storage_kind = 'delta' and not previous.pinned then
+    -- Re-checked under the row lock: a pin may have landed since `previous` was read
+    update proposal_versions set content_json = null where id = previous.id and not pinned;
+  end if;
+
+  return query
+  insert into proposal_versions (proposal_id, org_id, version_number, content_json, content_hash, storage_kind, delta_json, created_by)
+  values (
+    proposal_id_input, proposal_org_id, coalesce(previous.version_number, 0) + 1,
+    content_input, jsonb_content_hash(content_input), next_kind, next_delta, created_by_input
+  )
+  returning *;
+end;
+$$;
+
+-- COMPACT PROPOSAL VERSIONS
+-- Rewrites a proposal's existing full-copy versions into the snapshot/delta
+-- layout used by append_proposal_version. Safe to re-run; returns the number
+-- of versions converted to deltas.
+create or replace function compact_proposal_versions(proposal_id_input uuid, snapshot_interval_input int default 20)
+returns int
+language plpgsql
+as $$
+declare
+  v proposal_versions%rowtype;
+  latest_number int;
+  previous_content jsonb;
+  last_snapshot_number int := 0;
+  current_content jsonb;
+  delta jsonb;
+  converted int := 0;
+begin
+  -- Same lock as append_proposal_version, so saves wait for the rewrite
+  perform 1 from proposals where id = proposal_id_input for update;
+
+  select max(version_number) into latest_number
+  from proposal_versions where proposal_id = proposal_id_input;
+
+  for v in
+    select * from proposal_versions
+    where proposal_id = proposal_id_input
+    order by version_number
+  loop
+    if v.storage_kind = 'delta' then
+      current_content := coalesce(v.content_json, jsonb_patch(previous_content, v.delta_json));
+    else
+      current_content := v.content_json;
+      if previous_content is not null
+        and v.version_number - last_snapshot_number < greatest(snapshot_interval_input, 1) then
+        delta := jsonb_diff(previous_content, current_content);
+        if octet_length(delta::text) < octet_length(current_content::text) then
+          update proposal_versions
+          set storage_kind = 'delta',
+              delta_json = delta,
+              content_json = case when v.pinned or v.version_number = latest_number then content_json end
+          where id = v.id;
+          converted := converted + 1;
+        else
+          last_snapshot_number := v.version_number;
+        end if;
+      else
+        last_snapshot_number := v.version_number;
+      end if;
+    end if;
+    previous_content := current_content;
+  end loop;
+  return converted;
+end;
+$$;
+
+-- SAVE PROPOSAL DRAFT
+-- Entry point for editor saves. Returns {"status", "version", "working_draft"}:
+--   unchanged - content matches the user's working draft or the latest version; nothing written
+--   drafted   - coalesce_seconds_input > 0: stored in the user's working draft slot only
+--   created   - a new numbered version was appended (publish, or coalescing off)
+-- "version" is the latest version's metadata (without content).
+create or replace function save_proposal_draft(
+  proposal_id_input uuid,
+  content_input jsonb,
+  created_by_input uuid default null,
+  coalesce_seconds_input int default 0,
+  publish_input boolean default false,
+  snapshot_interval_input int default 20
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  new_hash text := jsonb_content_hash(content_input);
+  latest proposal_versions%rowtype;
+  draft proposal_working_drafts%rowtype;
+  save_status text;
+begin
+  -- Serializes saves of one proposal (append_proposal_version takes the same lock)
+  perform 1 from proposals where id = proposal_id_input for update;
+  if not found then
+    raise exception 'Proposal % not found', proposal_id_input using errcode = 'P0002';
+  end if;
+
+  select * into latest
+  from proposal_versions
+  where proposal_id = proposal_id_input
+  order by version_number desc
+  limit 1;
+
+  if created_by_input is not null then
+    select * into draft
+    from proposal_working_drafts
+    where proposal_id = proposal_id_input and user_id = created_by_input;
+  end if;
+
+  if coalesce_seconds_input > 0 and not publish_input and created_by_input is not null then
+    if draft.content_hash = new_hash or (draft.proposal_id is null and latest.content_hash = new_hash) then
+      save_status := 'unchanged';
+    elsif draft.proposal_id is not null and latest.content_hash = new_hash then
+      -- Edited back to the saved version: nothing left to flush
+      delete from proposal_working_drafts where proposal_id = proposal_id_input and user_id = created_by_input;
+      draft := null;
+      save_status := 'unchanged';
+    else
+      insert into proposal_working_drafts (proposal_id, user_id, content_json, content_hash)
+      values (proposal_id_input, created_by_input, content_input, new_hash)
+      on conflict (proposal_id, user_id) do update
+      set content_json = excluded.content_json,
+          content_hash = excluded.content_hash,
+          updated_at = now()
+      returning * into draft;
+      save_status := 'drafted';
+    end if;
+  else
+    -- The saved content supersedes the user's working draft
+    if draft.proposal_id is not null then
+      delete from proposal_working_drafts where proposal_id = proposal_id_input and user_id = created_by_input;
+      draft := null;
+    end if;
+
+    if latest.content_hash = new_hash then
+      save_status := 'unchanged';
+    else
+      select * into latest
+      from append_proposal_version(proposal_id_input, content_input, created_by_input, snapshot_interval_input);
+      save_status := 'created';
+    end if;
+  end if;
+
+  return jsonb_build_object(
+    'status', save_status,
+    'version', case when latest.id is not null then to_jsonb(latest) - 'content_json' - 'delta_json' end,
+    'working_draft', case when draft.proposal_id is not null then to_jsonb(draft) - 'content_json' end
+  );
+end;
+$$;
+
+-- FLUSH WORKING DRAFTS
+-- Turns working drafts that have been quiet for quiet_seconds_input (or were
+-- first saved more than max_age_seconds_input ago) into numbered versions.
+-- Locks are taken in the same order as saves (proposal, then draft) and never
+-- waited on: proposals being saved or flushed elsewhere are left for the next
+-- run, so every worker can call this. Returns the versions created.
+create or replace function flush_working_drafts(
+  quiet_seconds_input int,
+  max_age_seconds_input int default 300,
+  snapshot_interval_input int default 20,
+  batch_size_input int default 100
+)
+returns setof proposal_versions
+language plpgsql
+as $$
+declare
+  candidate record;
+  draft proposal_working_drafts%rowtype;
+  latest_hash text;
+begin
+  for candidate in
+    select proposal_id, user_id from proposal_working_drafts
+    where updated_at < now() - make_interval(secs => quiet_seconds_input)
+    or first_saved_at < now() - make_interval(secs => max_age_seconds_input)
+    order by updated_at
+    limit batch_size_input
+  loop
+    perform 1 from proposals where id = candidate.proposal_id for update skip locked;
+    continue when not found;
+
+    select * into draft
+    from proposal_working_drafts
+    where proposal_id = candidate.proposal_id and user_id = candidate.user_id
+    and (updated_at < now() - make_interval(secs => quiet_seconds_input)
+      or first_saved_at < now() - make_interval(secs => max_age_seconds_input))
+    for update skip locked;
+    continue when not found;
+
+    select content_hash into latest_hash
+    from proposal_versions
+    where proposal_id = draft.proposal_id
+    order by version_number desc
+    limit 1;
+
+    if latest_hash is distinct from draft.content_hash then
+      return query
+      select * from append_proposal_version(draft.proposal_id, draft.content_json, draft.user_id, snapshot_interval_input);
+    end if;
+
+    delete from proposal_working_drafts
+    where proposal_id = draft.proposal_id and user_id = draft.user_id;
+  end loop;
+end;
+$$;
+
+-- CREATE PROPOSALS FROM TEMPLATE
+-- Batch form of create_proposal_from_template: one draft proposal per
+-- project, with the template's content as version 1, in one transaction.
+-- '{project}' in the title becomes each project's name. Projects that aren't
+-- in the org come back with an error rather than failing the batch. With
+-- pin_input the new versions are pinned up front (signing links follow).
+create or replace function create_proposals_from_template(
+  org_id_input uuid,
+  template_id_input uuid,
+  project_ids_input uuid[],
+  title_input text,
+  created_by_input uuid,
+  pin_input boolean default false
+)
+returns table (project_id uuid, proposal_id uuid, version_id uuid, client_email text, error text)
+language plpgsql
+as $$
+#variable_conflict use_column
+declare
+  template_content jsonb;
+begin
+  select t.content_json into template_content
+  from proposal_templates t
+  where t.id = template_id_input and t.org_id = org_id_input;
+
+  if not found then
+    raise exception 'Template % not found', template_id_input using errcode = 'P0002';
+  end if;
+
+  return query
+  with requested as (
+    select distinct r.id from unnest(project_ids_input) as r(id)
+  ),
+  found_projects as (
+    select p.id, p.client_id, p.name, c.email
+    from projects p
+    join requested on requested.id = p.id
+    left join clients c on c.id = p.client_id
+    where p.org_id = org_id_input
+  ),
+  new_proposals as (
+    insert into proposals (org_id, project_id, client_id, name)
+    select org_id_input, fp.id, fp.client_id, replace(title_input, '{project}', fp.name)
+    from found_projects fp
+    returning proposals.id, proposals.project_id
+  ),
+  new_versions as (
+    insert into proposal_versions (proposal_id, org_id, version_number, content_json, content_hash, created_by, pinned)
+    select np.id, org_id_input, 1, template_content, jsonb_content_hash(template_content), created_by_input, pin_input
+    from new_proposals np
+    returning proposal_versions.id, proposal_versions.proposal_id
+  )
+  select r.id, np.id, nv.id, fp.email, case when np.id is null then 'Project not found' end
+  from requested r
+  left join found_projects fp on fp.id = r.id
+  left join new_proposals np on np.project_id = r.id
+  left join new_versions nv on nv.proposal_id = np.id;
+end;
+$$;
+
+-- RENEW SIGNING SESSIONS
+-- Extends an org's unsigned links in place (same token, so links already sent
+-- keep working): the ones named in tokens_input, and/or those expiring within
+-- expiring_within_input. Expiry moves to at least now() + expires_in_input;
+-- links already marked expired go back to pending (viewed if opened), and
+-- their expired proposals back to sent (viewed if a renewed link was opened).
+create or replace function renew_signing_sessions(
+  org_id_input uuid,
+  tokens_input text[] default null,
+  expiring_within_input interval default null,
+  expires_in_input interval default interval '7 days'
+)
+returns table (
+  session_id uuid, token text, signer_email text, proposal_version_id uuid,
+  proposal_id uuid, expires_at timestamptz, status text
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  if tokens_input is null and expiring_within_input is null then
+    raise exception 'Pass tokens or an expiry window' using errcode = '22023';
+  end if;
+
+  return query
+  with renewed as (
+    update signing_sessions s
+    set expires_at = greatest(s.expires_at, now() + expires_in_input),
+        status = case
+          when s.status <> 'expired' then s.status
+          when s.opened_at is null then 'pending'
+          else 'viewed'
+        end
+    from proposal_versions pv
+    join proposals p on p.id = pv.proposal_id
+    where pv.id = s.proposal_version_id
+    and p.org_id = org_id_input
+    and s.status in ('pending', 'viewed', 'expired')
+    and (tokens_input is null or s.token = any(tokens_input))
+    and (expiring_within_input is null or s.expires_at < now() + expiring_within_input)
+    returning s.id, s.token, s.signer_email, s.proposal_version_id, pv.proposal_id, s.expires_at, s.status
+  ),
+  -- A renewed link is open again, so its proposal no longer is expired
+  -- (two updates, as a case expression would be text, not proposal_status)
+  reopened_viewed as (
+    update proposals p
+    set status = 'viewed'
+    where p.id in (select r.proposal_id from renewed r where r.status = 'viewed')
+    and p.status = 'expired'
+  ),
+  reopened_sent as (
+    update proposals p
+    set status = 'sent'
+    where p.id in (select r.proposal_id from renewed r)
+    and p.id not in (select r.proposal_id from renewed r where r.status = 'viewed')
+    and p.status = 'expired'
+  )
+  select r.id, r.token, r.signer_email, r.proposal_version_id, r.proposal_id, r.expires_at, r.status
+  from renewed r;
+end;
+$$;
+
+-- EXPIRE SIGNING SESSIONS
+-- One batch of the expiry sweep: marks up to batch_size_input lapsed links
+-- 'expired' (public lookups already ignore them; this keeps statuses and the
+-- dashboard honest) and expires their proposals once no link is left open,
+-- signed or declined. Rows a concurrent sign or renew holds are skipped until
+-- the next sweep. Call until sessions_expired < batch_size_input.
+create or replace function expire_signing_sessions(batch_size_input int default 1000)
+returns table (sessions_expired int, proposals_expired int)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  return query
+  with expired as (
+    update signing_sessions s
+    set status = 'expired'
+    where s.id in (
+      select id from signing_sessions
+      where status in ('pending', 'viewed') and expires_at <= now()
+      order by expires_at
+      limit batch_size_input
+      for update skip locked
+    )
+    returning s.proposal_version_id
+  ),
+  expired_proposals as (
+    -- Sees signing_sessions as of before the update above, which is fine:
+    -- the links it expires have lapsed, so they don't count as open either
+    update proposals p
+    set status = 'expired'
+    where p.id in (
+      select pv.proposal_id
+      from expired e
+      join proposal_versions pv on pv.id = e.proposal_version_id
+    )
+    and p.status in ('draft', 'sent', 'viewed')
+    and not exists (
+      select 1
+      from proposal_versions pv
+      join signing_sessions s on s.proposal_version_id = pv.id
+      where pv.proposal_id = p.id
+      and (s.status in ('signed', 'declined') or (s.status in ('pending', 'viewed') and s.expires_at > now()))
+    )
+    returning p.id
+  )
+  select (select count(*)::int from expired), (select count(*)::int from expired_proposals);
+end;
+$$;
+
+-- ARCHIVE SIGNING SESSIONS
+-- One batch of the archive sweep: moves links that expired more than
+-- older_than_input ago (and were never signed) to signing_sessions_archive,
+-- keeping signing_sessions (and every token lookup) small. Returns the number
+-- of rows moved; call until it is below batch_size_input.
+create or replace function archive_signing_sessions(
+  older_than_input interval default interval '30 days',
+  batch_size_input int default 1000
+)
+returns int
+language plpgsql
+as $$
+declare
+  moved_count int;
+begin
+  with moved as (
+    delete from signing_sessions s
+    where s.id in (
+      select id from signing_sessions
+      where status = 'expired' and expires_at < now() - older_than_input
+      order by expires_at
+      limit batch_size_input
+      for update skip locked
+    )
+    and not exists (select 1 from signatures g where g.signing_session_id = s.id)
+    returning s.*
+  )
+  insert into signing_sessions_archive (id, proposal_version_id, token, status, expires_at, session)
+  select m.id, m.proposal_version_id, m.token, m.status, m.expires_at, to_jsonb(m)
+  from moved m
+  on conflict (id) do nothing;
+  get diagnostics moved_count = row_count;
+  return moved_count;
+end;
+$$;
+
+-- ==============================================================================
+-- 5. Dashboard Counters
+-- ==============================================================================
+-- Per-org counts (and proposal value) by status, kept current by statement
+-- triggers on the source tables, so GET /views/dashboard reads a handful of
+-- rows however large the org is. Every write path is covered: API inserts,
+-- the signing RPCs, seeding and manual SQL alike.
+
+create table if not exists org_dashboard_counters (
+  org_id uuid references organizations(id) on delete cascade not null,
+  kind text not null, -- 'client', 'project', 'proposal', 'signing_link'
+  status text not null, -- the row's status ('all' for clients)
+  row_count bigint not null default 0,
+  value_total numeric not null default 0, -- sum of proposals.total
+  updated_at timestamptz default now(),
+  primary key (org_id, kind, status)
+);
+
+alter table org_dashboard_counters enable row level security;
+
+drop policy if exists "Org members can view dashboard counters" on org_dashboard_counters;
+create policy "Org members can view dashboard counters"
+  on org_dashboard_counters for select
+  using ( is_org_member(org_id) );
+
+-- MAINTAIN DASHBOARD COUNTERS
+-- Shared statement-level trigger. Arguments: kind, then SQL expressions over a
+-- changed row `r` for its org, status and value. Old rows count -1, new rows
+-- +1, and a multi-row statement (a seed batch) becomes one upsert per
+-- (org, status). Rows are upserted in key order so concurrent statements
+-- lock counters in the same order.
+create or replace function maintain_dashboard_counters()
+returns trigger
+language plpgsql
+security definer
+as $$
+declare
+  row_sql text := 'select %s as org_id, (%s)::text as status, %s as n, %s as v from %s r';
+  changes text;
+begin
+  changes := case tg_op
+    when 'INSERT' then format(row_sql, tg_argv[1], tg_argv[2], '1', tg_argv[3], 'new_rows')
+    when 'DELETE' then format(row_sql, tg_argv[1], tg_argv[2], '-1', '-(' || tg_argv[3] || ')', 'old_rows')
+    else format(row_sql, tg_argv[1], tg_argv[2], '1', tg_argv[3], 'new_rows')
+      || ' union all '
+      || format(row_sql, tg_argv[1], tg_argv[2], '-1', '-(' || tg_argv[3] || ')', 'old_rows')
+  end;
+
+  execute format($sql$
+    insert into org_dashboard_counters as c (org_id, kind, status, row_count, value_total)
+    select org_id, %L, status, sum(n), sum(v)
+    from (%s) changes
+    where org_id is not null and status is not null
+    group by org_id, status
+    having sum(n) <> 0 or sum(v) <> 0
+    order by org_id, status
+    on conflict (org_id, kind, status) do update
+    set row_count = c.row_count + excluded.row_count,
+        value_total = c.value_total + excluded.value_total,
+        updated_at = now()
+  $sql$, tg_argv[0], changes);
+  return null;
+end;
+$$;
+
+-- REBUILD DASHBOARD COUNTERS
+-- Recomputes counters from the source tables (all orgs, or one), e.g. after
+-- bulk changes made with triggers disabled. Blocks writers to the counted
+-- tables while it runs so no delta is lost in between.
+create or replace function rebuild_dashboard_counters(org_id_input uuid default null)
+returns void
+language plpgsql
+security definer
+as $$
+begin
+  lock table clients, projects, proposals, signing_sessions, signing_sessions_archive in share mode;
+
+  delete from org_dashboard_counters
+  where org_id_input is null or org_id = org_id_input;
+
+  insert into org_dashboard_counters (org_id, kind, status, row_count, value_total)
+  select org_id, 'client', 'all', count(*), 0
+  from clients
+  where org_id_input is null or org_id = org_id_input
+  group by org_id
+  union all
+  select org_id, 'project', status::text, count(*), 0
+  from projects
+  where (org_id_input is null or org_id = org_id_input) and status is not null
+  group by org_id, status
+  union all
+  select org_id, 'proposal', status::text, count(*), coalesce(sum(total), 0)
+  from proposals
+  where (org_id_input is null or org_id = org_id_input) and status is not null
+  group by org_id, status
+  union all
+  select coalesce(pv.org_id, p.org_id), 'signing_link', ss.status, count(*), 0
+  from signing_sessions ss
+  join proposal_versions pv on pv.id = ss.proposal_version_id
+  join proposals p on p.id = pv.proposal_id
+  where org_id_input is null or coalesce(pv.org_id, p.org_id) = org_id_input
+  group by coalesce(pv.org_id, p.org_id), ss.status
+  union all
+  select coalesce(pv.org_id, p.org_id), 'signing_link', sa.status, count(*), 0
+  from signing_sessions_archive sa
+  join proposal_versions pv on pv.id = sa.proposal_version_id
+  join proposals p on p.id = pv.proposal_id
+  where org_id_input is null or coalesce(pv.org_id, p.org_id) = org_id_input
+  group by coalesce(pv.org_id, p.org_id), sa.status;
+end;
+$$;
+
+-- Transition tables can't be shared between events, hence one trigger per event
+do $$
+declare
+  source record;
+  event text;
+begin
+  for source in
+    select * from (values
+      ('clients', 'client', 'r.org_id', '''all''', '0'),
+      ('projects', 'project', 'r.org_id', 'r.status', '0'),
+      ('proposals', 'proposal', 'r.org_id', 'r.status', 'coalesce(r.total, 0)'),
+      ('signing_sessions', 'signing_link',
+        '(select coalesce(pv.org_id, p.org_id) from proposal_versions pv join proposals p on p.id = pv.proposal_id where pv.id = r.proposal_version_id)',
+        'r.status', '0'),
+      -- Archiving moves a link between these two tables; its count stays put
+      ('signing_sessions_archive', 'signing_link',
+        '(select coalesce(pv.org_id, p.org_id) from proposal_versions pv join proposals p on p.id = pv.proposal_id where pv.id = r.proposal_version_id)',
+        'r.status', '0')
+    ) as t(table_name, kind, org_expr, status_expr, value_expr)
+  loop
+    foreach event in array array['insert', 'update', 'delete'] loop
+      execute format('drop trigger if exists %I on %I', source.table_name || '_dashboard_' || event, source.table_name);
+      execute format(
+        'create trigger %I after %s on %I referencing %s for each statement '
+        'execute function maintain_dashboard_counters(%L, %L, %L, %L)',
+        source.table_name || '_dashboard_' || event, event, source.table_name,
+        case event
+          when 'insert' then 'new table as new_rows'
+          when 'delete' then 'old table as old_rows'
+          else 'old table as old_rows new table as new_rows'
+        end,
+        source.kind, source.org_expr, source.status_expr, source.value_expr
+      );
+    end loop;
+  end loop;
+end$$;
+
+-- First run: count what is already there (same transaction as the triggers)
+do $$
+begin
+  if not exists (select 1 from org_dashboard_counters) then
+    perform rebuild_dashboard_counters();
+  end if;
+end$$;
@@ -1,79 +1,249 @@
+import argparse
+import datetime
+import os
 import random
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from postgrest.types import ReturnMethod
 from execution.supabase_client import get_client
-from execution.workflow_proposals import create_template, create_proposal_from_template, generate_signing_link
-import time
 
-supabase = get_client()
-
-def seed():
-    print("--- STARTING SEED ---")
-    
-    # 1. Create Organization (We need one owner user, but for script we might mimic one or just insert)
-    # Since we can't easily create auth users via client API without admin rights, 
-    # we will assumme we can insert into 'organizations' directly.
-    
-    org_id = str(uuid.uuid4())
-    print(f"Creating Org: {org_id}")
-    supabase.table("organizations").insert({"id": org_id, "name": "Demo Construction Co."}).execute()
-    
-    # 2. Create Clients
-    clients = []
-    for i in range(5):
-        c = {
-            "org_id": org_id,
-            "name": f"Client {i+1} Homeowner",
-            "email": f"client{i+1}@example.com"
-        }
-        res = supabase.table("clients").insert(c).execute()
-        clients.append(res.data[0])
-    print(f"Created {len(clients)} clients")
-    
-    # 3. Create Projects
-    projects = []
-    for c in clients:
-        p = {
-            "org_id": org_id,
-            "client_id": c["id"],
-            "name": f"{c['name']}'s Renovation",
-            "status": random.choice(["lead", "active", "completed"])
-        }
-        res = supabase.table("projects").insert(p).execute()
-        projects.append(res.data[0])
-    print(f"Created {len(projects)} projects")
-    
-    # 4. Create Template
-    tmpl = create_template(org_id, "Standard Bathroom Remodel", {
+# Versions need an author; defaults to the same demo user as workflow_proposals
+SEED_USER_ID = os.getenv("SEED_USER_ID") or "938d1d2f-bbcd-4c0e-b202-3d5ede2a166c"
+BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "1000"))
+SEED_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "seed.projexnest")
+# Timestamps count back from a fixed date so a seed is the same on every run
+SEED_BASE_DATE = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+# Far enough ahead that seeded open links aren't swept as expired
+SEED_LINK_DAYS = 730
+
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn")
+LAST_NAMES = ("Nguyen", "Garcia", "Smith", "Patel", "Kim", "Johnson", "Brown", "Martinez", "Lee", "Wilson")
+STREETS = ("Oak St", "Maple Ave", "Cedar Ln", "Pine Rd", "Elm Dr", "Birch Way")
+JOBS = ("Bathroom Remodel", "Kitchen Renovation", "Deck Build", "Roof Replacement", "Basement Finish", "Addition")
+SECTION_TITLES = ("Scope", "Materials", "Schedule", "Payment", "Warranty", "Exclusions", "Permits")
+LINE_ITEMS = ("Demo", "Framing", "Electrical", "Plumbing", "Drywall", "Tile", "Cabinets", "Paint", "Cleanup")
+
+# --- Deterministic generation ---
+# Every row is derived from (seed, org index, entity path), so ids are stable
+# across runs: re-running a seed skips rows that already exist, and any phase
+# can be regenerated without keeping earlier rows in memory.
+
+def _id(seed: int, *parts) -> str:
+    return str(uuid.uuid5(SEED_NAMESPACE, ":".join(str(p) for p in (seed,) + parts)))
+
+def _rng(seed: int, *parts) -> random.Random:
+    return random.Random(":".join(str(p) for p in (seed,) + parts))
+
+def _timestamp(rng: random.Random, max_days: int = 365) -> str:
+    when = SEED_BASE_DATE - datetime.timedelta(seconds=rng.uniform(0, max_days * 86400))
+    return when.isoformat()
+
+def _content(rng: random.Random) -> Dict[str, Any]:
+    return {
         "sections": [
-            {"title": "Scope", "content": "Full demo and rebuild."},
-            {"title": "Payment", "content": "50% down, 50% completion."}
-        ]
-    })
-    print(f"Created Template: {tmpl['id']}")
-    
-    # 5. Create Proposals & Links
-    for p in projects[:2]: # First 2 projects get proposals
-        print(f"Generating proposal for {p['name']}...")
-        result = create_proposal_from_template(org_id, p['id'], tmpl['id'], f"Proposal for {p['name']}")
-        prop = result['proposal']
-        ver = result['version']
-        
-        # Determine status
-        if random.random() > 0.5:
-             # Generate link
-             token = generate_signing_link(ver['id'], "client@example.com")
-             print(f" -> Generated Signing Link: /public/proposals/view?token={token}")
-             
-             # Optionally update status to 'sent'
-             supabase.table("proposals").update({"status": "sent"}).eq("id", prop['id']).execute()
-        
+            {"title": title, "content": f"{title} details. " + " ".join(rng.choice(LINE_ITEMS) for _ in range(rng.randint(10, 40)))}
+            for title in rng.sample(SECTION_TITLES, rng.randint(3, len(SECTION_TITLES)))
+        ],
+        "pricing": [
+            {"item": item, "amount": round(rng.uniform(200, 15000), 2)}
+            for item in rng.sample(LINE_ITEMS, rng.randint(2, 6))
+        ],
+    }
+
+def _edit(rng: random.Random, content: Dict[str, Any]) -> Dict[str, Any]:
+    """One autosave's worth of change."""
+    content = {"sections": [dict(s) for s in content["sections"]], "pricing": [dict(p) for p in content["pricing"]]}
+    if rng.random() < 0.7:
+        section = rng.choice(content["sections"])
+        section["content"] += " " + rng.choice(LINE_ITEMS)
+    else:
+        line = rng.choice(content["pricing"])
+        line["amount"] = round(line["amount"] * rng.uniform(0.9, 1.1), 2)
+    return content
+
+def _proposal_plan(seed: int, org: int, client: int, project: int, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Whether a project gets a proposal, and its shape; same answer every time it is asked."""
+    rng = _rng(seed, org, "proposal", client, project)
+    if rng.random() >= config["proposal_ratio"]:
+        return None
+    average = max(1, config["versions_per_proposal"])
+    linked = rng.random() < config["link_ratio"]
+    return {
+        "id": _id(seed, org, "proposal", client, project),
+        "versions": rng.randint(1, 2 * average - 1),
+        "linked": linked,
+        "status": rng.choice(("sent", "viewed", "signed")) if linked else "draft",
+    }
+
+def dataset_config(clients_per_org: int = 5, projects_per_client: int = 1, proposal_ratio: float = 0.4,
+                   versions_per_proposal: int = 1, link_ratio: float = 0.5, user_id: str = SEED_USER_ID) -> Dict[str, Any]:
+    return {
+        "clients_per_org": clients_per_org, "projects_per_client": projects_per_client,
+        "proposal_ratio": proposal_ratio, "versions_per_proposal": versions_per_proposal,
+        "link_ratio": link_ratio, "user_id": user_id,
+    }
+
+def org_rows(seed: int, org: int, config: Dict[str, Any]) -> Iterator[tuple]:
+    """Yields (table, row) for one org, parents before children."""
+    org_id = _id(seed, org, "org")
+    rng = _rng(seed, org, "org")
+    yield "organizations", {"id": org_id, "name": f"{rng.choice(LAST_NAMES)} Construction #{org + 1}"}
+    template_id = _id(seed, org, "template")
+    yield "proposal_templates", {
+        "id": template_id, "org_id": org_id, "name": "Standard Remodel",
+        "content_json": _content(rng), "template_type": "client_proposal",
+    }
+
+    clients, per_client = config["clients_per_org"], config["projects_per_client"]
+    for c in range(clients):
+        rng = _rng(seed, org, "client", c)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield "clients", {
+            "id": _id(seed, org, "client", c), "org_id": org_id,
+            "name": f"{first} {last}", "email": f"{first}.{last}.{org}.{c}@example.com".lower(),
+            "phone": f"555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}",
+            "created_at": _timestamp(rng),
+        }
+
+    for c in range(clients):
+        for p in range(per_client):
+            rng = _rng(seed, org, "project", c, p)
+            yield "projects", {
+                "id": _id(seed, org, "project", c, p), "org_id": org_id, "client_id": _id(seed, org, "client", c),
+                "name": rng.choice(JOBS), "status": rng.choice(("lead", "active", "completed")),
+                "created_at": _timestamp(rng),
+            }
+
+    for c in range(clients):
+        for p in range(per_client):
+            plan = _proposal_plan(seed, org, c, p, config)
+            if plan:
+                yield "proposals", {
+                    "id": plan["id"], "org_id": org_id, "project_id": _id(seed, org, "project", c, p),
+                    "name": f"Proposal {org + 1}-{c + 1}-{p + 1}", "status": plan["status"],
+                    "created_at": _timestamp(_rng(seed, org, "proposal-at", c, p)),
+                }
+
+    for c in range(clients):
+        for p in range(per_client):
+            plan = _proposal_plan(seed, org, c, p, config)
+            if not plan:
+                continue
+            rng = _rng(seed, org, "versions", c, p)
+            content = _content(rng)
+            for n in range(1, plan["versions"] + 1):
+                if n > 1:
+                    content = _edit(rng, content)
+                yield "proposal_versions", {
+                    "id": _id(seed, org, "version", c, p, n), "org_id": org_id, "proposal_id": plan["id"],
+                    "version_number": n, "content_json": content, "created_by": config["user_id"],
+                    # The signing session below reads this version's content
+                    "pinned": plan["linked"] and n == plan["versions"],
+                }
+
+    for c in range(clients):
+        for p in range(per_client):
+            plan = _proposal_plan(seed, org, c, p, config)
+            if plan and plan["linked"]:
+                yield "signing_sessions", {
+                    "id": _id(seed, org, "session", c, p),
+                    "proposal_version_id": _id(seed, org, "version", c, p, plan["versions"]),
+                    "token": _id(seed, org, "token", c, p),
+                    "status": {"sent": "pending", "viewed": "viewed", "signed": "signed"}[plan["status"]],
+                    "signer_email": f"client.{org}.{c}@example.com",
+                    "expires_at": (SEED_BASE_DATE + datetime.timedelta(days=SEED_LINK_DAYS)).isoformat(),
+                }
+
+# --- Loading ---
+
+class _Progress:
+    """Thread-safe row counters, reported at most every `interval` seconds."""
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self.orgs_done = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, table: str, rows: int, force: bool = False) -> None:
+        with self._lock:
+            self.counts[table] = self.counts.get(table, 0) + rows
+            now = time.monotonic()
+            if not force and now - self._last_report < self.interval:
+                return
+            self._last_report = now
+            line = self.line()
+        print(line)
+
+    def org_done(self) -> None:
+        with self._lock:
+            self.orgs_done += 1
+
+    def line(self) -> str:
+        total = sum(self.counts.values())
+        elapsed = time.monotonic() - self.started
+        tables = ", ".join(f"{table}={count}" for table, count in self.counts.items())
+        return f"Seeded {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f}/s), {self.orgs_done} orgs done: {tables}"
+
+def _flush(table: str, rows: List[Dict[str, Any]], progress: _Progress) -> None:
+    # Client-side ids make this an idempotent multi-row insert
+    get_client().table(table).upsert(rows, ignore_duplicates=True, returning=ReturnMethod.minimal).execute()
+    progress.add(table, len(rows))
+
+def _load(rows: Iterable[tuple], batch_size: int, progress: _Progress) -> None:
+    """Inserts (table, row) pairs in multi-row batches, keeping parent tables ahead of children."""
+    batch: List[Dict[str, Any]] = []
+    batch_table = None
+    for table, row in rows:
+        if table != batch_table or len(batch) >= batch_size:
+            if batch:
+                _flush(batch_table, batch, progress)
+            batch, batch_table = [], table
+        batch.append(row)
+    if batch:
+        _flush(batch_table, batch, progress)
+
+def seed(orgs: int = 1, clients_per_org: int = 5, projects_per_client: int = 1, proposal_ratio: float = 0.4,
+         versions_per_proposal: int = 1, link_ratio: float = 0.5, seed: int = 42, batch_size: int = BATCH_SIZE,
+         workers: int = 4, user_id: str = SEED_USER_ID) -> Dict[str, Any]:
+    """
+    Loads a synthetic dataset for demos and load testing.
+    Each org gets one template, `clients_per_org` clients with
+    `projects_per_client` projects each; `proposal_ratio` of projects get a
+    proposal with about `versions_per_proposal` versions, and `link_ratio` of
+    proposals a signing session. The same `seed` always produces the same rows,
+    so an interrupted run can simply be repeated. Orgs load in parallel on
+    `workers` threads.
+    """
+    config = dataset_config(clients_per_org, projects_per_client, proposal_ratio, versions_per_proposal, link_ratio, user_id)
+    print(f"--- STARTING SEED (seed={seed}, orgs={orgs}, clients/org={clients_per_org}) ---")
+    progress = _Progress()
+
+    def load_org(org: int) -> None:
+        _load(org_rows(seed, org, config), batch_size, progress)
+        progress.org_done()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="seed") as pool:
+        # list() re-raises the first failure
+        list(pool.map(load_org, range(orgs)))
+
+    print(progress.line())
     print("--- SEED COMPLETE ---")
+    return {
+        "seed": seed,
+        "orgs": [_id(seed, org, "org") for org in range(min(orgs, 100))],
+        "rows": dict(progress.counts),
+        "seconds": round(time.monotonic() - progress.started, 1),
+    }
 
 import logging
 
-# Configure logging to file
-logging.basicConfig(filename='seed_log.txt', level=logging.INFO, format='%(asctime)s %(message)s')
-
 def print(msg):
     logging.info(msg)
     # Also print to stdout just in case
@@ -81,8 +251,23 @@ def print(msg):
     builtins.print(msg)
 
 if __name__ == "__main__":
+    # Configure logging to file (CLI runs only; the API imports this module)
+    logging.basicConfig(filename='seed_log.txt', level=logging.INFO, format='%(asctime)s %(message)s')
+
+    parser = argparse.ArgumentParser(description="Seed synthetic ProjexNest data")
+    parser.add_argument("--orgs", type=int, default=1)
+    parser.add_argument("--clients-per-org", type=int, default=5)
+    parser.add_argument("--projects-per-client", type=int, default=1)
+    parser.add_argument("--proposal-ratio", type=float, default=0.4, help="Share of projects with a proposal")
+    parser.add_argument("--versions-per-proposal", type=int, default=1, help="Average versions per proposal")
+    parser.add_argument("--link-ratio", type=float, default=0.5, help="Share of proposals with a signing link")
+    parser.add_argument("--seed", type=int, default=42, help="Same seed, same data (re-runs skip existing rows)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per insert request")
+    parser.add_argument("--workers", type=int, default=4, help="Orgs loaded in parallel")
+    parser.add_argument("--user-id", default=SEED_USER_ID, help="Author of seeded versions (must exist in auth.users)")
+    args = parser.parse_args()
     try:
-        seed()
+        seed(**vars(args))
     except Exception as e:
         logging.error("SEED FAILED", exc_info=True)
         # Re-raise to simple print
@@ -90,8 +275,8 @@ if __name__ == "__main__":
         builtins.print(f"FAILED: {e}")
         if hasattr(e, 'message'):
              builtins.print(f"Message: {e.message}")
-        if hasattr(e, 'response'): 
+        if hasattr(e, 'response'):
              try:
-                 builtins.print(e.response.text()) 
+                 builtins.print(e.response.text())
              except: pass
         exit(1)
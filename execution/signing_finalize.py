@@ -0,0 +1,235 @@
+import datetime
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from execution.supabase_client import get_client, get_async_client
+import execution.events as events
+import execution.pdf_cache as pdf_cache
+import execution.pdf_generator as pdf
+import execution.render_service as render_service
+import execution.workflow_proposals as wp
+
+# Signed-PDF finalization. Signing only marks the session 'pending' (in
+# sign_proposal_with_token) and queues it here, so the sign request never
+# waits on a render. The worker reuses the version PDF rendered when the
+# version was saved and appends a signature page to it as a PDF incremental
+# update: the only layout work is that one page, and the signed document
+# starts with the exact bytes (and hash) of the version the signer saw.
+# The public page polls GET /public/proposals/{token}/final for the result.
+FINALIZE_WORKERS = int(os.getenv("FINALIZE_WORKERS", "1"))
+FINALIZE_MAX_ATTEMPTS = int(os.getenv("FINALIZE_MAX_ATTEMPTS", "3"))
+FINALIZE_RETRY_SECONDS = float(os.getenv("FINALIZE_RETRY_SECONDS", "10"))
+# A 'rendering' claim older than this belongs to a worker that died mid-way
+FINALIZE_STALE_SECONDS = float(os.getenv("FINALIZE_STALE_SECONDS", "300"))
+# Suggested to pollers while the PDF is being built
+POLL_AFTER_SECONDS = 2
+
+SESSION_FIELDS = (
+    "id, token, status, signer_email, signed_at, proposal_version_id, "
+    "finalization_status, finalization_attempts, finalization_started_at, "
+    "signatures(signer_name, signature_type, signature_data, consent_agreed, signed_at, ip_address)"
+)
+UNFINISHED = ("pending", "rendering")
+
+_executor = ThreadPoolExecutor(max_workers=FINALIZE_WORKERS, thread_name_prefix="finalize")
+_lock = threading.Lock()
+_stats = {"queued": 0, "finalized": 0, "retried": 0, "failed": 0, "skipped": 0}
+
+
+def _bump(stat: str) -> None:
+    with _lock:
+        _stats[stat] += 1
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def signed_pdf_path(version_path: str, session_id: str) -> str:
+    return f"{version_path[:-len('.pdf')]}-signed-{session_id[:8]}.pdf"
+
+
+def enqueue(token: str, delay: float = 0) -> None:
+    """Queues finalization of a signed session (after `delay` seconds, for retries)."""
+    _bump("queued")
+    if delay > 0:
+        timer = threading.Timer(delay, _executor.submit, (_finalize_safely, token))
+        timer.daemon = True
+        timer.start()
+    else:
+        _executor.submit(_finalize_safely, token)
+
+
+def _finalize_safely(token: str) -> None:
+    try:
+        finalize(token)
+    except Exception as e:
+        print(f"Error finalizing signed PDF: {e}")
+
+
+def _claim(supabase, session: Dict[str, Any]) -> bool:
+    """
+    Moves the session to 'rendering', counting the attempt. The update only
+    matches while nobody else has claimed it since we read it, so concurrent
+    workers (or a resume racing a fresh sign) finalize it once.
+    """
+    claimed = supabase.table("signing_sessions").update({
+        "finalization_status": "rendering",
+        "finalization_attempts": session["finalization_attempts"] + 1,
+        "finalization_started_at": _utcnow().isoformat(),
+    }).eq("id", session["id"]).eq(
+        "finalization_attempts", session["finalization_attempts"]
+    ).in_("finalization_status", list(UNFINISHED)).execute()
+    return bool(claimed.data)
+
+
+def _version_pdf(supabase, version_id: str) -> Optional[Dict[str, Any]]:
+    """The version and its stored PDF (rendered now if the save-time render hasn't landed yet)."""
+    select = "id, proposal_id, version_number, pdf_file_id, files(storage_path, sha256), proposals(id, org_id, project_id, name, title)"
+    version = supabase.table("proposal_versions").select(select).eq("id", version_id).single().execute().data
+    if version.get("files") is None:
+        wp.store_version_pdf(version_id)
+        version = supabase.table("proposal_versions").select(select).eq("id", version_id).single().execute().data
+    return version if version.get("files") else None
+
+
+def finalize(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Builds, stores and links the signed PDF for a signed session. Returns the
+    new `files` row, or None if there was nothing to do (not signed, already
+    finalized, or claimed by another worker). Failures put the session back
+    to 'pending' and schedule a retry, up to FINALIZE_MAX_ATTEMPTS.
+    """
+    # Sync client: this runs on the finalize thread, not on the event loop
+    supabase = get_client()
+    rows = supabase.table("signing_sessions").select(SESSION_FIELDS).eq("token", token).limit(1).execute().data
+    session = rows[0] if rows else None
+    if not session or session["status"] != "signed" or session.get("finalization_status") not in UNFINISHED:
+        _bump("skipped")
+        return None
+    if session["finalization_status"] == "rendering":
+        started = session.get("finalization_started_at")
+        if started and datetime.datetime.fromisoformat(started) > _utcnow() - datetime.timedelta(seconds=FINALIZE_STALE_SECONDS):
+            _bump("skipped")
+            return None
+    if not _claim(supabase, session):
+        _bump("skipped")
+        return None
+
+    try:
+        file_row = _build_signed_pdf(supabase, session)
+    except Exception as e:
+        attempts = session["finalization_attempts"] + 1
+        retry = attempts < FINALIZE_MAX_ATTEMPTS
+        supabase.table("signing_sessions").update({
+            "finalization_status": "pending" if retry else "failed",
+            "finalization_error": str(e)[:500],
+        }).eq("id", session["id"]).execute()
+        if retry:
+            _bump("retried")
+            enqueue(token, delay=FINALIZE_RETRY_SECONDS * attempts)
+        else:
+            _bump("failed")
+        print(f"Error finalizing signing session {session['id']} (attempt {attempts}): {e}")
+        return None
+
+    _bump("finalized")
+    return file_row
+
+
+def _build_signed_pdf(supabase, session: Dict[str, Any]) -> Dict[str, Any]:
+    version = _version_pdf(supabase, session["proposal_version_id"])
+    if version is None:
+        raise RuntimeError("Version PDF could not be stored")
+    stored, proposal = version["files"], version["proposals"]
+
+    # The version PDF is immutable; its hash doubles as the cache key (the
+    # download is checked against it before it is cached or signed)
+    base_pdf = pdf_cache.get_or_render(
+        stored["sha256"], lambda: wp.download_stored_pdf(stored["storage_path"], stored["sha256"])
+    )
+    html = pdf.render_signature_page_html(proposal, version, session, stored["sha256"])
+    signature_page = render_service.render(html, block=True)
+    signed_pdf = pdf.append_pdf_pages(base_pdf, signature_page)
+
+    path = signed_pdf_path(stored["storage_path"], session["id"])
+    if pdf.upload_pdf_to_storage(supabase, wp.PDF_BUCKET, path, signed_pdf) is None:
+        raise RuntimeError("Upload failed")
+
+    sha256 = hashlib.sha256(signed_pdf).hexdigest()
+    file_row = supabase.table("files").insert({
+        "org_id": proposal["org_id"],
+        "project_id": proposal.get("project_id"),
+        "name": f"v{version['version_number']}-signed.pdf",
+        "storage_path": path,
+        "mime_type": "application/pdf",
+        "size_bytes": len(signed_pdf),
+        "sha256": sha256
+    }).execute().data[0]
+
+    supabase.table("signing_sessions").update({
+        "finalization_status": "done",
+        "finalization_error": None,
+        "final_file_id": file_row["id"],
+    }).eq("id", session["id"]).execute()
+    events.emit("proposal_finalized", proposal["org_id"], "proposal", proposal["id"], payload={
+        "version_id": version["id"], "version_number": version["version_number"],
+        "signing_session_id": session["id"], "file_id": file_row["id"],
+        "sha256": sha256, "version_sha256": stored["sha256"]
+    })
+    return file_row
+
+
+def resume_pending(limit: int = 500) -> int:
+    """
+    Re-queues sessions left unfinished by a restart: 'pending' ones and
+    'rendering' claims gone stale. Returns how many were queued.
+    """
+    stale_before = (_utcnow() - datetime.timedelta(seconds=FINALIZE_STALE_SECONDS)).isoformat()
+    rows = get_client().table("signing_sessions").select("token").or_(
+        f"finalization_status.eq.pending,"
+        f"and(finalization_status.eq.rendering,finalization_started_at.lt.{stale_before})"
+    ).limit(limit).execute().data or []
+    for row in rows:
+        enqueue(row["token"])
+    return len(rows)
+
+
+def _resume_safely() -> None:
+    try:
+        resume_pending()
+    except Exception as e:
+        print(f"Error resuming signed-PDF finalization: {e}")
+
+
+def start() -> None:
+    """Picks up unfinished finalizations in the background (called at startup)."""
+    _executor.submit(_resume_safely)
+
+
+async def get_status_async(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Finalization status of a signing link, for the public page to poll:
+    {"status", "attempts", "file"} where status is None until the link is
+    signed, then pending / rendering / done / failed; `file` is the signed
+    PDF's {storage_path, sha256, size_bytes} once done. None for unknown tokens.
+    """
+    response = await get_async_client().table("signing_sessions").select(
+        "status, finalization_status, finalization_attempts, files(storage_path, sha256, size_bytes)"
+    ).eq("token", token).limit(1).execute()
+    if not response.data:
+        return None
+    session = response.data[0]
+    return {
+        "status": session.get("finalization_status"),
+        "attempts": session.get("finalization_attempts") or 0,
+        "file": session.get("files"),
+    }
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_stats, "workers": FINALIZE_WORKERS, "max_attempts": FINALIZE_MAX_ATTEMPTS}
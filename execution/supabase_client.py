@@ -1,17 +1,91 @@
+import asyncio
 import os
-from supabase import create_client, Client
+import threading
+import weakref
+from typing import Awaitable, Optional, Tuple, TypeVar
+
+import httpx
+from execution.metrics import HTTPX_EVENT_HOOKS
+from supabase import create_client, Client, AsyncClient, AsyncClientOptions
 from dotenv import load_dotenv
 
 load_dotenv()
 
-url: str = os.getenv("SUPABASE_URL")
-key: str = os.getenv("SUPABASE_SERVICE_KEY")
+# Connection pool settings for the async client (per event loop)
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+POOL_KEEPALIVE = int(os.getenv("SUPABASE_POOL_KEEPALIVE", "10"))
+TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
 
-if not url or not key:
-    raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env")
+# Clients are built on first use, so importing a module stays cheap and
+# works without credentials (tests, CLIs showing --help, worker boot)
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
 
-# Initialize client
-supabase: Client = create_client(url, key)
+def _credentials() -> Tuple[str, str]:
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+    if not url or not key:
+        raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_KEY in .env")
+    return url, key
 
 def get_client() -> Client:
-    return supabase
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_client(*_credentials())
+        return _client
+
+# --- Async client ---
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_KEEPALIVE),
+        timeout=httpx.Timeout(TIMEOUT_SECONDS),
+        http2=HTTP2,
+        follow_redirects=True,
+        event_hooks=HTTPX_EVENT_HOOKS, # per-call spans (execution/metrics.py)
+    )
+
+def get_async_client() -> AsyncClient:
+    """
+    Shared async client for the running event loop, backed by one pooled
+    keep-alive httpx.AsyncClient. Must be called from inside a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        # Built directly rather than via acreate_client: the service key needs
+        # no session lookup, and construction stays free of awaits (no races)
+        client = AsyncClient(*_credentials(), AsyncClientOptions(httpx_client=_build_http_client()))
+        _async_clients[loop] = client
+    return client
+
+async def close_async_client() -> None:
+    """Closes the running loop's pool (call on app shutdown)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and client.options.httpx_client is not None:
+        await client.options.httpx_client.aclose()
+
+# --- Sync bridge for scripts ---
+# Sync wrappers run their coroutine on one long-lived background loop, so the
+# pooled connections survive between calls (asyncio.run would close them).
+
+_sync_loop: asyncio.AbstractEventLoop = None
+_sync_loop_lock = threading.Lock()
+
+def _get_sync_loop() -> asyncio.AbstractEventLoop:
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="supabase-sync", daemon=True).start()
+        return _sync_loop
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Runs an async data-access call to completion from synchronous code."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_sync_loop()).result()
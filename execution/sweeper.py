@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter, Histogram
+
+from execution.supabase_client import get_client
+
+# Expiry sweeper. Lapsed signing links used to be noticed only when someone
+# opened them; this marks them 'expired' (and their proposals, once no link is
+# left open), then archives links that expired long ago so signing_sessions
+# stays small. Work is done in batches by the SQL functions in schema.sql
+# (expire_signing_sessions, archive_signing_sessions), each batch its own
+# short transaction that skips rows other requests hold.
+#
+# Every gunicorn worker runs the scheduler thread, but only the one holding a
+# Postgres advisory lock sweeps: the lock is taken on a dedicated session
+# connection (SWEEP_LOCK_URL, default DATABASE_URL) and held for as long as
+# that connection lives, so when the leader dies another worker takes over
+# within one interval. The batches tolerate an overlap (a manual sweep via
+# POST /workflow/proposals/expire, or a leader whose connection just dropped).
+SWEEP_ENABLED = os.getenv("SWEEP_ENABLED", "true").lower() in ("1", "true", "yes")
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "60"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "1000"))
+# Per step and sweep, so a large backlog is worked off over several sweeps
+SWEEP_MAX_BATCHES = int(os.getenv("SWEEP_MAX_BATCHES", "50"))
+SWEEP_ARCHIVE_AFTER_DAYS = int(os.getenv("SWEEP_ARCHIVE_AFTER_DAYS", "30"))
+# The lock needs a session (not a transaction-pooled) connection
+LOCK_URL = os.getenv("SWEEP_LOCK_URL") or os.getenv("DATABASE_URL")
+LOCK_KEY = 0x70726f6a6578 # arbitrary; one key per scheduled job
+
+SWEEP_SECONDS = Histogram(
+    "projexnest_sweep_duration_seconds", "Expiry sweep duration",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+SWEEP_ROWS = Counter("projexnest_sweep_rows", "Rows changed by the expiry sweeper", ["action"])
+
+_lock = threading.Lock()
+_sweep_lock = threading.Lock() # one sweep at a time per worker
+_stats: Dict[str, Any] = {
+    "sweeps": 0, "failures": 0, "sessions_expired": 0, "proposals_expired": 0, "sessions_archived": 0,
+    "last_sweep": None, "leader_changes": 0,
+}
+_scheduler: Optional[threading.Thread] = None
+_scheduler_stop = threading.Event()
+_leader = False
+
+
+def _batches(call) -> int:
+    """Runs one batch step until it comes back short; returns the rows it changed."""
+    total = 0
+    for _ in range(SWEEP_MAX_BATCHES):
+        changed = call()
+        total += changed
+        if changed < SWEEP_BATCH_SIZE:
+            break
+    return total
+
+
+def sweep() -> Dict[str, Any]:
+    """
+    Expires lapsed links and their proposals, then archives links expired
+    more than SWEEP_ARCHIVE_AFTER_DAYS ago. Returns the rows touched per step
+    and the duration.
+    """
+    supabase = get_client()
+    proposals_expired = 0
+
+    def expire():
+        nonlocal proposals_expired
+        row = (supabase.rpc("expire_signing_sessions", {"batch_size_input": SWEEP_BATCH_SIZE}).execute().data or [{}])[0]
+        proposals_expired += row.get("proposals_expired") or 0
+        return row.get("sessions_expired") or 0
+
+    def archive():
+        return supabase.rpc("archive_signing_sessions", {
+            "older_than_input": f"{SWEEP_ARCHIVE_AFTER_DAYS} days",
+            "batch_size_input": SWEEP_BATCH_SIZE
+        }).execute().data or 0
+
+    with _sweep_lock:
+        started = time.perf_counter()
+        try:
+            sessions_expired = _batches(expire)
+            sessions_archived = _batches(archive)
+        except Exception:
+            with _lock:
+                _stats["failures"] += 1
+            raise
+        duration = time.perf_counter() - started
+
+    result = {
+        "sessions_expired": sessions_expired,
+        "proposals_expired": proposals_expired,
+        "sessions_archived": sessions_archived,
+        "duration_seconds": round(duration, 3),
+    }
+    SWEEP_SECONDS.observe(duration)
+    for action in ("sessions_expired", "proposals_expired", "sessions_archived"):
+        SWEEP_ROWS.labels(action).inc(result[action])
+    with _lock:
+        _stats["sweeps"] += 1
+        for action in ("sessions_expired", "proposals_expired", "sessions_archived"):
+            _stats[action] += result[action]
+        _stats["last_sweep"] = {**result, "finished_at": time.time()}
+    return result
+
+
+def _sweep_safely() -> None:
+    try:
+        sweep()
+    except Exception as e:
+        print(f"Error sweeping expired signing links: {e}")
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_stats,
+            "leader": _leader,
+            "interval_seconds": SWEEP_INTERVAL_SECONDS,
+            "batch_size": SWEEP_BATCH_SIZE,
+            "archive_after_days": SWEEP_ARCHIVE_AFTER_DAYS,
+        }
+
+
+# --- Scheduling ---
+
+def start() -> bool:
+    """Starts this worker's scheduler thread (once); returns False if it is not configured."""
+    global _scheduler
+    if not (SWEEP_ENABLED and LOCK_URL):
+        return False
+    with _lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler_stop.clear()
+            _scheduler = threading.Thread(target=_schedule, name="sweeper", daemon=True)
+            _scheduler.start()
+    return True
+
+
+def stop() -> None:
+    _scheduler_stop.set()
+
+
+def _set_leader(leader: bool) -> None:
+    global _leader
+    with _lock:
+        if leader != _leader:
+            _stats["leader_changes"] += 1
+        _leader = leader
+
+
+def _schedule() -> None:
+    import psycopg2 # only workers that schedule pay for it
+
+    delay = 1.0
+    while not _scheduler_stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(LOCK_URL)
+            conn.autocommit = True
+            while not _scheduler_stop.is_set():
+                with conn.cursor() as cur:
+                    if _leader:
+                        # Still connected, so still holding the lock
+                        cur.execute("select 1")
+                    else:
+                        cur.execute("select pg_try_advisory_lock(%s)", (LOCK_KEY,))
+                        _set_leader(cur.fetchone()[0])
+                delay = 1.0
+                if _leader:
+                    _sweep_safely()
+                _scheduler_stop.wait(SWEEP_INTERVAL_SECONDS)
+        except Exception as e:
+            print(f"Error in expiry sweep scheduler: {e}")
+        finally:
+            _set_leader(False)
+            if conn is not None:
+                # Closing the session releases the lock for another worker
+                conn.close()
+        _scheduler_stop.wait(delay)
+        delay = min(delay * 2, 30.0)
@@ -0,0 +1,158 @@
+import os
+import select
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from execution.cache import LRUCache
+
+# Per-worker cache of template reads (a template by id, template list pages,
+# the org's PDF layout), scoped by org. Templates change rarely, so reads are
+# served from here until the org's templates change:
+#  - this worker's own writes invalidate the org right away (write-through);
+#  - every write to proposal_templates, from any worker or tool, fires a
+#    NOTIFY (schema.sql); each worker LISTENs on a direct database connection
+#    and invalidates the org it names;
+#  - entries also expire after TEMPLATE_CACHE_TTL_SECONDS, which bounds
+#    staleness if the listener is off or disconnected.
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "2000"))
+TEMPLATE_CACHE_TTL_SECONDS = float(os.getenv("TEMPLATE_CACHE_TTL_SECONDS", "300"))
+TEMPLATE_CACHE_LISTEN = os.getenv("TEMPLATE_CACHE_LISTEN", "true").lower() in ("1", "true", "yes")
+# LISTEN needs a session (not a transaction-pooled) connection
+LISTEN_URL = os.getenv("TEMPLATE_CACHE_LISTEN_URL") or os.getenv("DATABASE_URL")
+NOTIFY_CHANNEL = "template_changes"
+
+_cache = LRUCache(maxsize=TEMPLATE_CACHE_SIZE, ttl=TEMPLATE_CACHE_TTL_SECONDS)
+_MISSING = object()
+
+# Invalidation bumps the org's generation (or the epoch, for everything)
+# rather than hunting down its keys; old entries become unreachable and age
+# out of the LRU. A read that started before an invalidation stores its
+# result under the old generation, so it can't put stale data back.
+_lock = threading.Lock()
+_generations: Dict[str, int] = {}
+_epoch = 0
+_stats = {"invalidations": 0, "notifications": 0, "reconnects": 0}
+_listener: Optional[threading.Thread] = None
+_listener_stop = threading.Event()
+_listening = False
+# Other per-worker caches invalidated by NOTIFY share the listener's
+# connection: channel -> (on_notify(payload), on_reconnect())
+_channels: Dict[str, Tuple[Callable[[str], None], Callable[[], None]]] = {}
+
+
+def _key(org_id: str, parts: Tuple[Hashable, ...]) -> Tuple[Hashable, ...]:
+    with _lock:
+        return (_epoch, org_id, _generations.get(org_id, 0)) + parts
+
+
+async def get_or_load(org_id: str, parts: Tuple[Hashable, ...], load: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Returns the cached value for (org_id, *parts), loading it on a miss.
+    Cached values are shared between callers and must not be mutated.
+    """
+    key = _key(org_id, parts)
+    value = _cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = await load()
+        _cache.set(key, value)
+    return value
+
+
+def invalidate(org_id: str) -> None:
+    with _lock:
+        _generations[org_id] = _generations.get(org_id, 0) + 1
+        _stats["invalidations"] += 1
+
+
+def invalidate_all() -> None:
+    global _epoch
+    with _lock:
+        _epoch += 1
+        _generations.clear()
+        _stats["invalidations"] += 1
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            **_cache.stats(),
+            **_stats,
+            "ttl_seconds": TEMPLATE_CACHE_TTL_SECONDS,
+            "listening": _listening,
+        }
+
+
+# --- Cross-worker invalidation ---
+
+def subscribe(channel: str, on_notify: Callable[[str], None], on_reconnect: Callable[[], None]) -> None:
+    """
+    Also LISTENs on `channel` (from the listener's next connect): `on_notify`
+    gets each payload, `on_reconnect` runs whenever notifications may have
+    been missed.
+    """
+    with _lock:
+        _channels[channel] = (on_notify, on_reconnect)
+
+
+subscribe(NOTIFY_CHANNEL, invalidate, invalidate_all)
+
+
+def start_listener() -> bool:
+    """Starts this worker's LISTEN thread (once); returns False if it is not configured."""
+    global _listener
+    if not (TEMPLATE_CACHE_LISTEN and LISTEN_URL):
+        return False
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _listener_stop.clear()
+            _listener = threading.Thread(target=_listen, name="template-listener", daemon=True)
+            _listener.start()
+    return True
+
+
+def stop_listener() -> None:
+    _listener_stop.set()
+
+
+def _listen() -> None:
+    global _listening
+    import psycopg2 # only workers that listen pay for it
+    import psycopg2.extensions
+
+    delay = 1.0
+    while not _listener_stop.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(LISTEN_URL)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with _lock:
+                channels = dict(_channels)
+            with conn.cursor() as cur:
+                for channel in channels:
+                    cur.execute(f"listen {channel}")
+            # Changes made while we weren't listening were missed
+            for _, on_reconnect in channels.values():
+                on_reconnect()
+            _listening, delay = True, 1.0
+            while not _listener_stop.is_set():
+                if select.select([conn], [], [], 5)[0]:
+                    conn.poll()
+                else:
+                    # Idle: check the connection is still there
+                    with conn.cursor() as cur:
+                        cur.execute("select 1")
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    with _lock:
+                        _stats["notifications"] += 1
+                    channels[notification.channel][0](notification.payload)
+        except Exception as e:
+            print(f"Error listening for template changes: {e}")
+            with _lock:
+                _stats["reconnects"] += 1
+        finally:
+            _listening = False
+            if conn is not None:
+                conn.close()
+        _listener_stop.wait(delay)
+        delay = min(delay * 2, 30.0)
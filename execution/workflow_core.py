@@ -1,25 +1,39 @@
 from typing import Dict, Any, List, Optional
-from execution.supabase_client import get_client
+from execution.supabase_client import get_async_client, run_sync
+import execution.events as events
+from execution.pagination import DEFAULT_LIMIT, fetch_page_async, select_fields
 
-supabase = get_client()
+CLIENT_FIELDS = ("id", "org_id", "name", "email", "phone", "address", "created_at")
+PROJECT_FIELDS = ("id", "org_id", "client_id", "name", "status", "created_at")
+
+# Statuses reported on the dashboard (the schema's enums), so every key is present even at zero
+PROJECT_STATUSES = ("lead", "active", "completed", "cancelled")
+PROPOSAL_STATUSES = ("draft", "sent", "viewed", "signed", "declined", "expired")
+SIGNING_STATUSES = ("pending", "viewed", "signed", "declined", "expired")
+# Proposals still in play; their value is the open pipeline
+OPEN_PROPOSAL_STATUSES = ("draft", "sent", "viewed")
+
+# Async functions are the primary API (used by the orchestrator); the plain
+# functions below each section are thin sync wrappers for scripts.
 
 # --- Clients ---
-def create_organization(name: str, user_id: str) -> Dict[str, Any]:
+async def create_organization_async(name: str, user_id: str) -> Dict[str, Any]:
+    db = get_async_client()
     # 1. Create Org
-    org_resp = supabase.table("organizations").insert({"name": name}).execute()
+    org_resp = await db.table("organizations").insert({"name": name}).execute()
     org_id = org_resp.data[0]["id"]
-    
+
     # 2. Add User as Owner
     member_data = {
         "org_id": org_id,
         "user_id": user_id,
         "role": "owner"
     }
-    supabase.table("org_memberships").insert(member_data).execute()
-    
+    await db.table("org_memberships").insert(member_data).execute()
+
     return org_resp.data[0]
 
-def create_client(org_id: str, name: str, email: str, phone: str = None, address: str = None) -> Dict[str, Any]:
+async def create_client_async(org_id: str, name: str, email: str, phone: str = None, address: str = None) -> Dict[str, Any]:
     data = {
         "org_id": org_id,
         "name": name,
@@ -27,35 +41,144 @@ def create_client(org_id: str, name: str, email: str, phone: str = None, address
         "phone": phone,
         "address": address
     }
-    response = supabase.table("clients").insert(data).execute()
+    response = await get_async_client().table("clients").insert(data).execute()
     return response.data[0]
 
-def update_client(client_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-    response = supabase.table("clients").update(updates).eq("id", client_id).execute()
+async def update_client_async(client_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    response = await get_async_client().table("clients").update(updates).eq("id", client_id).execute()
     return response.data[0] if response.data else None
 
-def list_clients(org_id: str) -> List[Dict[str, Any]]:
-    response = supabase.table("clients").select("*").eq("org_id", org_id).execute()
-    return response.data
+async def list_clients_async(org_id: str, fields: str = None, cursor: str = None, limit: int = DEFAULT_LIMIT,
+                             created_after: str = None, created_before: str = None, count: str = "estimated") -> Dict[str, Any]:
+    """Keyset-paginated clients for an org: {"data", "next_cursor", "count"}."""
+    return await fetch_page_async(
+        get_async_client(), "clients",
+        select_fields(fields, CLIENT_FIELDS, "*"),
+        [
+            ("eq", "org_id", org_id),
+            ("gte", "created_at", created_after),
+            ("lt", "created_at", created_before),
+        ],
+        cursor=cursor, limit=limit, count=count
+    )
+
+def create_organization(name: str, user_id: str) -> Dict[str, Any]:
+    return run_sync(create_organization_async(name, user_id))
+
+def create_client(org_id: str, name: str, email: str, phone: str = None, address: str = None) -> Dict[str, Any]:
+    return run_sync(create_client_async(org_id, name, email, phone, address))
+
+def update_client(client_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    return run_sync(update_client_async(client_id, updates))
+
+def list_clients(org_id: str, **kwargs) -> Dict[str, Any]:
+    return run_sync(list_clients_async(org_id, **kwargs))
 
 # --- Projects ---
-def create_project(org_id: str, client_id: str, name: str, status: str = "lead") -> Dict[str, Any]:
+async def create_project_async(org_id: str, client_id: str, name: str, status: str = "lead") -> Dict[str, Any]:
     data = {
         "org_id": org_id,
         "client_id": client_id,
         "name": name,
         "status": status
     }
-    response = supabase.table("projects").insert(data).execute()
+    response = await get_async_client().table("projects").insert(data).execute()
     return response.data[0]
 
-def update_project(project_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
-    response = supabase.table("projects").update(updates).eq("id", project_id).execute()
+async def update_project_async(project_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    response = await get_async_client().table("projects").update(updates).eq("id", project_id).execute()
     return response.data[0] if response.data else None
 
+async def mark_project_complete_async(project_id: str) -> Dict[str, Any]:
+    project = await update_project_async(project_id, {"status": "completed"})
+    if project:
+        events.emit("project_completed", project["org_id"], "project", project_id)
+    return project
+
+async def list_projects_async(org_id: str, fields: str = None, cursor: str = None, limit: int = DEFAULT_LIMIT,
+                              status: str = None, client_id: str = None, created_after: str = None,
+                              created_before: str = None, count: str = "estimated") -> Dict[str, Any]:
+    """Keyset-paginated projects for an org: {"data", "next_cursor", "count"}."""
+    return await fetch_page_async(
+        get_async_client(), "projects",
+        select_fields(fields, PROJECT_FIELDS, "*, clients(name)", {"clients": "clients(name)"}),
+        [
+            ("eq", "org_id", org_id),
+            ("eq", "status", status),
+            ("eq", "client_id", client_id),
+            ("gte", "created_at", created_after),
+            ("lt", "created_at", created_before),
+        ],
+        cursor=cursor, limit=limit, count=count
+    )
+
+def create_project(org_id: str, client_id: str, name: str, status: str = "lead") -> Dict[str, Any]:
+    return run_sync(create_project_async(org_id, client_id, name, status))
+
+def update_project(project_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+    return run_sync(update_project_async(project_id, updates))
+
 def mark_project_complete(project_id: str) -> Dict[str, Any]:
-    return update_project(project_id, {"status": "completed"})
+    return run_sync(mark_project_complete_async(project_id))
+
+def list_projects(org_id: str, **kwargs) -> Dict[str, Any]:
+    return run_sync(list_projects_async(org_id, **kwargs))
+
+# --- Dashboard ---
+def _rate(part: float, whole: float) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+async def get_dashboard_stats_async(org_id: str) -> Dict[str, Any]:
+    """
+    Dashboard stats for an org, read from org_dashboard_counters (kept current
+    by triggers in schema.sql), so the cost doesn't grow with the org.
+    """
+    response = await get_async_client().table("org_dashboard_counters").select(
+        "kind, status, row_count, value_total"
+    ).eq("org_id", org_id).execute()
+
+    counts: Dict[str, Dict[str, int]] = {"client": {}, "project": {}, "proposal": {}, "signing_link": {}}
+    values: Dict[str, float] = {}
+    for row in response.data or []:
+        counts.setdefault(row["kind"], {})[row["status"]] = row["row_count"]
+        if row["kind"] == "proposal":
+            values[row["status"]] = float(row["value_total"] or 0)
+
+    projects = {status: counts["project"].get(status, 0) for status in PROJECT_STATUSES}
+    proposals = {status: counts["proposal"].get(status, 0) for status in PROPOSAL_STATUSES}
+    proposal_values = {status: values.get(status, 0.0) for status in PROPOSAL_STATUSES}
+    proposals_total = sum(proposals.values())
+    links = {status: counts["signing_link"].get(status, 0) for status in SIGNING_STATUSES}
+    links_total = sum(links.values())
+    # A signed or declined link was opened first, even if 'viewed' was never recorded
+    opened = links["viewed"] + links["signed"] + links["declined"]
+    decided = proposals["signed"] + proposals["declined"] + proposals["expired"]
+
+    return {
+        "org_id": org_id,
+        "clients": {"total": counts["client"].get("all", 0)},
+        "projects": {"total": sum(projects.values()), "by_status": projects},
+        "proposals": {
+            "total": proposals_total,
+            "by_status": proposals,
+            "value_by_status": proposal_values,
+            "pipeline_value": sum(proposal_values[status] for status in OPEN_PROPOSAL_STATUSES),
+            "signed_value": proposal_values["signed"],
+        },
+        "signing": {
+            "links": links_total,
+            "by_status": links,
+            "open_rate": _rate(opened, links_total),
+            "sign_rate": _rate(links["signed"], links_total),
+            "open_to_sign_rate": _rate(links["signed"], opened),
+        },
+        "conversion": {
+            # Share of proposals sent out (anything past draft) that ended up signed
+            "sent_to_signed_rate": _rate(proposals["signed"], proposals_total - proposals["draft"]),
+            # Share of proposals with an outcome that were won
+            "win_rate": _rate(proposals["signed"], decided),
+        },
+    }
 
-def list_projects(org_id: str) -> List[Dict[str, Any]]:
-    response = supabase.table("projects").select("*, clients(name)").eq("org_id", org_id).execute()
-    return response.data
+def get_dashboard_stats(org_id: str) -> Dict[str, Any]:
+    return run_sync(get_dashboard_stats_async(org_id))
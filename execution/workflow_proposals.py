@@ -1,26 +1,100 @@
+import asyncio
+import hashlib
+import os
 import uuid
-from typing import Dict, Any, List
-from execution.supabase_client import get_client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, AsyncIterator, List, Optional
+from postgrest.types import ReturnMethod
+from execution.supabase_client import get_client, get_async_client, run_sync
+from execution.pagination import DEFAULT_LIMIT, fetch_page_async, select_fields
+from execution.json_delta import apply_delta
+import execution.events as events
+import execution.template_cache as template_cache
+from execution.workflow_signing import invalidate_signing_cache
+import execution.pdf_generator as pdf
+import execution.render_service as render_service
 
-supabase = get_client()
+PDF_BUCKET = os.getenv("PDF_BUCKET", "projexnest")
 
-def create_template(org_id: str, name: str, content: Dict[str, Any]) -> Dict[str, Any]:
-    """Creates a new proposal template."""
+# Version PDFs are rendered off the save path
+_pdf_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="version-pdf")
+
+LAYOUT_TEMPLATE_TYPE = "pdf_layout"
+
+# Versions need an author; used when the caller doesn't name one
+DEFAULT_AUTHOR_ID = os.getenv("DEFAULT_AUTHOR_ID", "938d1d2f-bbcd-4c0e-b202-3d5ede2a166c")
+
+# Batch proposal creation: projects per create_proposals_from_template call,
+# calls in flight at once, and projects per request
+PROPOSAL_BATCH_SIZE = int(os.getenv("PROPOSAL_BATCH_SIZE", "100"))
+PROPOSAL_BATCH_CONCURRENCY = int(os.getenv("PROPOSAL_BATCH_CONCURRENCY", "4"))
+PROPOSAL_BATCH_MAX = int(os.getenv("PROPOSAL_BATCH_MAX", "2000"))
+
+# Every Nth saved version is stored in full; the ones between as deltas
+SNAPSHOT_INTERVAL = int(os.getenv("PROPOSAL_SNAPSHOT_INTERVAL", "20"))
+
+# Autosave coalescing: with a window > 0, saves go to the user's working draft
+# and become a numbered version after this many quiet seconds (or on publish,
+# or once the draft is DRAFT_MAX_AGE_SECONDS old). 0 = every change is a version.
+DRAFT_COALESCE_SECONDS = int(os.getenv("DRAFT_COALESCE_SECONDS", "0"))
+DRAFT_MAX_AGE_SECONDS = int(os.getenv("DRAFT_MAX_AGE_SECONDS", "300"))
+
+TEMPLATE_FIELDS = ("id", "org_id", "name", "template_type", "is_archived", "content_json", "created_at", "updated_at")
+# content_json is only sent when asked for via fields=
+TEMPLATE_LIST_SELECT = "id, org_id, name, template_type, is_archived, created_at, updated_at"
+PROPOSAL_FIELDS = ("id", "org_id", "project_id", "client_id", "name", "title", "status", "total", "created_at", "updated_at")
+VERSION_METADATA_FIELDS = "id, version_number, created_at, created_by, pdf_file_id, storage_kind"
+
+# Async functions are the primary API (used by the orchestrator); the plain
+# functions further down are thin sync wrappers for scripts.
+
+async def create_template_async(org_id: str, name: str, content: Dict[str, Any], template_type: str = "client_proposal") -> Dict[str, Any]:
+    """
+    Creates a new proposal template.
+    `pdf_layout` templates carry a Jinja `layout_html` in content_json that
+    overrides the default PDF layout for the org. Raises pdf.InvalidLayout
+    if that doesn't compile.
+    """
+    pdf.validate_layout(content)
     data = {
         "org_id": org_id,
         "name": name,
         "content_json": content,
-        "template_type": "client_proposal" # Default for legacy schema compatibility
+        "template_type": template_type # Default for legacy schema compatibility
     }
-    response = supabase.table("proposal_templates").insert(data).execute()
+    response = await get_async_client().table("proposal_templates").insert(data).execute()
+    template_cache.invalidate(org_id)
+    return response.data[0]
+
+async def update_template_async(template_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Updates a template (name, content_json, is_archived); None if it doesn't
+    exist. Raises pdf.InvalidLayout for a layout_html that doesn't compile.
+    """
+    if "content_json" in updates:
+        pdf.validate_layout(updates["content_json"])
+    response = await get_async_client().table("proposal_templates").update(updates).eq("id", template_id).execute()
+    if not response.data:
+        return None
+    template_cache.invalidate(response.data[0]["org_id"])
     return response.data[0]
 
-def create_proposal_from_template(org_id: str, project_id: str, template_id: str, title: str) -> Dict[str, Any]:
+async def get_template_async(org_id: str, template_id: str) -> Dict[str, Any]:
+    """One of the org's templates, from the template cache when possible."""
+    async def load():
+        response = await get_async_client().table("proposal_templates").select(
+            ", ".join(TEMPLATE_FIELDS)
+        ).eq("id", template_id).eq("org_id", org_id).single().execute()
+        return response.data
+    return await template_cache.get_or_load(org_id, ("template", template_id), load)
+
+async def create_proposal_from_template_async(org_id: str, project_id: str, template_id: str, title: str,
+                                              created_by: str = None) -> Dict[str, Any]:
     """Creates a proposal from a template."""
+    db = get_async_client()
     
     # 1. Fetch Template
-    tmpl_resp = supabase.table("proposal_templates").select("*").eq("id", template_id).single().execute()
-    template = tmpl_resp.data
+    template = await get_template_async(org_id, template_id)
     
     # 2. Create Proposal
     prop_data = {
@@ -29,7 +103,7 @@ def create_proposal_from_template(org_id: str, project_id: str, template_id: str
         "name": title, # Schema uses 'name' not 'title'
         "status": "draft"
     }
-    prop_resp = supabase.table("proposals").insert(prop_data).execute()
+    prop_resp = await db.table("proposals").insert(prop_data).execute()
     proposal = prop_resp.data[0]
     
     # 3. Create First Version
@@ -38,108 +112,547 @@ def create_proposal_from_template(org_id: str, project_id: str, template_id: str
         "proposal_id": proposal["id"],
         "version_number": 1,
         "content_json": template["content_json"],
-        "created_by": "938d1d2f-bbcd-4c0e-b202-3d5ede2a166c" # Valid User ID
+        "created_by": created_by or DEFAULT_AUTHOR_ID
     }
-    ver_resp = supabase.table("proposal_versions").insert(ver_data).execute()
+    ver_resp = await db.table("proposal_versions").insert(ver_data).execute()
+    schedule_version_pdf(ver_resp.data[0]["id"])
+    events.emit("proposal_created", org_id, "proposal", proposal["id"], payload={
+        "project_id": project_id, "template_id": template_id, "version_id": ver_resp.data[0]["id"]
+    })
     
     return {
         "proposal": proposal,
         "version": ver_resp.data[0]
     }
 
-def generate_signing_link(proposal_version_id: str, signer_email: str = None, expires_in_days: int = 7) -> str:
-    """Generates a signing link (session) for a proposal version."""
+async def create_proposals_batch_async(org_id: str, template_id: str, project_ids: List[str], title: str,
+                                      created_by: str = None, create_links: bool = False,
+                                      expires_in_days: int = 7) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Creates a proposal from one template for each project, yielding a result
+    per project as its chunk completes, then {"done", "created", "failed"}.
+    Each chunk of PROPOSAL_BATCH_SIZE projects is one create_proposals_from_template
+    call (proposals and first versions together) plus, with create_links, one
+    multi-row signing_sessions insert addressed to each project's client.
+    '{project}' in the title is replaced with the project's name.
+    """
+    project_ids = list(dict.fromkeys(project_ids))
+    slots = asyncio.Semaphore(PROPOSAL_BATCH_CONCURRENCY)
+
+    async def run(chunk):
+        async with slots:
+            return await _create_proposal_chunk(org_id, template_id, chunk, title, created_by or DEFAULT_AUTHOR_ID,
+                                                create_links, expires_in_days)
+
+    tasks = [asyncio.ensure_future(run(project_ids[i:i + PROPOSAL_BATCH_SIZE]))
+             for i in range(0, len(project_ids), PROPOSAL_BATCH_SIZE)]
+    created = failed = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for result in await finished:
+                if "error" in result:
+                    failed += 1
+                else:
+                    created += 1
+                yield result
+        yield {"done": True, "created": created, "failed": failed}
+    finally:
+        # The caller went away (e.g. the client disconnected): stop what hasn't started
+        for task in tasks:
+            task.cancel()
+
+async def _create_proposal_chunk(org_id: str, template_id: str, project_ids: List[str], title: str, created_by: str,
+                                 create_links: bool, expires_in_days: int) -> List[Dict[str, Any]]:
+    db = get_async_client()
+    try:
+        rows = (await db.rpc("create_proposals_from_template", {
+            "org_id_input": org_id,
+            "template_id_input": template_id,
+            "project_ids_input": project_ids,
+            "title_input": title,
+            "created_by_input": created_by,
+            # Signing reads content_json directly, so linked versions stay materialized
+            "pin_input": create_links
+        }).execute()).data or []
+    except Exception as e:
+        print(f"Error creating {len(project_ids)} proposals: {e}")
+        return [{"project_id": project_id, "error": str(e)} for project_id in project_ids]
+
+    results, sessions = [], []
+    for row in rows:
+        if row.get("error"):
+            results.append({"project_id": row["project_id"], "error": row["error"]})
+            continue
+        result = {"project_id": row["project_id"], "proposal_id": row["proposal_id"], "version_id": row["version_id"]}
+        schedule_version_pdf(row["version_id"])
+        events.emit("proposal_created", org_id, "proposal", row["proposal_id"], payload={
+            "project_id": row["project_id"], "template_id": template_id, "version_id": row["version_id"]
+        })
+        if create_links:
+            session = _new_signing_session(row["version_id"], row.get("client_email"), expires_in_days)
+            result.update(token=session["token"], signer_email=session["signer_email"], expires_at=session["expires_at"])
+            sessions.append(session)
+        results.append(result)
+
+    if sessions:
+        try:
+            await db.table("signing_sessions").insert(sessions, returning=ReturnMethod.minimal).execute()
+        except Exception as e:
+            # The proposals exist; only their links are missing
+            print(f"Error creating {len(sessions)} signing links: {e}")
+            for result in results:
+                if result.pop("token", None):
+                    result["link_error"] = str(e)
+            return results
+        for result in results:
+            if "token" in result:
+                events.emit("proposal_sent", org_id, "proposal", result["proposal_id"], payload={
+                    "version_id": result["version_id"], "version_number": 1,
+                    "signer_email": result["signer_email"], "expires_at": result["expires_at"]
+                })
+    return results
+
+def _is_uuid(value: Any) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+def _new_signing_session(proposal_version_id: str, signer_email: str = None, expires_in_days: int = 7) -> Dict[str, Any]:
     import datetime
-    
-    token = str(uuid.uuid4())
-    expires_at = datetime.datetime.now() + datetime.timedelta(days=expires_in_days)
-    
-    data = {
+
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=expires_in_days)
+    return {
         "proposal_version_id": proposal_version_id,
-        "token": token,
+        "token": str(uuid.uuid4()),
         "status": "pending",
         "signer_email": signer_email,
         "expires_at": expires_at.isoformat()
     }
+
+async def generate_signing_link_async(proposal_version_id: str, signer_email: str = None, expires_in_days: int = 7) -> str:
+    """Generates a signing link (session) for a proposal version."""
+    db = get_async_client()
+    # Signing reads content_json directly, so keep this version materialized
+    pinned = (await db.rpc("pin_proposal_version", {"version_id_input": proposal_version_id}).execute()).data or {}
+
+    data = _new_signing_session(proposal_version_id, signer_email, expires_in_days)
+    token = data["token"]
     
-    supabase.table("signing_sessions").insert(data).execute()
+    await db.table("signing_sessions").insert(data).execute()
+    events.emit("proposal_sent", pinned.get("org_id"), "proposal", pinned.get("proposal_id"), payload={
+        "version_id": proposal_version_id, "version_number": pinned.get("version_number"),
+        "signer_email": signer_email, "expires_at": data["expires_at"]
+    })
     
     # Return details
     # We might want to construct the URL here if we had the base URL
     return token
 
-def list_templates(org_id: str) -> List[Dict[str, Any]]:
-    response = supabase.table("proposal_templates").select("*").eq("org_id", org_id).execute()
-    return response.data
+async def generate_signing_links_async(links: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Creates many signing links at once, e.g. one proposal to several
+    recipients. `links` are {"proposal_version_id", "signer_email",
+    "expires_in_days"} dicts. One pin_proposal_versions call and one
+    multi-row insert, whatever the count. Returns a result per link, in
+    order: the session (with its token) or {"proposal_version_id", "error"}.
+    """
+    db = get_async_client()
+    # Ids that aren't UUIDs would fail the whole pin call's cast; they can't name a version anyway
+    version_ids = list(dict.fromkeys(link["proposal_version_id"] for link in links if _is_uuid(link["proposal_version_id"])))
+    pinned = (await db.rpc("pin_proposal_versions", {"version_ids_input": version_ids}).execute()).data if version_ids else []
+    versions = {row["version_id"]: row for row in pinned or []}
 
-def list_proposals(org_id: str) -> List[Dict[str, Any]]:
-    response = supabase.table("proposals").select("*, clients(name), projects(name)").eq("org_id", org_id).execute()
-    return response.data
+    results, sessions = [], []
+    for link in links:
+        if link["proposal_version_id"] not in versions:
+            results.append({"proposal_version_id": link["proposal_version_id"], "error": "Version not found"})
+            continue
+        session = _new_signing_session(link["proposal_version_id"], link.get("signer_email"), link.get("expires_in_days", 7))
+        sessions.append(session)
+        results.append(session)
 
-def get_proposal_full(proposal_id: str) -> Dict[str, Any]:
+    if sessions:
+        try:
+            await db.table("signing_sessions").insert(sessions, returning=ReturnMethod.minimal).execute()
+        except Exception as e:
+            print(f"Error creating {len(sessions)} signing links: {e}")
+            return [
+                {"proposal_version_id": result["proposal_version_id"], "error": str(e)} if "token" in result else result
+                for result in results
+            ]
+    for session in sessions:
+        version = versions[session["proposal_version_id"]]
+        events.emit("proposal_sent", version["org_id"], "proposal", version["proposal_id"], payload={
+            "version_id": version["version_id"], "version_number": version["version_number"],
+            "signer_email": session["signer_email"], "expires_at": session["expires_at"]
+        })
+    return results
+
+async def renew_signing_links_async(org_id: str, tokens: List[str] = None, expiring_within_hours: float = None,
+                                   expires_in_days: int = 7) -> List[Dict[str, Any]]:
+    """
+    Extends an org's unsigned signing links in place (tokens stay the same):
+    the given tokens and/or every link expiring within the window. Links that
+    had already expired become usable again, and expired proposals go back
+    to sent (viewed if a renewed link was opened). Returns the renewed sessions.
     """
-    Fetches complete proposal data including:
+    response = await get_async_client().rpc("renew_signing_sessions", {
+        "org_id_input": org_id,
+        "tokens_input": tokens,
+        "expiring_within_input": f"{expiring_within_hours} hours" if expiring_within_hours is not None else None,
+        "expires_in_input": f"{expires_in_days} days"
+    }).execute()
+    renewed = response.data or []
+    for session in renewed:
+        # This worker may have cached the link as expired
+        invalidate_signing_cache(session["token"])
+        events.emit("signing_link_renewed", org_id, "proposal", session["proposal_id"], payload={
+            "version_id": session["proposal_version_id"], "signer_email": session["signer_email"],
+            "expires_at": session["expires_at"]
+        })
+    return renewed
+
+async def get_org_layout_async(org_id: str) -> Optional[Dict[str, Any]]:
+    """Returns the org's active PDF layout override, if any."""
+    async def load():
+        response = await get_async_client().table("proposal_templates").select(
+            "id, updated_at, content_json"
+        ).eq("org_id", org_id).eq("template_type", LAYOUT_TEMPLATE_TYPE).eq(
+            "is_archived", False
+        ).order("updated_at", desc=True).limit(1).execute()
+        return response.data[0] if response.data else None
+    return await template_cache.get_or_load(org_id, ("layout",), load)
+
+async def list_templates_async(org_id: str, fields: str = None, cursor: str = None, limit: int = DEFAULT_LIMIT,
+                               template_type: str = None, is_archived: bool = None, count: str = "estimated") -> Dict[str, Any]:
+    """Keyset-paginated templates for an org: {"data", "next_cursor", "count"}, via the template cache."""
+    select = select_fields(fields, TEMPLATE_FIELDS, TEMPLATE_LIST_SELECT)
+    async def load():
+        return await fetch_page_async(
+            get_async_client(), "proposal_templates", select,
+            [
+                ("eq", "org_id", org_id),
+                ("eq", "template_type", template_type),
+                ("is_", "is_archived", None if is_archived is None else str(is_archived).lower()),
+            ],
+            cursor=cursor, limit=limit, count=count
+        )
+    return await template_cache.get_or_load(
+        org_id, ("list", select, cursor, limit, template_type, is_archived, count), load
+    )
+
+async def list_proposals_async(org_id: str, fields: str = None, cursor: str = None, limit: int = DEFAULT_LIMIT,
+                               status: str = None, client_id: str = None, project_id: str = None,
+                               created_after: str = None, created_before: str = None, count: str = "estimated") -> Dict[str, Any]:
+    """Keyset-paginated proposals for an org: {"data", "next_cursor", "count"}."""
+    return await fetch_page_async(
+        get_async_client(), "proposals",
+        select_fields(
+            fields, PROPOSAL_FIELDS, "*, clients(name), projects(name)",
+            {"clients": "clients(name)", "projects": "projects(name)"}
+        ),
+        [
+            ("eq", "org_id", org_id),
+            ("eq", "status", status),
+            ("eq", "client_id", client_id),
+            ("eq", "project_id", project_id),
+            ("gte", "created_at", created_after),
+            ("lt", "created_at", created_before),
+        ],
+        cursor=cursor, limit=limit, count=count
+    )
+
+async def get_proposal_full_async(proposal_id: str, include_versions_content: bool = False, versions_limit: int = 20, versions_offset: int = 0,
+                                  include_working_drafts: bool = True) -> Dict[str, Any]:
+    """
+    Fetches complete proposal data in a single embedded query:
     - Proposal details (scope_of_work, total, etc.)
     - Related client and project names
-    - Latest version for version-specific data
+    - Latest version, with content and its stored PDF
+    - A page of version history (metadata only unless include_versions_content)
+    - Users' working drafts not yet flushed to a version
     """
-    # Get proposal with related data
-    p_resp = supabase.table("proposals").select(
-        "*, clients(id, name, email), projects(id, name)"
-    ).eq("id", proposal_id).single().execute()
-    
-    # Get versions
-    v_resp = supabase.table("proposal_versions").select("*").eq(
-        "proposal_id", proposal_id
-    ).order("version_number", desc=True).execute()
+    version_fields = "*" if include_versions_content else VERSION_METADATA_FIELDS
+    query = get_async_client().table("proposals").select(
+        "*, clients(id, name, email), projects(id, name), "
+        "latest_version:proposal_versions(*, files(id, storage_path, sha256, size_bytes)), "
+        f"versions:proposal_versions({version_fields}), "
+        "versions_count:proposal_versions(count)"
+        + (", working_drafts:proposal_working_drafts(user_id, content_json, updated_at)" if include_working_drafts else "")
+    ).eq("id", proposal_id).order(
+        "version_number", desc=True, foreign_table="latest_version"
+    ).limit(1, foreign_table="latest_version").order(
+        "version_number", desc=True, foreign_table="versions"
+    )
+    if versions_limit > 0:
+        query = query.range(versions_offset, versions_offset + versions_limit - 1, foreign_table="versions")
+    else:
+        query = query.limit(0, foreign_table="versions")
+    p_resp = await query.maybe_single().execute()
     
-    if not p_resp.data:
+    if not p_resp or not p_resp.data:
         return None
     
     proposal = p_resp.data
-    versions = v_resp.data if v_resp.data else []
-    latest_version = versions[0] if versions else {}
+    latest = proposal.pop("latest_version", None) or []
+    versions = proposal.pop("versions", None) or []
+    count_rows = proposal.pop("versions_count", None) or []
+    working_drafts = proposal.pop("working_drafts", None) or []
+    if include_versions_content:
+        await _materialize_versions(proposal_id, versions)
     
     return {
         "proposal": proposal,
         "client": proposal.get("clients"),
         "project": proposal.get("projects"),
         "versions": versions,
-        "latest_version": latest_version
+        "versions_page": {
+            "limit": versions_limit,
+            "offset": versions_offset,
+            "total": count_rows[0]["count"] if count_rows else 0
+        },
+        "latest_version": latest[0] if latest else {},
+        # Unflushed autosaves, newer than latest_version
+        "working_drafts": working_drafts
     }
 
-def update_proposal_content(proposal_id: str, content: Dict[str, Any], created_by: str) -> Dict[str, Any]:
+async def _materialize_versions(proposal_id: str, versions: List[Dict[str, Any]]) -> None:
     """
-    Saves a new draft version of the proposal.
+    Fills content_json in a page of versions (newest first) that includes
+    delta rows: deltas are applied upwards from the oldest row, which is
+    fetched materialized if it has no stored content.
     """
-    # Get current latest version number
-    curr_ver = supabase.table("proposal_versions").select("version_number, org_id").eq("proposal_id", proposal_id).order("version_number", desc=True).limit(1).execute()
-    
-    next_num = 1
-    org_id = None
-    if curr_ver.data:
-        next_num = curr_ver.data[0]["version_number"] + 1
-        org_id = curr_ver.data[0]["org_id"]
-    else:
-        # Fallback if no version exists (shouldn't happen if created correctly)
-        prop = supabase.table("proposals").select("org_id").eq("id", proposal_id).single().execute()
-        org_id = prop.data["org_id"]
+    if not versions or all(v.get("content_json") is not None for v in versions):
+        return
+    oldest = versions[-1]
+    if oldest.get("content_json") is None:
+        oldest["content_json"] = await get_version_content_async(proposal_id, oldest["version_number"])
+    for newer, older in zip(reversed(versions[:-1]), reversed(versions[1:])):
+        if newer.get("content_json") is None:
+            newer["content_json"] = apply_delta(older["content_json"], newer.get("delta_json"))
 
-    data = {
-        "proposal_id": proposal_id,
-        "org_id": org_id,
-        "version_number": next_num,
-        "content_json": content,
-        "created_by": created_by
-    }
-    
-    response = supabase.table("proposal_versions").insert(data).execute()
-    
-    # Update proposal updated_at
-    supabase.table("proposals").update({"updated_at": "now()"}).eq("id", proposal_id).execute()
-    
-    return response.data[0]
+async def get_version_content_async(proposal_id: str, version_number: int) -> Optional[Dict[str, Any]]:
+    """Reconstructs the content of any version number (snapshot plus deltas, in the database)."""
+    response = await get_async_client().rpc("get_proposal_version_content", {
+        "proposal_id_input": proposal_id,
+        "version_number_input": version_number
+    }).execute()
+    return response.data
+
+async def get_proposal_version_async(proposal_id: str, version_number: int) -> Optional[Dict[str, Any]]:
+    """Returns one version with its content materialized."""
+    response = await get_async_client().table("proposal_versions").select(
+        f"{VERSION_METADATA_FIELDS}, content_json"
+    ).eq("proposal_id", proposal_id).eq("version_number", version_number).maybe_single().execute()
+    if not response or not response.data:
+        return None
+    version = response.data
+    if version.get("content_json") is None:
+        version["content_json"] = await get_version_content_async(proposal_id, version_number)
+    return version
+
+async def update_proposal_content_async(proposal_id: str, content: Dict[str, Any], created_by: str, publish: bool = False) -> Dict[str, Any]:
+    """
+    Saves the proposal's content in one database call (save_proposal_draft).
+    Content identical to the latest version (or the user's working draft) is
+    not written. Returns the latest version's metadata plus `save_status`
+    ("created", "unchanged" or "drafted") and the user's `working_draft`.
+    """
+    response = await get_async_client().rpc("save_proposal_draft", {
+        "proposal_id_input": proposal_id,
+        "content_input": content,
+        "created_by_input": created_by,
+        "coalesce_seconds_input": DRAFT_COALESCE_SECONDS,
+        "publish_input": publish,
+        "snapshot_interval_input": SNAPSHOT_INTERVAL
+    }).execute()
+    result = response.data
+    version = result.get("version") or {}
+    if result["status"] == "created":
+        schedule_version_pdf(version["id"])
+        _emit_version_created(version, publish=publish)
+
+    return {**version, "save_status": result["status"], "working_draft": result.get("working_draft")}
+
+async def flush_working_drafts_async(quiet_seconds: int = None, batch_size: int = 100) -> int:
+    """Turns quiet (or too old) working drafts into numbered versions; returns how many."""
+    response = await get_async_client().rpc("flush_working_drafts", {
+        "quiet_seconds_input": DRAFT_COALESCE_SECONDS if quiet_seconds is None else quiet_seconds,
+        "max_age_seconds_input": DRAFT_MAX_AGE_SECONDS,
+        "snapshot_interval_input": SNAPSHOT_INTERVAL,
+        "batch_size_input": batch_size
+    }).execute()
+    versions = response.data or []
+    for version in versions:
+        schedule_version_pdf(version["id"])
+        _emit_version_created(version, coalesced=True)
+    return len(versions)
+
+def _emit_version_created(version: Dict[str, Any], **payload) -> None:
+    events.emit("proposal_version_created", version.get("org_id"), "proposal", version.get("proposal_id"),
+                actor_id=version.get("created_by"),
+                payload={"version_id": version["id"], "version_number": version.get("version_number"), **payload})
+
+class StoredPdfMismatch(RuntimeError):
+    """A stored PDF's bytes don't hash to the sha256 recorded in `files`."""
+
+def _verified_pdf(storage_path: str, sha256: str, pdf_bytes: bytes) -> bytes:
+    # Callers cache the result under `sha256`, so it must really be that content
+    if hashlib.sha256(pdf_bytes).hexdigest() != sha256:
+        raise StoredPdfMismatch(f"Stored PDF {storage_path} does not match its recorded sha256")
+    return pdf_bytes
+
+async def download_stored_pdf_async(storage_path: str, sha256: str) -> bytes:
+    """Downloads a stored PDF, checked against its recorded sha256 (raises StoredPdfMismatch)."""
+    pdf_bytes = await get_async_client().storage.from_(PDF_BUCKET).download(storage_path)
+    return _verified_pdf(storage_path, sha256, pdf_bytes)
+
+async def signed_pdf_url_async(storage_path: str, expires_in: int = 300) -> Optional[str]:
+    resp = await get_async_client().storage.from_(PDF_BUCKET).create_signed_url(storage_path, expires_in)
+    return resp.get("signedURL") or resp.get("signedUrl") if resp else None
+
+# --- Sync wrappers ---
+
+def create_template(org_id: str, name: str, content: Dict[str, Any], template_type: str = "client_proposal") -> Dict[str, Any]:
+    return run_sync(create_template_async(org_id, name, content, template_type))
+
+def update_template(template_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return run_sync(update_template_async(template_id, updates))
+
+def create_proposal_from_template(org_id: str, project_id: str, template_id: str, title: str, created_by: str = None) -> Dict[str, Any]:
+    return run_sync(create_proposal_from_template_async(org_id, project_id, template_id, title, created_by))
+
+def create_proposals_batch(org_id: str, template_id: str, project_ids: List[str], title: str, **kwargs) -> List[Dict[str, Any]]:
+    async def collect():
+        return [result async for result in create_proposals_batch_async(org_id, template_id, project_ids, title, **kwargs)]
+    return run_sync(collect())
+
+def generate_signing_link(proposal_version_id: str, signer_email: str = None, expires_in_days: int = 7) -> str:
+    return run_sync(generate_signing_link_async(proposal_version_id, signer_email, expires_in_days))
+
+def generate_signing_links(links: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return run_sync(generate_signing_links_async(links))
+
+def renew_signing_links(org_id: str, **kwargs) -> List[Dict[str, Any]]:
+    return run_sync(renew_signing_links_async(org_id, **kwargs))
+
+def get_org_layout(org_id: str) -> Optional[Dict[str, Any]]:
+    return run_sync(get_org_layout_async(org_id))
+
+def list_templates(org_id: str, **kwargs) -> Dict[str, Any]:
+    return run_sync(list_templates_async(org_id, **kwargs))
+
+def list_proposals(org_id: str, **kwargs) -> Dict[str, Any]:
+    return run_sync(list_proposals_async(org_id, **kwargs))
+
+def get_proposal_full(proposal_id: str, **kwargs) -> Dict[str, Any]:
+    return run_sync(get_proposal_full_async(proposal_id, **kwargs))
+
+def get_proposal_version(proposal_id: str, version_number: int) -> Optional[Dict[str, Any]]:
+    return run_sync(get_proposal_version_async(proposal_id, version_number))
+
+def update_proposal_content(proposal_id: str, content: Dict[str, Any], created_by: str, publish: bool = False) -> Dict[str, Any]:
+    return run_sync(update_proposal_content_async(proposal_id, content, created_by, publish))
+
+def flush_working_drafts(quiet_seconds: int = None, batch_size: int = 100) -> int:
+    return run_sync(flush_working_drafts_async(quiet_seconds, batch_size))
 
 def get_proposal_details(proposal_id: str) -> Dict[str, Any]:
     """Fetches full proposal details including latest version."""
     return get_proposal_full(proposal_id)
+
+# --- Version PDFs ---
+
+def version_pdf_path(org_id: str, project_id: str, proposal_id: str, version_number: int, file_id: str) -> str:
+    # One object per render (keyed by its files row), so concurrent renders of a version never overwrite each other
+    return f"org/{org_id}/projects/{project_id}/proposals/{proposal_id}/v{version_number}-{file_id[:8]}.pdf"
+
+def store_version_pdf(version_id: str, pdf_bytes: Optional[bytes] = None) -> Optional[Dict[str, Any]]:
+    """
+    Renders a version's PDF once, uploads it to Storage, records it in `files`
+    (with its sha256) and links it via proposal_versions.pdf_file_id.
+    Versions that already have a PDF are skipped. Pass `pdf_bytes` to store an
+    existing render instead of laying the document out again. Returns None if
+    a concurrent render linked its PDF first (this render's file is removed).
+    """
+    # Sync client: this runs on the background PDF thread, not on the event loop
+    supabase = get_client()
+    v_resp = supabase.table("proposal_versions").select(
+        "id, proposal_id, version_number, content_json, pdf_file_id"
+    ).eq("id", version_id).single().execute()
+    version = v_resp.data
+    if not version or version.get("pdf_file_id"):
+        return None
+
+    p_resp = supabase.table("proposals").select(
+        "*, clients(id, name, email), projects(id, name)"
+    ).eq("id", version["proposal_id"]).single().execute()
+    proposal = p_resp.data
+
+    if pdf_bytes is None:
+        content = version.get("content_json")
+        if content is None:
+            # A newer save already reduced this version to a delta
+            content = supabase.rpc("get_proposal_version_content", {
+                "proposal_id_input": version["proposal_id"],
+                "version_number_input": version["version_number"]
+            }).execute().data
+        html = pdf.render_proposal_html(
+            proposal, content or {}, proposal.get("clients"), proposal.get("projects"),
+            get_org_layout(proposal["org_id"])
+        )
+        # Background work waits for a render slot rather than being rejected
+        pdf_bytes = render_service.render(html, block=True)
+
+    file_id = str(uuid.uuid4())
+    path = version_pdf_path(
+        proposal["org_id"], proposal.get("project_id"), proposal["id"], version["version_number"], file_id
+    )
+    if pdf.upload_pdf_to_storage(supabase, PDF_BUCKET, path, pdf_bytes) is None:
+        return None
+
+    file_data = {
+        "id": file_id,
+        "org_id": proposal["org_id"],
+        "project_id": proposal.get("project_id"),
+        "name": f"v{version['version_number']}.pdf",
+        "storage_path": path,
+        "mime_type": "application/pdf",
+        "size_bytes": len(pdf_bytes),
+        "sha256": hashlib.sha256(pdf_bytes).hexdigest()
+    }
+    f_resp = supabase.table("files").insert(file_data).execute()
+    file_row = f_resp.data[0]
+
+    # Only link if no concurrent render got there first
+    linked = supabase.table("proposal_versions").update({"pdf_file_id": file_row["id"]}).eq(
+        "id", version_id
+    ).is_("pdf_file_id", "null").execute()
+    if not linked.data:
+        supabase.table("files").delete().eq("id", file_row["id"]).execute()
+        try:
+            supabase.storage.from_(PDF_BUCKET).remove([path])
+        except Exception as e:
+            print(f"Error removing unlinked version PDF {path}: {e}")
+        return None
+    return file_row
+
+def _store_version_pdf_safely(version_id: str, pdf_bytes: Optional[bytes] = None) -> None:
+    try:
+        store_version_pdf(version_id, pdf_bytes)
+    except Exception as e:
+        print(f"Error storing PDF for version {version_id}: {e}")
+
+def schedule_version_pdf(version_id: str, pdf_bytes: Optional[bytes] = None) -> None:
+    """Queues store_version_pdf in the background so saves don't wait on WeasyPrint."""
+    _pdf_executor.submit(_store_version_pdf_safely, version_id, pdf_bytes)
+
+def download_stored_pdf(storage_path: str, sha256: str) -> bytes:
+    """Sync download_stored_pdf_async, for the background threads."""
+    return _verified_pdf(storage_path, sha256, get_client().storage.from_(PDF_BUCKET).download(storage_path))
+
+def signed_pdf_url(storage_path: str, expires_in: int = 300) -> Optional[str]:
+    resp = get_client().storage.from_(PDF_BUCKET).create_signed_url(storage_path, expires_in)
+    return resp.get("signedURL") or resp.get("signedUrl") if resp else None
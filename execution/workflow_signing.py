@@ -1,29 +1,89 @@
+import asyncio
+import hashlib
+import os
+import time
 from typing import Dict, Any, Optional
-from execution.supabase_client import get_client
+from execution.cache import LRUCache
+from execution.supabase_client import get_async_client, run_sync
+import execution.events as events
+import execution.template_cache as template_cache
 
-supabase = get_client()
+# Read-through cache for public signing lookups (per worker), keyed by the
+# sha256 of the token. Invalid tokens are cached too, briefly, so
+# link-prefetching scanners don't each hit the RPC.
+#  - sign_proposal drops the token's entry on this worker right away;
+#  - signing_sessions updates (signing, expiry, renewal) NOTIFY the token's
+#    sha256 (schema.sql), heard on the template cache's listener connection,
+#    so every other worker drops it too;
+#  - entries expire after SIGNING_CACHE_TTL_SECONDS, which bounds staleness
+#    if the listener is off or disconnected.
+SIGNING_CACHE_TTL_SECONDS = float(os.getenv("SIGNING_CACHE_TTL_SECONDS", "30"))
+SIGNING_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("SIGNING_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+NOTIFY_CHANNEL = "signing_changes"
 
-def get_proposal_for_signing(token: str) -> Optional[Dict[str, Any]]:
+_signing_cache = LRUCache(maxsize=int(os.getenv("SIGNING_CACHE_SIZE", "10000")), ttl=SIGNING_CACHE_TTL_SECONDS)
+# When each token (or, for a reconnect, every token) was last invalidated,
+# so a lookup that started before a signature can't put the stale view back
+_invalidated_at = LRUCache(maxsize=int(os.getenv("SIGNING_CACHE_SIZE", "10000")), ttl=SIGNING_CACHE_TTL_SECONDS)
+_all_invalidated_at = 0.0
+_in_flight: Dict[tuple, "asyncio.Future"] = {}
+_MISSING = object()
+
+def _cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+# Returned by get_proposal_for_signing for server-side use (event log), not shown to signers
+INTERNAL_FIELDS = ("proposal_id", "org_id")
+
+def public_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if k not in INTERNAL_FIELDS}
+
+async def get_proposal_for_signing_async(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the signing view for a token, from cache when possible.
+    Concurrent misses for the same token share one RPC call.
     """
-    Calls the Security Definer RPC to safely retrieve proposal details 
+    cached = _signing_cache.get(_cache_key(token), _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    key = (id(asyncio.get_running_loop()), token)
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_proposal_for_signing(token))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(task)
+
+async def _fetch_proposal_for_signing(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Calls the Security Definer RPC to safely retrieve proposal details
     for a public user holding a valid token.
     """
+    started = time.monotonic()
     try:
         # Call the RPC function defined in schema.sql
-        response = supabase.rpc("get_proposal_for_signing", {"token_input": token}).execute()
-        
+        response = await get_async_client().rpc("get_proposal_for_signing", {"token_input": token}).execute()
+
         # RPC returns a list of rows, we expect one or none
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-        return None
+        result = response.data[0] if response.data and len(response.data) > 0 else None
+        cache_key = _cache_key(token)
+        if max(_invalidated_at.get(cache_key, 0), _all_invalidated_at) < started:
+            ttl = SIGNING_CACHE_TTL_SECONDS if result is not None else SIGNING_CACHE_NEGATIVE_TTL_SECONDS
+            _signing_cache.set(cache_key, result, ttl=ttl)
+        return result
     except Exception as e:
+        # Transient failures are not cached
         print(f"Error fetching proposal for signing: {e}")
         return None
 
-def sign_proposal(token: str, signature_name: str, signature_data: str, user_agent: str = "Script/1.0", consent: bool = True) -> bool:
+async def sign_proposal_async(token: str, signature_name: str, signature_data: str, user_agent: str = "Script/1.0", consent: bool = True) -> bool:
     """
     Calls the Security Definer RPC to sign the proposal.
     """
+    # The signer just viewed the proposal, so this is normally a cache hit;
+    # it identifies the proposal and org for the event log
+    view = await get_proposal_for_signing_async(token)
     try:
         payload = {
             "token_input": token,
@@ -33,9 +93,50 @@ def sign_proposal(token: str, signature_name: str, signature_data: str, user_age
             "signature_data_input": signature_data,
             "user_agent_input": user_agent
         }
-        
-        response = supabase.rpc("sign_proposal_with_token", payload).execute()
+
+        response = await get_async_client().rpc("sign_proposal_with_token", payload).execute()
+        if response.data:
+            # Imported here: signing_finalize builds on workflow_proposals, which imports this module
+            import execution.signing_finalize as signing_finalize
+            # The signed PDF is built in the background; the signer polls for it
+            signing_finalize.enqueue(token)
+        if response.data and view:
+            events.emit("proposal_signed", view.get("org_id"), "proposal", view.get("proposal_id"), payload={
+                "signer_name": signature_name, "signer_email": view.get("signer_email"), "user_agent": user_agent
+            })
         return response.data # Returns boolean from valid PLPGSQL function
     except Exception as e:
         print(f"Error signing proposal: {e}")
         return False
+    finally:
+        # The session's status changes (or may have), so the cached view is stale
+        invalidate_signing_cache(token)
+
+def invalidate_signing_cache(token: str) -> None:
+    _invalidate_key(_cache_key(token))
+
+def _invalidate_key(cache_key: str) -> None:
+    _invalidated_at.set(cache_key, time.monotonic())
+    _signing_cache.delete(cache_key)
+
+def _invalidate_all() -> None:
+    global _all_invalidated_at
+    _all_invalidated_at = time.monotonic()
+    _signing_cache.clear()
+
+template_cache.subscribe(NOTIFY_CHANNEL, _invalidate_key, _invalidate_all)
+
+def signing_cache_stats() -> Dict[str, Any]:
+    return {
+        **_signing_cache.stats(),
+        "ttl_seconds": SIGNING_CACHE_TTL_SECONDS,
+        "negative_ttl_seconds": SIGNING_CACHE_NEGATIVE_TTL_SECONDS,
+    }
+
+# --- Sync wrappers for scripts ---
+
+def get_proposal_for_signing(token: str) -> Optional[Dict[str, Any]]:
+    return run_sync(get_proposal_for_signing_async(token))
+
+def sign_proposal(token: str, signature_name: str, signature_data: str, user_agent: str = "Script/1.0", consent: bool = True) -> bool:
+    return run_sync(sign_proposal_async(token, signature_name, signature_data, user_agent, consent))
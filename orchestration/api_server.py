@@ -1,17 +1,70 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import Response
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, RedirectResponse, StreamingResponse, JSONResponse
+from pydantic import BaseModel, ValidationError
+from postgrest.exceptions import APIError
 from typing import Dict, Any, Optional, List
+from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
+import threading
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import execution.workflow_proposals as wp
 import execution.workflow_core as wc
 import execution.workflow_signing as ws
-import execution.seed_data as sd
 import execution.pdf_generator as pdf
-
-app = FastAPI(title="ProjexNest Orchestrator")
+import execution.pdf_cache as pdf_cache
+import execution.render_service as render_service
+import execution.pdf_export as pdf_export
+import execution.metrics as metrics
+import execution.events as events
+import execution.bulk_import as bulk_import
+import execution.data_export as data_export
+import execution.template_cache as template_cache
+import execution.signing_finalize as signing_finalize
+import execution.sweeper as sweeper
+from execution.pagination import DEFAULT_LIMIT, InvalidQuery
+from execution.supabase_client import close_async_client
+
+DRAFT_FLUSH_INTERVAL_SECONDS = float(os.getenv("DRAFT_FLUSH_INTERVAL_SECONDS", "5"))
+
+async def _flush_working_drafts_forever():
+    while True:
+        await asyncio.sleep(DRAFT_FLUSH_INTERVAL_SECONDS)
+        try:
+            await wp.flush_working_drafts_async()
+        except Exception as e:
+            print(f"Error flushing working drafts: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Autosave coalescing needs someone to turn quiet drafts into versions;
+    # every worker runs the flush (it skips rows another worker holds)
+    flusher = asyncio.create_task(_flush_working_drafts_forever()) if wp.DRAFT_COALESCE_SECONDS > 0 else None
+    if render_service.PRELOAD:
+        render_service.warm_up()
+    # Hears template changes made by other workers (cache invalidation)
+    template_cache.start_listener()
+    # Signed PDFs a previous worker didn't get to finish
+    signing_finalize.start()
+    # Expiry sweeps; only the worker holding the advisory lock runs them
+    sweeper.start()
+    yield
+    sweeper.stop()
+    template_cache.stop_listener()
+    if flusher:
+        flusher.cancel()
+    # Write out queued events; anything that fails stays in the spool for the next worker
+    await asyncio.to_thread(events.flush)
+    # Release the pooled Supabase connections
+    await close_async_client()
+
+app = FastAPI(title="ProjexNest Orchestrator", lifespan=lifespan, default_response_class=metrics.TimedJSONResponse)
+
+# Per-route latency histograms and per-request spans, served at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,8 +72,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paging metadata of the list routes
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Link"],
 )
 
+@app.exception_handler(InvalidQuery)
+def invalid_query_handler(request: Request, exc: InvalidQuery):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+def _page_response(request: Request, page: Dict[str, Any]) -> metrics.TimedJSONResponse:
+    """
+    A list page as the plain JSON array these routes have always returned;
+    the cursor for the next page and the count travel in headers
+    (X-Next-Cursor plus a Link rel="next", X-Total-Count on the first page).
+    """
+    headers = {}
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+        headers["Link"] = f'<{request.url.include_query_params(cursor=page["next_cursor"])}>; rel="next"'
+    if page["count"] is not None:
+        headers["X-Total-Count"] = str(page["count"])
+    return metrics.TimedJSONResponse(content=page["data"], headers=headers)
+
 # --- Pydantic Models ---
 
 class ClientCreate(BaseModel):
@@ -36,27 +109,57 @@ class ProjectCreate(BaseModel):
     name: str
     status: str = "lead"
 
+class BulkCreate(BaseModel):
+    org_id: str
+    rows: List[Any] # validated row by row, so one bad row doesn't reject the batch
+
 class TemplateCreate(BaseModel):
     org_id: str
     name: str
     content: Dict[str, Any]
+    template_type: str = "client_proposal"
+
+class TemplateUpdate(BaseModel):
+    name: Optional[str] = None
+    content: Optional[Dict[str, Any]] = None
+    is_archived: Optional[bool] = None
 
 class ProposalCreate(BaseModel):
     org_id: str
     project_id: str
     template_id: str
     title: str
+    user_id: Optional[str] = None # author of the first version (default DEFAULT_AUTHOR_ID)
+
+class ProposalBatchCreate(BaseModel):
+    org_id: str
+    template_id: str
+    project_ids: List[str]
+    title: str # '{project}' is replaced with each project's name
+    user_id: Optional[str] = None
+    create_links: bool = False # also create a signing link per proposal, addressed to the project's client
+    expires_in_days: int = 7
 
 class ProposalUpdate(BaseModel):
     proposal_id: str
     content: Dict[str, Any]
     user_id: str # mimicking auth user for version tracking
+    publish: bool = False # turn the user's working draft into a version now
 
 class SigningLinkCreate(BaseModel):
     proposal_version_id: str
     signer_email: Optional[str] = None
     expires_in_days: int = 7
 
+class SigningLinkBulkCreate(BaseModel):
+    links: List[SigningLinkCreate]
+
+class SigningLinkRenew(BaseModel):
+    org_id: str
+    tokens: Optional[List[str]] = None # these links...
+    expiring_within_hours: Optional[float] = None # ...and/or every link expiring this soon
+    expires_in_days: int = 7
+
 class PublicSign(BaseModel):
     token: str
     signature_name: str
@@ -67,6 +170,19 @@ class OrganizationCreate(BaseModel):
     name: str
     user_id: str
 
+class SeedRequest(BaseModel):
+    orgs: int = 1
+    clients_per_org: int = 5
+    projects_per_client: int = 1
+    proposal_ratio: float = 0.4
+    versions_per_proposal: int = 1
+    link_ratio: float = 0.5
+    seed: int = 42
+    batch_size: Optional[int] = None # default SEED_BATCH_SIZE
+    workers: int = 4
+    user_id: Optional[str] = None # default SEED_USER_ID
+    background: bool = False # large seeds outlast the request timeout
+
 # --- Core Routes ---
 
 @app.get("/")
@@ -74,118 +190,435 @@ def read_root():
     return {"message": "ProjexNest Orchestrator Running. v1.1"}
 
 @app.post("/workflow/organizations")
-def create_organization(payload: OrganizationCreate):
-    return wc.create_organization(payload.name, payload.user_id)
+async def create_organization(payload: OrganizationCreate):
+    return await wc.create_organization_async(payload.name, payload.user_id)
 
 @app.post("/workflow/clients")
-def create_client(payload: ClientCreate):
-    return wc.create_client(payload.org_id, payload.name, payload.email, payload.phone, payload.address)
+async def create_client(payload: ClientCreate):
+    return await wc.create_client_async(payload.org_id, payload.name, payload.email, payload.phone, payload.address)
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+
+async def _bulk_create(table: str, request: Request, org_id: Optional[str]):
+    """
+    JSON body {"org_id", "rows": [...]}, or an NDJSON stream (one row per line,
+    org_id in the query) which is written while it uploads.
+    """
+    if request.headers.get("content-type", "").startswith(NDJSON_TYPES):
+        if not org_id:
+            raise HTTPException(status_code=400, detail="org_id query parameter is required for NDJSON")
+        rows = bulk_import.parse_ndjson(request.stream())
+    else:
+        try:
+            payload = BulkCreate.model_validate(await request.json())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be JSON or NDJSON")
+        org_id, rows = payload.org_id, payload.rows
+        if len(rows) > bulk_import.IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"at most {bulk_import.IMPORT_MAX_ROWS} rows per request")
+    try:
+        return await bulk_import.bulk_create_async(table, org_id, rows)
+    except bulk_import.ImportTooLarge as e:
+        # Rows before the limit are written; resending them with import_keys is safe
+        raise HTTPException(status_code=413, detail=str(e))
+
+@app.post("/workflow/clients/bulk")
+async def bulk_create_clients(request: Request, org_id: Optional[str] = None):
+    """Creates many clients; per-row results, idempotent for rows with an import_key."""
+    return await _bulk_create("clients", request, org_id)
 
 @app.get("/workflow/clients")
-def list_clients(org_id: str):
-    return wc.list_clients(org_id)
+async def list_clients(request: Request, org_id: str, fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                 created_after: Optional[str] = None, created_before: Optional[str] = None, count: str = "estimated"):
+    return _page_response(request, await wc.list_clients_async(org_id, fields, cursor, limit, created_after, created_before, count))
 
 @app.post("/workflow/projects")
-def create_project(payload: ProjectCreate):
-    return wc.create_project(payload.org_id, payload.client_id, payload.name, payload.status)
+async def create_project(payload: ProjectCreate):
+    return await wc.create_project_async(payload.org_id, payload.client_id, payload.name, payload.status)
+
+@app.post("/workflow/projects/bulk")
+async def bulk_create_projects(request: Request, org_id: Optional[str] = None):
+    """Creates many projects; rows may link to imported clients by client_import_key."""
+    return await _bulk_create("projects", request, org_id)
 
 @app.get("/workflow/projects")
-def list_projects(org_id: str):
-    return wc.list_projects(org_id)
+async def list_projects(request: Request, org_id: str, fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                  status: Optional[str] = None, client_id: Optional[str] = None, created_after: Optional[str] = None,
+                  created_before: Optional[str] = None, count: str = "estimated"):
+    return _page_response(request, await wc.list_projects_async(org_id, fields, cursor, limit, status, client_id, created_after, created_before, count))
 
 @app.post("/workflow/projects/{project_id}/complete")
-def complete_project(project_id: str):
-    return wc.mark_project_complete(project_id)
+async def complete_project(project_id: str):
+    return await wc.mark_project_complete_async(project_id)
+
+@app.get("/workflow/export/{dataset}")
+def export_dataset(dataset: str, org_id: str, format: str = "ndjson", since: Optional[str] = None):
+    """
+    Streams every clients/projects/proposals/versions row of an org as NDJSON
+    or CSV, paging through the table; `since` limits it to rows changed since then.
+    """
+    stream = data_export.stream_export(dataset, org_id, format, since)
+    extension = "csv" if format == "csv" else "ndjson"
+    return StreamingResponse(
+        stream,
+        media_type=data_export.FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={dataset}_{org_id[:8]}.{extension}"}
+    )
+
+# --- Views ---
+
+@app.get("/views/dashboard")
+async def get_dashboard(org_id: str):
+    """Counts by status, pipeline value and signing conversion for an org (precomputed counters)."""
+    return await wc.get_dashboard_stats_async(org_id)
 
 # --- Proposal Routes ---
 
 @app.get("/workflow/templates")
-def list_templates(org_id: str):
-    return wp.list_templates(org_id)
+async def list_templates(request: Request, org_id: str, fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                   template_type: Optional[str] = None, is_archived: Optional[bool] = None, count: str = "estimated"):
+    return _page_response(request, await wp.list_templates_async(org_id, fields, cursor, limit, template_type, is_archived, count))
 
 @app.post("/workflow/templates")
-def create_template(payload: TemplateCreate):
-    return wp.create_template(payload.org_id, payload.name, payload.content)
+async def create_template(payload: TemplateCreate):
+    try:
+        return await wp.create_template_async(payload.org_id, payload.name, payload.content, payload.template_type)
+    except pdf.InvalidLayout as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.patch("/workflow/templates/{template_id}")
+async def update_template(template_id: str, payload: TemplateUpdate):
+    updates = payload.model_dump(exclude_none=True)
+    if "content" in updates:
+        updates["content_json"] = updates.pop("content")
+    if not updates:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    try:
+        template = await wp.update_template_async(template_id, updates)
+    except pdf.InvalidLayout as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
+@app.get("/workflow/templates/cache-stats")
+def get_template_cache_stats():
+    return template_cache.stats()
 
 @app.get("/workflow/proposals")
-def list_proposals(org_id: str):
-    return wp.list_proposals(org_id)
+async def list_proposals(request: Request, org_id: str, fields: Optional[str] = None, cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                   status: Optional[str] = None, client_id: Optional[str] = None, project_id: Optional[str] = None,
+                   created_after: Optional[str] = None, created_before: Optional[str] = None, count: str = "estimated"):
+    return _page_response(request, await wp.list_proposals_async(
+        org_id, fields, cursor, limit, status, client_id, project_id, created_after, created_before, count
+    ))
+
+@app.get("/workflow/proposals/export")
+def export_proposals(org_id: str, status: Optional[str] = None):
+    """
+    Streams a ZIP of every proposal PDF for the org (optionally filtered by status).
+    Stored version PDFs are reused; the rest are rendered in parallel on the render pool.
+    """
+    return StreamingResponse(
+        pdf_export.stream_proposals_zip(org_id, status),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=proposals_{org_id[:8]}.zip"}
+    )
 
 @app.post("/workflow/proposals")
-def create_proposal(payload: ProposalCreate):
+async def create_proposal(payload: ProposalCreate):
     # Mapping 'title' to schema 'name' happens in execution layer
-    return wp.create_proposal_from_template(
+    return await wp.create_proposal_from_template_async(
         payload.org_id, 
         payload.project_id, 
         payload.template_id, 
-        payload.title
+        payload.title,
+        payload.user_id
     )
 
+@app.post("/workflow/proposals/batch")
+async def create_proposals_batch(payload: ProposalBatchCreate):
+    """
+    Creates a proposal from one template for every project in the list.
+    Streams NDJSON: a line per project as its chunk completes, then a
+    {"done": true, ...} summary line.
+    """
+    if not payload.project_ids:
+        raise HTTPException(status_code=400, detail="project_ids is empty")
+    if len(payload.project_ids) > wp.PROPOSAL_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {wp.PROPOSAL_BATCH_MAX} projects per request")
+    try:
+        # Answer a wrong template with a 404 before streaming starts
+        await wp.get_template_async(payload.org_id, payload.template_id)
+    except APIError:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    async def lines():
+        async for result in wp.create_proposals_batch_async(
+            payload.org_id, payload.template_id, payload.project_ids, payload.title,
+            payload.user_id, payload.create_links, payload.expires_in_days
+        ):
+            if "token" in result:
+                result["url"] = _signing_url(result["token"])
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/workflow/proposals/{proposal_id}")
-def get_proposal_detail(proposal_id: str):
-    return wp.get_proposal_full(proposal_id)
+async def get_proposal_detail(proposal_id: str, include: Optional[str] = None, versions_limit: int = 20, versions_offset: int = 0):
+    """
+    Proposal detail with a page of version history.
+    Versions only carry metadata unless ?include=versions_content is passed.
+    """
+    includes = {part.strip() for part in include.split(",")} if include else set()
+    data = await wp.get_proposal_full_async(
+        proposal_id,
+        include_versions_content="versions_content" in includes,
+        versions_limit=max(0, min(versions_limit, 200)),
+        versions_offset=max(0, versions_offset)
+    )
+    if not data:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    return data
+
+@app.get("/workflow/proposals/{proposal_id}/versions/{version_number}")
+async def get_proposal_version(proposal_id: str, version_number: int):
+    """Returns one version with its content reconstructed (versions may be stored as deltas)."""
+    version = await wp.get_proposal_version_async(proposal_id, version_number)
+    if not version:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return version
 
 @app.post("/workflow/proposals/draft")
-def save_draft(payload: ProposalUpdate):
-    return wp.update_proposal_content(payload.proposal_id, payload.content, payload.user_id)
+async def save_draft(payload: ProposalUpdate):
+    return await wp.update_proposal_content_async(payload.proposal_id, payload.content, payload.user_id, payload.publish)
 
 @app.post("/workflow/signing-links")
-def create_signing_link(payload: SigningLinkCreate):
-    token = wp.generate_signing_link(
+async def create_signing_link(payload: SigningLinkCreate):
+    token = await wp.generate_signing_link_async(
         payload.proposal_version_id, 
         payload.signer_email, 
         payload.expires_in_days
     )
-    base_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
     return {
         "token": token,
-        "url": f"{base_url}/public/sign?token={token}"
+        "url": _signing_url(token)
     }
 
-# --- PDF Generation ---
+SIGNING_LINKS_MAX = int(os.getenv("SIGNING_LINKS_MAX", "1000"))
 
-@app.get("/workflow/proposals/{proposal_id}/pdf")
-def generate_proposal_pdf(proposal_id: str):
+def _signing_url(token: str) -> str:
+    base_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
+    return f"{base_url}/public/sign?token={token}"
+
+@app.post("/workflow/signing-links/bulk")
+async def create_signing_links(payload: SigningLinkBulkCreate):
+    """Creates many links (e.g. one proposal to several recipients) in one insert; a result per link, in order."""
+    if len(payload.links) > SIGNING_LINKS_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {SIGNING_LINKS_MAX} links per request")
+    results = await wp.generate_signing_links_async([link.model_dump() for link in payload.links])
+    return {"links": [
+        result if "error" in result else {
+            "proposal_version_id": result["proposal_version_id"],
+            "signer_email": result["signer_email"],
+            "token": result["token"],
+            "url": _signing_url(result["token"]),
+            "expires_at": result["expires_at"],
+        }
+        for result in results
+    ]}
+
+@app.post("/workflow/signing-links/renew")
+async def renew_signing_links(payload: SigningLinkRenew):
+    """Extends unsigned links in place, keeping their tokens and URLs."""
+    if payload.tokens is None and payload.expiring_within_hours is None:
+        raise HTTPException(status_code=400, detail="Pass tokens or expiring_within_hours")
+    renewed = await wp.renew_signing_links_async(
+        payload.org_id, payload.tokens, payload.expiring_within_hours, payload.expires_in_days
+    )
+    return {"renewed": len(renewed), "links": [{**session, "url": _signing_url(session["token"])} for session in renewed]}
+
+@app.post("/workflow/proposals/expire")
+async def expire_proposals():
     """
-    Generates and returns a PDF for the given proposal.
+    Runs an expiry sweep now (the scheduler runs one every
+    SWEEP_INTERVAL_SECONDS): lapsed links and their proposals are marked
+    expired, long-expired links archived. Returns the rows touched.
     """
-    # 1. Get proposal details
-    proposal_data = wp.get_proposal_full(proposal_id)
+    try:
+        return await asyncio.to_thread(sweeper.sweep)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sweep failed: {str(e)}")
+
+@app.get("/workflow/sweeper/stats")
+def get_sweeper_stats():
+    return sweeper.stats()
+
+# --- PDF Generation ---
+
+async def _load_latest_version(proposal_id: str) -> Dict[str, Any]:
+    # Only the latest version is needed to render
+    proposal_data = await wp.get_proposal_full_async(proposal_id, versions_limit=0, include_working_drafts=False)
     if not proposal_data:
         raise HTTPException(status_code=404, detail="Proposal not found")
-    
+    return proposal_data
+
+async def _render_latest_html(proposal_data: Dict[str, Any]) -> str:
     proposal = proposal_data.get("proposal", {})
     client = proposal_data.get("client", {})
     project = proposal_data.get("project", {})
     version = proposal_data.get("latest_version", {})
     content_json = version.get("content_json", {}) if version else {}
+    layout = await wp.get_org_layout_async(proposal["org_id"]) if proposal.get("org_id") else None
+    with metrics.span("html render"):
+        return pdf.render_proposal_html(proposal, content_json, client, project, layout)
+
+def _persist_version_pdf(version: Dict[str, Any]):
+    def _persist(pdf_bytes: bytes):
+        if version.get("id"):
+            wp.schedule_version_pdf(version["id"], pdf_bytes)
+    return _persist
+
+def _render_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="PDF renderer is busy, retry shortly",
+        headers={"Retry-After": str(render_service.RETRY_AFTER_SECONDS)}
+    )
+
+@app.get("/workflow/proposals/{proposal_id}/pdf")
+async def generate_proposal_pdf(proposal_id: str, redirect: bool = False, if_none_match: Optional[str] = Header(None)):
+    """
+    Returns the PDF for the given proposal.
+    Serves the stored version PDF when one exists (streamed, or a redirect to a
+    signed Storage URL with ?redirect=true); otherwise renders it on the render
+    pool, cached by a hash of the proposal HTML, and persists it for next time.
+    """
+    # 1. Get proposal details
+    proposal_data = await _load_latest_version(proposal_id)
+    version = proposal_data.get("latest_version", {})
+    filename = f"proposal_{proposal_id[:8]}.pdf"
+    
+    # 2. Stored version PDF (rendered when the version was saved)
+    stored = version.get("files") if version else None
+    if stored and stored.get("sha256"):
+        key = stored["sha256"]
+        headers = {
+            "ETag": pdf_cache.etag_for(key),
+            "Cache-Control": "private, no-cache",
+        }
+        if pdf_cache.etag_matches(if_none_match, key):
+            return Response(status_code=304, headers=headers)
+        if redirect:
+            url = await wp.signed_pdf_url_async(stored["storage_path"])
+            if url:
+                return RedirectResponse(url, status_code=307)
+        try:
+            pdf_bytes = await pdf_cache.get_or_render_async(key, lambda: wp.download_stored_pdf_async(stored["storage_path"], key))
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Stored PDF unavailable: {str(e)}")
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+    
+    # 3. Render HTML (cheap) and derive the cache key from it
+    html = await _render_latest_html(proposal_data)
+    key = pdf_cache.cache_key(html)
+    headers = {
+        "ETag": pdf_cache.etag_for(key),
+        "Cache-Control": "private, no-cache",
+    }
+    if pdf_cache.etag_matches(if_none_match, key):
+        return Response(status_code=304, headers=headers)
     
-    # 2. Generate PDF
+    # 4. Lay out the PDF on the render pool (or reuse a cached render), then persist it
     try:
-        pdf_bytes = pdf.generate_proposal_pdf(proposal, content_json, client, project)
+        pdf_bytes = await pdf_cache.get_or_render_async(key, lambda: render_service.render_async(html))
+    except render_service.RenderQueueFull:
+        raise _render_busy()
+    except render_service.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
+    _persist_version_pdf(version)(pdf_bytes)
     
-    # 3. Return as downloadable file
-    filename = f"proposal_{proposal_id[:8]}.pdf"
+    # 5. Return as downloadable file
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
     return Response(
         content=pdf_bytes,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        headers=headers
     )
 
+@app.post("/workflow/proposals/{proposal_id}/pdf/jobs", status_code=202)
+async def create_pdf_job(proposal_id: str):
+    """
+    Starts a background render and returns a job id to poll,
+    so batch downloads don't hold HTTP connections open.
+    """
+    proposal_data = await _load_latest_version(proposal_id)
+    version = proposal_data.get("latest_version", {})
+    result_url = f"/workflow/proposals/{proposal_id}/pdf"
+    
+    stored = version.get("files") if version else None
+    if stored and stored.get("sha256"):
+        return {"job_id": stored["sha256"], "status": "done", "result_url": result_url}
+    
+    html = await _render_latest_html(proposal_data)
+    try:
+        job = render_service.submit_job(pdf_cache.cache_key(html), html, on_done=_persist_version_pdf(version))
+    except render_service.RenderQueueFull:
+        raise _render_busy()
+    return {**job, "result_url": f"{result_url}/jobs/{job['job_id']}/result"}
+
+@app.get("/workflow/proposals/{proposal_id}/pdf/jobs/{job_id}")
+def get_pdf_job(proposal_id: str, job_id: str):
+    if not pdf_cache.is_key(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    job = render_service.job_status(job_id)
+    if job["status"] == "unknown":
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "done":
+        job["result_url"] = f"/workflow/proposals/{proposal_id}/pdf/jobs/{job_id}/result"
+    return job
+
+@app.get("/workflow/proposals/{proposal_id}/pdf/jobs/{job_id}/result")
+def get_pdf_job_result(proposal_id: str, job_id: str):
+    if not pdf_cache.is_key(job_id):
+        raise HTTPException(status_code=404, detail="Job result not available")
+    pdf_bytes = pdf_cache.get(job_id)
+    if pdf_bytes is None:
+        raise HTTPException(status_code=404, detail="Job result not available")
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={
+            "ETag": pdf_cache.etag_for(job_id),
+            "Content-Disposition": f"attachment; filename=proposal_{proposal_id[:8]}.pdf"
+        }
+    )
+
+@app.get("/workflow/pdf/cache-stats")
+def get_pdf_cache_stats():
+    return {**pdf_cache.stats(), "render_pool": render_service.stats()}
+
 # --- Public Signing Routes ---
 
 @app.get("/public/proposals/{token}")
-def get_public_proposal(token: str):
-    data = ws.get_proposal_for_signing(token)
+async def get_public_proposal(token: str):
+    data = await ws.get_proposal_for_signing_async(token)
     if not data:
         raise HTTPException(status_code=404, detail="Invalid or expired token")
-    return data
+    return ws.public_view(data)
+
+@app.get("/workflow/signing/cache-stats")
+def get_signing_cache_stats():
+    return ws.signing_cache_stats()
 
 @app.post("/public/proposals/sign")
-def sign_public_proposal(payload: PublicSign):
-    success = ws.sign_proposal(
+async def sign_public_proposal(payload: PublicSign):
+    success = await ws.sign_proposal_async(
         payload.token, 
         payload.signature_name, 
         payload.signature_data, 
@@ -193,14 +626,65 @@ def sign_public_proposal(payload: PublicSign):
     )
     if not success:
         raise HTTPException(status_code=400, detail="Signing failed or link expired")
-    return {"status": "signed"}
+    return {"status": "signed", "final_url": f"/public/proposals/{payload.token}/final"}
+
+@app.get("/public/proposals/{token}/final")
+async def get_signed_pdf(token: str):
+    """
+    The signed PDF of a proposal, for the signing page to poll after signing:
+    status pending / rendering (with Retry-After), done (with its sha256 and
+    a short-lived download URL) or failed.
+    """
+    final = await signing_finalize.get_status_async(token)
+    if not final or final["status"] is None:
+        raise HTTPException(status_code=404, detail="No signed PDF for this link")
+    if final["status"] in signing_finalize.UNFINISHED:
+        return JSONResponse(
+            content={"status": final["status"]},
+            headers={"Retry-After": str(signing_finalize.POLL_AFTER_SECONDS)}
+        )
+    if final["status"] == "failed" or not final["file"]:
+        return {"status": "failed"}
+    stored = final["file"]
+    return {
+        "status": "done",
+        "sha256": stored["sha256"],
+        "size_bytes": stored["size_bytes"],
+        "url": await wp.signed_pdf_url_async(stored["storage_path"])
+    }
+
+@app.get("/workflow/signing/finalize-stats")
+def get_finalize_stats():
+    return signing_finalize.stats()
 
 # --- Utility Routes ---
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint (merged across gunicorn workers in multiprocess mode)."""
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/workflow/events/stats")
+def get_event_stats():
+    return events.stats()
+
 @app.post("/workflow/seed")
-def trigger_seed():
+def trigger_seed(payload: Optional[SeedRequest] = None):
+    # Imported here: seeding is rare and stays out of worker startup
+    import execution.seed_data as sd
+    params = (payload or SeedRequest()).model_dump(exclude_none=True)
+    if params.pop("background"):
+        # Progress goes to the log; re-posting the same request resumes it
+        threading.Thread(target=_seed_safely, args=(params,), name="seed", daemon=True).start()
+        return JSONResponse(status_code=202, content={"status": "Seed started", "seed": params["seed"]})
     try:
-        sd.seed()
-        return {"status": "Seed completed"}
+        return {"status": "Seed completed", **sd.seed(**params)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _seed_safely(params: Dict[str, Any]):
+    import execution.seed_data as sd
+    try:
+        sd.seed(**params)
+    except Exception as e:
+        print(f"Error seeding data: {e}")
+
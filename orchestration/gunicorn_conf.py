@@ -0,0 +1,19 @@
+import os
+import shutil
+import tempfile
+
+# Prometheus multiprocess mode: workers write metric samples under this
+# directory and /metrics merges them. Set before the workers import the app.
+
+
+def on_starting(server):
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.path.join(tempfile.gettempdir(), "projexnest_metrics")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    # Samples from a previous run would be merged into this one
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
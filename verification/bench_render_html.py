@@ -0,0 +1,259 @@
+"""
+Microbenchmark: Jinja proposal template vs the original f-string renderer.
+
+Usage: python -m verification.bench_render_html [--repeat N] [--pdf]
+
+The legacy renderer is frozen below exactly as it shipped, so the numbers
+stay comparable as the template evolves.
+
+By default only HTML generation is timed. --pdf times the whole HTML -> PDF
+path instead: the legacy HTML with its inline <style> block through
+WeasyPrint, against the template plus the shared pre-parsed stylesheet
+(pdf_generator.generate_pdf_from_html). Needs WeasyPrint's native libraries.
+"""
+import argparse
+import timeit
+from typing import Dict, Any
+
+from execution.pdf_generator import generate_pdf_from_html, preload, render_proposal_html
+
+SECTION_COUNTS = [10, 100, 1000]
+PDF_SECTION_COUNTS = [1, 10, 100]
+
+
+def legacy_render_proposal_html(proposal: Dict[str, Any], content_json: Dict[str, Any], client: Dict[str, Any] = None, project: Dict[str, Any] = None) -> str:
+    """
+    Renders a proposal's data into an HTML string suitable for PDF conversion.
+    Uses fields from the proposal table directly (scope_of_work, total, etc.)
+    Falls back to content_json for template-based content.
+    """
+    # Primary data from proposals table
+    title = proposal.get("name", proposal.get("title", "Proposal"))
+    scope = proposal.get("scope_of_work", "") or content_json.get("scope", "")
+    total = proposal.get("total", 0) or 0
+    legal_terms = proposal.get("legal_terms", "") or content_json.get("terms", "")
+    payment_schedule = proposal.get("payment_schedule", "") or ""
+    
+    # Related data
+    client_name = client.get("name", "Client") if client else "Client"
+    client_email = client.get("email", "") if client else ""
+    project_name = project.get("name", "Project") if project else "Project"
+    
+    # Extract sections from content_json (if template-based)
+    sections = content_json.get("sections", [])
+    pricing = content_json.get("pricing", [])
+    
+    # Build sections HTML
+    sections_html = ""
+    for section in sections:
+        sections_html += f"""
+        <div class="section">
+            <h2>{section.get('title', 'Section')}</h2>
+            <p>{section.get('content', '')}</p>
+        </div>
+        """
+    
+    # Build pricing table (from content_json if available, otherwise use total)
+    pricing_html = ""
+    if pricing:
+        pricing_html = """
+        <div class="section">
+            <h2>Pricing</h2>
+            <table>
+                <thead>
+                    <tr><th>Item</th><th>Description</th><th>Amount</th></tr>
+                </thead>
+                <tbody>
+        """
+        total_sum = 0
+        for item in pricing:
+            amount = item.get('amount', 0)
+            total_sum += amount
+            pricing_html += f"""
+                <tr>
+                    <td>{item.get('name', '')}</td>
+                    <td>{item.get('description', '')}</td>
+                    <td>${amount:,.2f}</td>
+                </tr>
+            """
+        pricing_html += f"""
+                </tbody>
+                <tfoot>
+                    <tr><td colspan="2"><strong>Total</strong></td><td><strong>${total_sum:,.2f}</strong></td></tr>
+                </tfoot>
+            </table>
+        </div>
+        """
+    elif total:
+        # Simple total from proposal table
+        pricing_html = f"""
+        <div class="section">
+            <h2>Pricing</h2>
+            <table>
+                <tbody>
+                    <tr><td><strong>Total</strong></td><td><strong>${total:,.2f}</strong></td></tr>
+                </tbody>
+            </table>
+        </div>
+        """
+    
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>{title}</title>
+        <style>
+            body {{
+                font-family: 'Helvetica Neue', Arial, sans-serif;
+                margin: 40px;
+                color: #333;
+                line-height: 1.6;
+            }}
+            .header {{
+                text-align: center;
+                border-bottom: 2px solid #2563eb;
+                padding-bottom: 20px;
+                margin-bottom: 30px;
+            }}
+            .header h1 {{
+                color: #2563eb;
+                margin-bottom: 5px;
+            }}
+            .section {{
+                margin-bottom: 25px;
+            }}
+            .section h2 {{
+                color: #1e40af;
+                border-bottom: 1px solid #e5e7eb;
+                padding-bottom: 5px;
+            }}
+            table {{
+                width: 100%;
+                border-collapse: collapse;
+                margin-top: 10px;
+            }}
+            th, td {{
+                padding: 10px;
+                border: 1px solid #e5e7eb;
+                text-align: left;
+            }}
+            th {{
+                background-color: #f3f4f6;
+            }}
+            tfoot td {{
+                font-weight: bold;
+                background-color: #f9fafb;
+            }}
+            .terms {{
+                font-size: 0.9em;
+                color: #6b7280;
+                margin-top: 30px;
+                padding-top: 20px;
+                border-top: 1px solid #e5e7eb;
+            }}
+            .signature-block {{
+                margin-top: 50px;
+                padding: 20px;
+                border: 1px dashed #9ca3af;
+            }}
+            .signature-line {{
+                margin-top: 40px;
+                border-top: 1px solid #333;
+                width: 300px;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>{title}</h1>
+            <p>Professional Proposal</p>
+        </div>
+        
+        <div class="section">
+            <h2>Project Details</h2>
+            <table>
+                <tr><td><strong>Client</strong></td><td>{client_name}</td></tr>
+                <tr><td><strong>Project</strong></td><td>{project_name}</td></tr>
+            </table>
+        </div>
+        
+        {sections_html}
+        
+        {f'<div class="section"><h2>Scope of Work</h2><p>{scope}</p></div>' if scope else ''}
+        
+        {pricing_html}
+        
+        {f'<div class="section"><h2>Payment Schedule</h2><p>{payment_schedule}</p></div>' if payment_schedule else ''}
+        
+        {f'<div class="terms"><h3>Terms & Conditions</h3><p>{legal_terms}</p></div>' if legal_terms else ''}
+        
+        <div class="signature-block">
+            <p><strong>Acceptance</strong></p>
+            <p>By signing below, you agree to the terms outlined in this proposal.</p>
+            <div class="signature-line"></div>
+            <p>Signature & Date</p>
+        </div>
+    </body>
+    </html>
+    """
+
+
+def build_fixture(n_sections: int):
+    proposal = {
+        "name": "Kitchen Remodel",
+        "scope_of_work": "Demolition, cabinetry, countertops & finishing.",
+        "legal_terms": "Net 30. Prices valid for 30 days.",
+        "payment_schedule": "50% deposit, 50% on completion.",
+        "total": 48250,
+    }
+    content_json = {
+        "sections": [
+            {"title": f"Phase {i + 1}", "content": "Remove existing fixtures and prepare the site. " * 4}
+            for i in range(n_sections)
+        ],
+        "pricing": [
+            {"name": f"Line item {i + 1}", "description": "Labour and materials", "amount": 125.5 * (i + 1)}
+            for i in range(n_sections)
+        ],
+    }
+    client = {"name": "Jane Homeowner", "email": "jane@example.com"}
+    project = {"name": "Kitchen Remodel"}
+    return proposal, content_json, client, project
+
+
+def run(repeat: int):
+    print(f"{'sections':>8} | {'legacy (ms)':>12} | {'template (ms)':>13} | {'speedup':>7}")
+    for n in SECTION_COUNTS:
+        args = build_fixture(n)
+        number = max(1, 2000 // n)
+        legacy = min(timeit.repeat(lambda: legacy_render_proposal_html(*args), number=number, repeat=repeat)) / number
+        current = min(timeit.repeat(lambda: render_proposal_html(*args), number=number, repeat=repeat)) / number
+        print(f"{n:>8} | {legacy * 1000:>12.3f} | {current * 1000:>13.3f} | {legacy / current:>6.2f}x")
+
+
+def legacy_generate_pdf(html_content: str) -> bytes:
+    """The original generate_pdf_from_html: WeasyPrint parses the inline CSS on every call."""
+    from weasyprint import HTML
+    return HTML(string=html_content).write_pdf()
+
+
+def run_pdf(repeat: int):
+    # Import WeasyPrint and parse the shared stylesheet outside the timings,
+    # as the server does at startup
+    preload()
+    print(f"{'sections':>8} | {'legacy (ms)':>12} | {'template (ms)':>13} | {'speedup':>7}")
+    for n in PDF_SECTION_COUNTS:
+        args = build_fixture(n)
+        number = max(1, 20 // n)
+        legacy = min(timeit.repeat(lambda: legacy_generate_pdf(legacy_render_proposal_html(*args)), number=number, repeat=repeat)) / number
+        current = min(timeit.repeat(lambda: generate_pdf_from_html(render_proposal_html(*args)), number=number, repeat=repeat)) / number
+        print(f"{n:>8} | {legacy * 1000:>12.1f} | {current * 1000:>13.1f} | {legacy / current:>6.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pdf", action="store_true", help="time HTML -> PDF instead of HTML only")
+    args = parser.parse_args()
+    (run_pdf if args.pdf else run)(args.repeat)
@@ -0,0 +1,332 @@
+"""
+End-to-end benchmark of the orchestrator API under a realistic request mix.
+
+Usage:
+  python -m verification.benchmark_api [--backend fake|live] [--duration 30] [--concurrency 16]
+      [--mix list=30,detail=20,draft=30,pdf=10,sign=10] [--out bench.json] [--compare baseline.json]
+
+The app runs in-process (httpx ASGITransport, lifespan included), so the
+numbers cover routing, validation, data access, rendering and serialization
+but not a network hop to the API itself.
+
+Backends:
+  fake  in-memory PostgREST/Storage stand-in (verification/fake_supabase.py)
+        with --latency-ms per backend round trip; loaded from the seeder's
+        deterministic generator. Measures the orchestrator's own cost and its
+        round trips, not the database.
+  live  whatever SUPABASE_URL points at, e.g. a local `supabase start` stack
+        with schema.sql applied. The dataset is seeded first (same seed = same
+        rows, so re-runs only fill gaps) unless --no-seed.
+
+Results (p50/p95/p99 latency, throughput and error rate per route) are
+printed and written as JSON; --compare prints the change against an earlier
+run and flags p95 regressions above --threshold percent.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+MIX = "list=30,detail=20,draft=30,pdf=10,sign=10"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("fake", "live"), default="fake")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds run before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual users")
+    parser.add_argument("--mix", default=MIX, help="Scenario weights")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Fake backend delay per round trip")
+    parser.add_argument("--seed", type=int, default=7, help="Dataset and request-mix seed")
+    parser.add_argument("--orgs", type=int, default=2)
+    parser.add_argument("--clients-per-org", type=int, default=2000)
+    parser.add_argument("--projects-per-client", type=int, default=1)
+    parser.add_argument("--versions-per-proposal", type=int, default=5)
+    parser.add_argument("--no-seed", action="store_true", help="live: the dataset is already loaded")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 regression threshold, percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    return parser.parse_args(argv)
+
+
+# --- Dataset ---
+
+def build_catalog(args, sd, fake=None) -> Dict[str, Any]:
+    """
+    Walks the seeder's generator for the configured dataset, collecting the ids
+    scenarios pick from (and loading the fake backend, if there is one).
+    """
+    config = sd.dataset_config(args.clients_per_org, args.projects_per_client, 0.5, args.versions_per_proposal, 0.5)
+    catalog = {"orgs": [], "proposals": [], "tokens": [], "user_id": config["user_id"]}
+    for org in range(args.orgs):
+        batch = defaultdict(list)
+        for table, row in sd.org_rows(args.seed, org, config):
+            if fake is not None:
+                batch[table].append(row)
+            if table == "organizations":
+                catalog["orgs"].append(row["id"])
+            elif table == "proposals":
+                catalog["proposals"].append(row["id"])
+            elif table == "signing_sessions" and row["status"] in ("pending", "viewed"):
+                catalog["tokens"].append(row["token"])
+        if fake is not None:
+            for table, rows in batch.items():
+                fake.load(table, rows)
+    return catalog
+
+
+# --- Scenarios ---
+# Each makes one user action's requests and reports them as (route, status, seconds).
+
+async def _call(client, record, route: str, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        status = response.status_code
+    except Exception:
+        response, status = None, 599
+    record(route, status, time.perf_counter() - started)
+    return response
+
+
+async def scenario_list(client, rng, catalog, record):
+    org_id = rng.choice(catalog["orgs"])
+    response = await _call(client, record, "GET /workflow/proposals", "GET", "/workflow/proposals",
+                           params={"org_id": org_id, "limit": 50})
+    cursor = response.headers.get("X-Next-Cursor") if response is not None and response.status_code == 200 else None
+    if cursor and rng.random() < 0.5:
+        await _call(client, record, "GET /workflow/proposals?cursor", "GET", "/workflow/proposals",
+                    params={"org_id": org_id, "limit": 50, "cursor": cursor})
+    await _call(client, record, "GET /workflow/clients", "GET", "/workflow/clients",
+                params={"org_id": org_id, "limit": 50, "fields": "id,name,email"})
+
+
+async def scenario_detail(client, rng, catalog, record):
+    proposal_id = rng.choice(catalog["proposals"])
+    await _call(client, record, "GET /workflow/proposals/{id}", "GET", f"/workflow/proposals/{proposal_id}")
+
+
+async def scenario_draft(client, rng, catalog, record):
+    proposal_id = rng.choice(catalog["proposals"])
+    content = {
+        "sections": [{"title": f"Section {i}", "content": "Scope of work. " * rng.randint(5, 30)} for i in range(rng.randint(3, 8))],
+        "pricing": [{"item": f"Line {i}", "amount": rng.randint(100, 9000)} for i in range(rng.randint(2, 6))],
+    }
+    await _call(client, record, "POST /workflow/proposals/draft", "POST", "/workflow/proposals/draft",
+                json={"proposal_id": proposal_id, "content": content, "user_id": catalog["user_id"]})
+
+
+async def scenario_pdf(client, rng, catalog, record):
+    # A small hot set, as users re-download the same proposals
+    proposal_id = rng.choice(catalog["proposals"][:50])
+    await _call(client, record, "GET /workflow/proposals/{id}/pdf", "GET", f"/workflow/proposals/{proposal_id}/pdf")
+
+
+async def scenario_sign(client, rng, catalog, record):
+    if not catalog["tokens"]:
+        return
+    token = catalog["tokens"].pop(rng.randrange(len(catalog["tokens"])))
+    await _call(client, record, "GET /public/proposals/{token}", "GET", f"/public/proposals/{token}")
+    await _call(client, record, "GET /public/proposals/{token}", "GET", f"/public/proposals/{token}")
+    await _call(client, record, "POST /public/proposals/sign", "POST", "/public/proposals/sign",
+                json={"token": token, "signature_name": "Bench Signer", "signature_data": "Bench Signer"})
+
+
+SCENARIOS = {
+    "list": scenario_list,
+    "detail": scenario_detail,
+    "draft": scenario_draft,
+    "pdf": scenario_pdf,
+    "sign": scenario_sign,
+}
+
+
+# --- Load ---
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples: Dict[str, List[tuple]], elapsed: float) -> Dict[str, Any]:
+    routes = {}
+    everything = []
+    for route, entries in sorted(samples.items()):
+        latencies = sorted(seconds * 1000 for _, seconds in entries)
+        errors = sum(1 for status, _ in entries if status >= 400 and status != 404)
+        everything.extend(entries)
+        routes[route] = {
+            "count": len(entries),
+            "errors": errors,
+            "error_rate": round(errors / len(entries), 4),
+            "rps": round(len(entries) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+    latencies = sorted(seconds * 1000 for _, seconds in everything)
+    errors = sum(1 for status, _ in everything if status >= 400 and status != 404)
+    total = {
+        "count": len(everything),
+        "errors": errors,
+        "error_rate": round(errors / len(everything), 4) if everything else 0.0,
+        "rps": round(len(everything) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+    return {"routes": routes, "total": total}
+
+
+async def run_load(app, catalog, args) -> Dict[str, Any]:
+    import httpx
+
+    weights = {}
+    for part in args.mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    names, scenario_weights = list(weights), list(weights.values())
+
+    samples: Dict[str, List[tuple]] = defaultdict(list)
+    measuring = {"on": False}
+
+    def record(route: str, status: int, seconds: float):
+        if measuring["on"]:
+            samples[route].append((status, seconds))
+
+    async def user(worker: int, deadline: float):
+        rng = random.Random(f"{args.seed}:{worker}")
+        while time.monotonic() < deadline:
+            name = rng.choices(names, scenario_weights)[0]
+            await SCENARIOS[name](client, rng, catalog, record)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            deadline = time.monotonic() + args.warmup + args.duration
+            users = [asyncio.create_task(user(w, deadline)) for w in range(args.concurrency)]
+            await asyncio.sleep(args.warmup)
+            measuring["on"] = True
+            started = time.monotonic()
+            await asyncio.gather(*users)
+            elapsed = time.monotonic() - started
+    return summarize(samples, elapsed)
+
+
+# --- Reporting ---
+
+def print_report(results: Dict[str, Any]):
+    print(f"{'route':<36} {'count':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for route, stats in list(results["routes"].items()) + [("TOTAL", results["total"])]:
+        print(f"{route:<36} {stats['count']:>7} {stats['rps']:>8.1f} {stats['error_rate'] * 100:>6.2f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+    if results["meta"].get("backend_requests_per_api_request") is not None:
+        print(f"Backend round trips per API request: {results['meta']['backend_requests_per_api_request']}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Prints per-route changes; returns the routes whose p95 regressed beyond `threshold` percent."""
+    def change(new, old):
+        return (new - old) / old * 100 if old else 0.0
+
+    print(f"\nvs {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta'].get('timestamp', '?')})")
+    print(f"{'route':<36} {'p50 %':>8} {'p95 %':>8} {'p99 %':>8} {'rps %':>8}")
+    regressions = []
+    old_routes = baseline.get("routes", {})
+    for route, stats in list(results["routes"].items()) + [("TOTAL", results["total"])]:
+        old = baseline["total"] if route == "TOTAL" else old_routes.get(route)
+        if not old:
+            continue
+        p95 = change(stats["p95_ms"], old["p95_ms"])
+        flag = " <-- regression" if p95 > threshold else ""
+        if flag:
+            regressions.append(route)
+        print(f"{route:<36} {change(stats['p50_ms'], old['p50_ms']):>+8.1f} {p95:>+8.1f} "
+              f"{change(stats['p99_ms'], old['p99_ms']):>+8.1f} {change(stats['rps'], old['rps']):>+8.1f}{flag}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    fake = None
+    if args.backend == "fake":
+        # The app reads these at import; nothing leaves the process
+        os.environ.setdefault("SUPABASE_URL", "http://fake-supabase.local")
+        os.environ.setdefault("SUPABASE_SERVICE_KEY", "fake-service-key")
+        os.environ.setdefault("PDF_CACHE_DIR", tempfile.mkdtemp(prefix="bench_pdf_cache_"))
+        from verification.fake_supabase import FakeSupabase
+        fake = FakeSupabase(latency_ms=args.latency_ms)
+        fake.install()
+
+    import execution.seed_data as sd
+    if args.backend == "live" and not args.no_seed:
+        sd.seed(orgs=args.orgs, clients_per_org=args.clients_per_org, projects_per_client=args.projects_per_client,
+                proposal_ratio=0.5, versions_per_proposal=args.versions_per_proposal, link_ratio=0.5, seed=args.seed)
+
+    print(f"Loading catalog ({args.backend} backend)...")
+    catalog = build_catalog(args, sd, fake)
+    print(f"{len(catalog['orgs'])} orgs, {len(catalog['proposals'])} proposals, {len(catalog['tokens'])} open signing links")
+
+    from orchestration.api_server import app
+    if fake is not None:
+        fake.requests.clear()
+
+    print(f"Running {args.mix} for {args.duration}s (+{args.warmup}s warmup) at concurrency {args.concurrency}...")
+    results = asyncio.run(run_load(app, catalog, args))
+    # Version PDFs queued by draft saves outlive the run; drop them rather than
+    # rendering the backlog while the render pool is being torn down at exit
+    import execution.workflow_proposals as wp
+    wp._pdf_executor.shutdown(wait=True, cancel_futures=True)
+
+    backend_requests = sum(fake.requests.values()) if fake is not None else None
+    api_requests = results["total"]["count"]
+    results["meta"] = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "backend": args.backend,
+        "latency_ms": args.latency_ms if fake is not None else None,
+        "python": sys.version.split()[0],
+        "args": vars(args),
+        # Includes warmup traffic, so only comparable between runs with the same settings
+        "backend_requests_per_api_request": round(backend_requests / api_requests, 2) if backend_requests and api_requests else None,
+    }
+    print_report(results)
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Shared fixtures for the verification tests:
+
+- `fake_supabase`: the in-memory PostgREST/Storage stand-in
+  (verification/fake_supabase.py) behind both the shared sync client and
+  every async client, so the orchestrator runs unmodified without a database.
+- `pg_schema` / `pg_connect`: functions from execution/schema.sql loaded into
+  a throwaway schema of a plain local Postgres, for the tests that need real
+  SQL. Set TEST_DATABASE_URL (e.g. postgresql://postgres@localhost:5432/postgres);
+  tests using them are skipped otherwise.
+"""
+import os
+import re
+import uuid
+import weakref
+
+import pytest
+
+import execution.supabase_client as sc
+from verification.fake_supabase import FakeSupabase
+
+TEST_DB_URL = os.getenv("TEST_DATABASE_URL")
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "execution", "schema.sql")
+
+
+def schema_sql(pattern: str) -> str:
+    """The first block of schema.sql matching `pattern` (a regex, matched with re.S)."""
+    with open(SCHEMA_FILE) as f:
+        match = re.search(pattern, f.read(), re.S)
+    assert match, f"{pattern!r} not found in schema.sql"
+    return match.group(0)
+
+
+def function_sql(name: str) -> str:
+    """The `create or replace function` statement for `name` from schema.sql."""
+    return schema_sql(rf"create or replace function {name}\(.*?\n\$\$;")
+
+
+def connect(schema: str):
+    """An autocommit connection to TEST_DATABASE_URL with search_path set to `schema`."""
+    import psycopg2
+    conn = psycopg2.connect(TEST_DB_URL, options=f"-c search_path={schema}")
+    conn.autocommit = True
+    return conn
+
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setenv("SUPABASE_URL", "http://fake-supabase.local")
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "fake-service-key")
+    monkeypatch.setattr(sc, "_client", None)
+    monkeypatch.setattr(sc, "_async_clients", weakref.WeakKeyDictionary())
+    # install() replaces the builder; recorded here so it is restored afterwards
+    monkeypatch.setattr(sc, "_build_http_client", sc._build_http_client)
+    fake.install()
+    return fake
+
+
+@pytest.fixture
+def database_url():
+    if not TEST_DB_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    pytest.importorskip("psycopg2")
+    return TEST_DB_URL
+
+
+@pytest.fixture
+def pg_connect(database_url):
+    """connect(), closing the connections after the test."""
+    connections = []
+
+    def tracked(schema: str):
+        connections.append(connect(schema))
+        return connections[-1]
+
+    yield tracked
+    for conn in connections:
+        conn.close()
+
+
+@pytest.fixture
+def pg_schema(database_url, pg_connect):
+    """
+    Returns create(prefix, tables, functions=(), sql=()): a throwaway schema
+    with the given tables, schema.sql functions (by name) and further
+    statements, dropped after the test.
+    """
+    created = []
+
+    def create(prefix: str, tables: str, functions=(), sql=()) -> str:
+        schema = f"{prefix}_{uuid.uuid4().hex[:8]}"
+        created.append(schema)
+        with pg_connect("public").cursor() as cur:
+            cur.execute(f"create schema {schema}")
+            cur.execute(f"set search_path = {schema}")
+            cur.execute(tables)
+            for name in functions:
+                cur.execute(function_sql(name))
+            for statement in sql:
+                cur.execute(statement)
+        return schema
+
+    yield create
+    with pg_connect("public").cursor() as cur:
+        for schema in created:
+            cur.execute(f"drop schema {schema} cascade")
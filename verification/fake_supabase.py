@@ -0,0 +1,623 @@
+"""
+In-memory stand-in for the Supabase REST (PostgREST) and Storage APIs, served
+as an httpx transport so the orchestrator runs unmodified without a database.
+
+It covers the subset the app issues (filters, keyset `or`, ordering, counts,
+one level of embedding with per-embed order/limit, inserts/upserts/updates,
+`.single()`, the RPCs in schema.sql and object upload/download) - it is not a
+general PostgREST. Each request can be delayed by `latency_ms` to model the
+network round trip, so benchmarks against it measure the orchestrator's own
+cost plus how many round trips each route makes, not database performance.
+
+    fake = FakeSupabase(latency_ms=2)
+    fake.install()          # before the first request is made
+    fake.load("clients", rows)
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# (table, embedded table) -> (kind, foreign key column)
+RELATIONS = {
+    ("proposals", "clients"): ("one", "client_id"),
+    ("proposals", "projects"): ("one", "project_id"),
+    ("projects", "clients"): ("one", "client_id"),
+    ("proposal_versions", "files"): ("one", "pdf_file_id"),
+    ("proposal_versions", "proposals"): ("one", "proposal_id"),
+    ("signing_sessions", "proposal_versions"): ("one", "proposal_version_id"),
+    ("signing_sessions", "files"): ("one", "final_file_id"),
+    ("signing_sessions", "signatures"): ("many", "signing_session_id"),
+    ("proposals", "proposal_versions"): ("many", "proposal_id"),
+    ("proposals", "proposal_working_drafts"): ("many", "proposal_id"),
+}
+
+# Column defaults applied on insert
+DEFAULTS = {
+    "proposals": {"status": "draft"},
+    "proposal_templates": {"is_archived": False, "template_type": "client_proposal"},
+    "proposal_versions": {"storage_kind": "snapshot", "pinned": False, "pdf_file_id": None, "content_hash": None},
+    "signing_sessions": {"status": "pending", "finalization_status": None, "finalization_attempts": 0, "final_file_id": None},
+}
+TIMESTAMPED = {"proposals", "proposal_templates", "proposal_working_drafts"}
+PRIMARY_KEYS = {"proposal_working_drafts": ("proposal_id", "user_id")}
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns", "or", "and"}
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _interval(text: str) -> datetime.timedelta:
+    """'12 hours' / '7 days' / '1.5 hours', as the app passes intervals to RPCs."""
+    amount, unit = text.split()
+    return datetime.timedelta(**{unit if unit.endswith("s") else unit + "s": float(amount)})
+
+
+def _content_hash(doc: Any) -> str:
+    return hashlib.sha256(json.dumps(doc, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _split_top(text: str, sep: str = ",") -> List[str]:
+    """Splits on `sep` outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if current and "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _parse_select(text: str) -> List[tuple]:
+    items = []
+    for part in _split_top(text or "*"):
+        match = re.match(r"^(?:(\w+):)?(\w+)\((.*)\)$", part, re.S)
+        if match:
+            alias, table, inner = match.groups()
+            items.append(("embed", alias or table, table, _parse_select(inner)))
+        else:
+            items.append(("col", part.split("::")[0].strip()))
+    return items
+
+
+def _coerce(row_value: Any, raw: str) -> Any:
+    raw = raw[1:-1] if len(raw) >= 2 and raw[0] == raw[-1] == '"' else raw
+    if isinstance(row_value, bool):
+        return raw.lower() == "true"
+    if isinstance(row_value, int):
+        return int(raw)
+    if isinstance(row_value, float):
+        return float(raw)
+    return raw
+
+
+def _match(row: Dict[str, Any], column: str, expr: str) -> bool:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition(".")
+    value = row.get(column)
+    if op == "is":
+        result = value is None if raw == "null" else value is (raw == "true")
+    elif op == "in":
+        options = [o.strip('"') for o in _split_top(raw.strip("()"))]
+        result = value is not None and str(value) in options
+    elif value is None:
+        result = False
+    else:
+        other = _coerce(value, raw)
+        result = {
+            "eq": lambda: value == other, "neq": lambda: value != other,
+            "gt": lambda: value > other, "gte": lambda: value >= other,
+            "lt": lambda: value < other, "lte": lambda: value <= other,
+            "like": lambda: re.fullmatch(other.replace("*", ".*").replace("%", ".*"), str(value)) is not None,
+            "ilike": lambda: re.fullmatch(other.replace("*", ".*").replace("%", ".*"), str(value), re.I) is not None,
+        }[op]()
+    return not result if negate else result
+
+
+def _match_logic(row: Dict[str, Any], mode: str, text: str) -> bool:
+    """Evaluates an or=(...) / and(...) expression."""
+    results = []
+    for cond in _split_top(text.strip()[1:-1] if text.strip().startswith("(") else text):
+        nested = re.match(r"^(and|or)(\(.*\))$", cond, re.S)
+        if nested:
+            results.append(_match_logic(row, nested.group(1), nested.group(2)))
+        else:
+            column, _, expr = cond.partition(".")
+            results.append(_match(row, column, expr))
+    return any(results) if mode == "or" else all(results)
+
+
+def _sort(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+    for term in reversed(_split_top(order or "")):
+        column, _, direction = term.partition(".")
+        desc = direction.startswith("desc")
+        # Postgres puts nulls last ascending, first descending
+        rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else 0), reverse=desc)
+    return rows
+
+
+def _multipart_file(request: httpx.Request) -> bytes:
+    boundary = request.headers["content-type"].split("boundary=")[1].encode()
+    for part in request.content.split(b"--" + boundary):
+        if b'name="file"' in part:
+            return part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0]
+    return request.content
+
+
+class FakeSupabase:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.tables: Dict[str, Dict[Any, Dict[str, Any]]] = defaultdict(dict)
+        self.objects: Dict[Tuple[str, str], bytes] = {}
+        self.requests: Counter = Counter()
+        self._lock = threading.RLock()
+        self.rpcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "append_proposal_version": self._rpc_append_proposal_version,
+            "save_proposal_draft": self._rpc_save_proposal_draft,
+            "flush_working_drafts": self._rpc_flush_working_drafts,
+            "get_proposal_version_content": self._rpc_get_proposal_version_content,
+            "pin_proposal_version": self._rpc_pin_proposal_version,
+            "get_proposal_for_signing": self._rpc_get_proposal_for_signing,
+            "sign_proposal_with_token": self._rpc_sign_proposal_with_token,
+            "create_proposals_from_template": self._rpc_create_proposals_from_template,
+            "pin_proposal_versions": self._rpc_pin_proposal_versions,
+            "renew_signing_sessions": self._rpc_renew_signing_sessions,
+            "expire_signing_sessions": self._rpc_expire_signing_sessions,
+            "archive_signing_sessions": self._rpc_archive_signing_sessions,
+        }
+
+    # --- Wiring ---
+
+    def install(self) -> None:
+        """Routes the shared sync client and every new async client to this fake."""
+        import execution.supabase_client as sc
+
+        sync_transport = httpx.MockTransport(self._handle_sync)
+        client = sc.get_client()
+        for session in (client.postgrest.session, client.storage.session, getattr(client.storage, "_client", None)):
+            if isinstance(session, httpx.Client):
+                session._transport = sync_transport
+
+        def build_http_client() -> httpx.AsyncClient:
+            return httpx.AsyncClient(transport=httpx.MockTransport(self._handle_async), follow_redirects=True,
+                                     event_hooks=sc.HTTPX_EVENT_HOOKS)
+
+        sc._build_http_client = build_http_client
+
+    def _handle_sync(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.handle(request)
+
+    async def _handle_async(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.handle(request)
+
+    def load(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            for row in rows:
+                self._insert_row(table, dict(row), upsert=None)
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        return list(self.tables[table].values())
+
+    # --- Dispatch ---
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        with self._lock:
+            try:
+                if path.startswith("/rest/v1/rpc/"):
+                    name = path.rsplit("/", 1)[1]
+                    self.requests[f"rpc:{name}"] += 1
+                    return self._rpc(name, json.loads(request.content or b"{}"))
+                if path.startswith("/rest/v1/"):
+                    table = path[len("/rest/v1/"):]
+                    self.requests[f"{request.method}:{table}"] += 1
+                    return self._rest(request, table)
+                if path.startswith("/storage/v1/object/"):
+                    self.requests[f"storage:{request.method}"] += 1
+                    return self._storage(request, path[len("/storage/v1/object/"):])
+            except Exception as e:
+                return httpx.Response(400, json={"message": str(e), "code": "FAKE", "hint": None, "details": None})
+        return httpx.Response(404, json={"message": f"No route {path}", "code": "FAKE404", "hint": None, "details": None})
+
+    # --- REST ---
+
+    def _rest(self, request: httpx.Request, table: str) -> httpx.Response:
+        params = list(request.url.params.multi_items())
+        prefer = request.headers.get("prefer", "")
+        if request.method == "GET":
+            return self._select(request, table, params, prefer)
+        if request.method == "POST":
+            body = json.loads(request.content or b"[]")
+            rows = body if isinstance(body, list) else [body]
+            upsert = None
+            if "resolution=ignore-duplicates" in prefer:
+                upsert = "ignore"
+            elif "resolution=merge-duplicates" in prefer:
+                upsert = "merge"
+            created = [r for r in (self._insert_row(table, dict(row), upsert) for row in rows) if r is not None]
+            return self._write_response(created, prefer, 201)
+        if request.method == "PATCH":
+            updates = json.loads(request.content or b"{}")
+            updated = []
+            for row in self._filtered(table, params):
+                row.update({k: _now() if v == "now()" else v for k, v in updates.items()})
+                updated.append(row)
+            return self._write_response(updated, prefer, 200)
+        if request.method == "DELETE":
+            removed = self._filtered(table, params)
+            for row in removed:
+                self.tables[table].pop(self._key(table, row), None)
+            return self._write_response(removed, prefer, 200)
+        return httpx.Response(405)
+
+    def _write_response(self, rows: List[Dict[str, Any]], prefer: str, status: int) -> httpx.Response:
+        if "return=representation" in prefer:
+            return httpx.Response(status, json=rows)
+        return httpx.Response(status if status != 200 else 204)
+
+    def _key(self, table: str, row: Dict[str, Any]) -> Any:
+        columns = PRIMARY_KEYS.get(table, ("id",))
+        return tuple(row.get(c) for c in columns) if len(columns) > 1 else row.get(columns[0])
+
+    def _insert_row(self, table: str, row: Dict[str, Any], upsert: Optional[str]) -> Optional[Dict[str, Any]]:
+        if table not in PRIMARY_KEYS:
+            row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        if table in TIMESTAMPED:
+            row.setdefault("updated_at", row["created_at"])
+        for column, value in DEFAULTS.get(table, {}).items():
+            row.setdefault(column, value)
+        key = self._key(table, row)
+        existing = self.tables[table].get(key)
+        if existing is not None:
+            if upsert == "ignore":
+                return None
+            if upsert == "merge":
+                existing.update(row)
+                return existing
+            raise ValueError(f'duplicate key value violates unique constraint "{table}_pkey"')
+        self.tables[table][key] = row
+        return row
+
+    def _filtered(self, table: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        rows = list(self.tables[table].values())
+        for key, value in params:
+            if key in RESERVED_PARAMS or "." in key:
+                if key in ("or", "and"):
+                    rows = [r for r in rows if _match_logic(r, key, value)]
+                continue
+            rows = [r for r in rows if _match(r, key, value)]
+        return rows
+
+    def _select(self, request: httpx.Request, table: str, params: List[Tuple[str, str]], prefer: str) -> httpx.Response:
+        query = dict(params)
+        rows = _sort(self._filtered(table, params), query.get("order"))
+        total = len(rows)
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else None
+        rows = rows[offset:offset + limit if limit is not None else None]
+
+        items = _parse_select(query.get("select", "*"))
+        data = [self._project(table, row, items, query) for row in rows]
+
+        headers = {}
+        if "count=" in prefer:
+            headers["content-range"] = f"{offset}-{offset + len(data) - 1}/{total}" if data else f"*/{total}"
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(data) != 1:
+                return httpx.Response(406, json={
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "code": "PGRST116", "hint": None, "details": f"The result contains {len(data)} rows",
+                })
+            return httpx.Response(200, json=data[0], headers=headers)
+        return httpx.Response(200 if "count=" not in prefer else 206 if len(data) < total else 200, json=data, headers=headers)
+
+    def _project(self, table: str, row: Dict[str, Any], items: List[tuple], query: Dict[str, str], prefix: str = "") -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for item in items:
+            if item[0] == "col":
+                if item[1] == "*":
+                    out.update(row)
+                elif item[1] != "count":
+                    out[item[1]] = row.get(item[1])
+                continue
+            _, alias, embedded, sub_items = item
+            kind, fk = RELATIONS[(table, embedded)]
+            if kind == "one":
+                target = self.tables[embedded].get(row.get(fk))
+                out[alias] = self._project(embedded, target, sub_items, query, f"{alias}.") if target else None
+                continue
+            children = [r for r in self.tables[embedded].values() if r.get(fk) == row.get("id")]
+            if sub_items == [("col", "count")]:
+                out[alias] = [{"count": len(children)}]
+                continue
+            children = _sort(children, query.get(f"{prefix}{alias}.order"))
+            offset = int(query.get(f"{prefix}{alias}.offset", 0))
+            limit = query.get(f"{prefix}{alias}.limit")
+            children = children[offset:offset + int(limit) if limit is not None else None]
+            out[alias] = [self._project(embedded, child, sub_items, query, f"{prefix}{alias}.") for child in children]
+        return out
+
+    # --- Storage ---
+
+    def _storage(self, request: httpx.Request, rest: str) -> httpx.Response:
+        if rest.startswith("sign/"):
+            bucket, _, path = rest[len("sign/"):].partition("/")
+            if (bucket, path) not in self.objects:
+                return httpx.Response(400, json={"statusCode": "404", "error": "not_found", "message": "Object not found"})
+            return httpx.Response(200, json={"signedURL": f"/object/sign/{bucket}/{path}?token=fake"})
+        bucket, _, path = rest.partition("/")
+        if request.method == "DELETE":
+            removed = [p for p in json.loads(request.content)["prefixes"] if self.objects.pop((bucket, p), None) is not None]
+            return httpx.Response(200, json=[{"name": p} for p in removed])
+        if request.method in ("POST", "PUT"):
+            if (bucket, path) in self.objects and request.method == "POST" and request.headers.get("x-upsert") != "true":
+                return httpx.Response(400, json={"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"})
+            self.objects[(bucket, path)] = _multipart_file(request)
+            return httpx.Response(200, json={"Id": str(uuid.uuid4()), "Key": f"{bucket}/{path}"})
+        if (bucket, path) not in self.objects:
+            return httpx.Response(400, json={"statusCode": "404", "error": "not_found", "message": "Object not found"})
+        return httpx.Response(200, content=self.objects[(bucket, path)], headers={"content-type": "application/pdf"})
+
+    # --- RPCs (Python versions of the functions in schema.sql; versions are always stored in full) ---
+
+    def _rpc(self, name: str, args: Dict[str, Any]) -> httpx.Response:
+        if name not in self.rpcs:
+            return httpx.Response(404, json={"message": f"Could not find the function {name}", "code": "PGRST202", "hint": None, "details": None})
+        return httpx.Response(200, json=self.rpcs[name](args))
+
+    def _versions(self, proposal_id: str) -> List[Dict[str, Any]]:
+        return sorted((v for v in self.tables["proposal_versions"].values() if v["proposal_id"] == proposal_id),
+                      key=lambda v: v["version_number"])
+
+    def _append(self, proposal_id: str, content: Any, created_by: Optional[str]) -> Dict[str, Any]:
+        proposal = self.tables["proposals"].get(proposal_id)
+        if proposal is None:
+            raise ValueError(f"Proposal {proposal_id} not found")
+        proposal["updated_at"] = _now()
+        versions = self._versions(proposal_id)
+        return self._insert_row("proposal_versions", {
+            "proposal_id": proposal_id, "org_id": proposal.get("org_id"),
+            "version_number": versions[-1]["version_number"] + 1 if versions else 1,
+            "content_json": content, "content_hash": _content_hash(content), "created_by": created_by,
+        }, upsert=None)
+
+    def _rpc_append_proposal_version(self, args):
+        return [self._append(args["proposal_id_input"], args["content_input"], args.get("created_by_input"))]
+
+    def _rpc_save_proposal_draft(self, args):
+        proposal_id, content = args["proposal_id_input"], args["content_input"]
+        user_id = args.get("created_by_input")
+        if proposal_id not in self.tables["proposals"]:
+            raise ValueError(f"Proposal {proposal_id} not found")
+        new_hash = _content_hash(content)
+        versions = self._versions(proposal_id)
+        latest = versions[-1] if versions else None
+        drafts = self.tables["proposal_working_drafts"]
+        draft = drafts.get((proposal_id, user_id)) if user_id else None
+        latest_hash = latest.get("content_hash") if latest else None
+
+        if args.get("coalesce_seconds_input", 0) > 0 and not args.get("publish_input") and user_id:
+            if (draft and draft["content_hash"] == new_hash) or (not draft and latest_hash == new_hash):
+                status = "unchanged"
+            elif draft and latest_hash == new_hash:
+                drafts.pop((proposal_id, user_id))
+                draft, status = None, "unchanged"
+            else:
+                if draft:
+                    draft.update(content_json=content, content_hash=new_hash, updated_at=_now())
+                else:
+                    draft = self._insert_row("proposal_working_drafts", {
+                        "proposal_id": proposal_id, "user_id": user_id, "content_json": content,
+                        "content_hash": new_hash, "first_saved_at": _now(),
+                    }, upsert=None)
+                status = "drafted"
+        else:
+            if draft:
+                drafts.pop((proposal_id, user_id))
+                draft = None
+            if latest_hash == new_hash:
+                status = "unchanged"
+            else:
+                latest, status = self._append(proposal_id, content, user_id), "created"
+
+        strip = lambda row, *cols: {k: v for k, v in row.items() if k not in cols} if row else None
+        return {
+            "status": status,
+            "version": strip(latest, "content_json", "delta_json"),
+            "working_draft": strip(draft, "content_json"),
+        }
+
+    def _rpc_flush_working_drafts(self, args):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        quiet = datetime.timedelta(seconds=args["quiet_seconds_input"])
+        max_age = datetime.timedelta(seconds=args.get("max_age_seconds_input", 300))
+        created = []
+        for key, draft in list(self.tables["proposal_working_drafts"].items())[:args.get("batch_size_input", 100)]:
+            updated = datetime.datetime.fromisoformat(draft["updated_at"])
+            first = datetime.datetime.fromisoformat(draft["first_saved_at"])
+            if now - updated < quiet and now - first < max_age:
+                continue
+            versions = self._versions(draft["proposal_id"])
+            if not versions or versions[-1].get("content_hash") != draft["content_hash"]:
+                created.append(self._append(draft["proposal_id"], draft["content_json"], draft["user_id"]))
+            self.tables["proposal_working_drafts"].pop(key)
+        return created
+
+    def _rpc_get_proposal_version_content(self, args):
+        for version in self._versions(args["proposal_id_input"]):
+            if version["version_number"] == args["version_number_input"]:
+                return version["content_json"]
+        return None
+
+    def _rpc_create_proposals_from_template(self, args):
+        org_id = args["org_id_input"]
+        template = self.tables["proposal_templates"].get(args["template_id_input"])
+        if template is None or template["org_id"] != org_id:
+            raise ValueError(f"Template {args['template_id_input']} not found")
+        results = []
+        for project_id in dict.fromkeys(args["project_ids_input"]):
+            project = self.tables["projects"].get(project_id)
+            if project is None or project["org_id"] != org_id:
+                results.append({"project_id": project_id, "proposal_id": None, "version_id": None,
+                                "client_email": None, "error": "Project not found"})
+                continue
+            client = self.tables["clients"].get(project.get("client_id")) or {}
+            proposal = self._insert_row("proposals", {
+                "org_id": org_id, "project_id": project_id, "client_id": project.get("client_id"),
+                "name": args["title_input"].replace("{project}", project["name"]),
+            }, upsert=None)
+            version = self._insert_row("proposal_versions", {
+                "proposal_id": proposal["id"], "org_id": org_id, "version_number": 1,
+                "content_json": template["content_json"], "content_hash": _content_hash(template["content_json"]),
+                "created_by": args["created_by_input"], "pinned": args.get("pin_input", False),
+            }, upsert=None)
+            results.append({"project_id": project_id, "proposal_id": proposal["id"], "version_id": version["id"],
+                            "client_email": client.get("email"), "error": None})
+        return results
+
+    def _rpc_pin_proposal_version(self, args):
+        version = self.tables["proposal_versions"].get(args["version_id_input"])
+        if version is None:
+            return None
+        version["pinned"] = True
+        proposal = self.tables["proposals"].get(version["proposal_id"], {})
+        return {"proposal_id": version["proposal_id"], "org_id": proposal.get("org_id"),
+                "version_number": version.get("version_number")}
+
+    def _rpc_pin_proposal_versions(self, args):
+        pinned = []
+        for version_id in args["version_ids_input"]:
+            uuid.UUID(version_id)  # the uuid[] cast rejects the whole call
+            row = self._rpc_pin_proposal_version({"version_id_input": version_id})
+            if row:
+                pinned.append({"version_id": version_id, **row})
+        return pinned
+
+    def _rpc_renew_signing_sessions(self, args):
+        if args.get("tokens_input") is None and args.get("expiring_within_input") is None:
+            raise ValueError("Pass tokens or an expiry window")
+        now = datetime.datetime.now(datetime.timezone.utc)
+        extend_to = (now + _interval(args.get("expires_in_input") or "7 days")).isoformat()
+        window_end = (now + _interval(args["expiring_within_input"])).isoformat() if args.get("expiring_within_input") else None
+        renewed = []
+        for session in self.tables["signing_sessions"].values():
+            version = self.tables["proposal_versions"].get(session["proposal_version_id"], {})
+            proposal = self.tables["proposals"].get(version.get("proposal_id"), {})
+            if proposal.get("org_id") != args["org_id_input"] or session["status"] not in ("pending", "viewed", "expired"):
+                continue
+            if args.get("tokens_input") is not None and session["token"] not in args["tokens_input"]:
+                continue
+            if window_end and session["expires_at"] >= window_end:
+                continue
+            session["expires_at"] = max(session["expires_at"], extend_to)
+            if session["status"] == "expired":
+                session["status"] = "viewed" if session.get("opened_at") else "pending"
+            renewed.append({
+                "session_id": session["id"], "token": session["token"], "signer_email": session.get("signer_email"),
+                "proposal_version_id": session["proposal_version_id"], "proposal_id": version["proposal_id"],
+                "expires_at": session["expires_at"], "status": session["status"],
+            })
+        for proposal_id in {r["proposal_id"] for r in renewed}:
+            proposal = self.tables["proposals"][proposal_id]
+            if proposal.get("status") == "expired":
+                opened = any(r["status"] == "viewed" for r in renewed if r["proposal_id"] == proposal_id)
+                proposal["status"] = "viewed" if opened else "sent"
+        return renewed
+
+    def _rpc_expire_signing_sessions(self, args):
+        now = _now()
+        lapsed = sorted((s for s in self.tables["signing_sessions"].values()
+                         if s["status"] in ("pending", "viewed") and s["expires_at"] <= now), key=lambda s: s["expires_at"])
+        batch = lapsed[:args.get("batch_size_input", 1000)]
+        for session in batch:
+            session["status"] = "expired"
+        proposal_ids = {self.tables["proposal_versions"][s["proposal_version_id"]]["proposal_id"] for s in batch}
+        expired_proposals = 0
+        for proposal_id in proposal_ids:
+            proposal = self.tables["proposals"][proposal_id]
+            version_ids = {v["id"] for v in self._versions(proposal_id)}
+            still_open = any(s["status"] in ("signed", "declined") or (s["status"] in ("pending", "viewed") and s["expires_at"] > now)
+                             for s in self.tables["signing_sessions"].values() if s["proposal_version_id"] in version_ids)
+            if proposal.get("status") in ("draft", "sent", "viewed") and not still_open:
+                proposal["status"] = "expired"
+                expired_proposals += 1
+        return [{"sessions_expired": len(batch), "proposals_expired": expired_proposals}]
+
+    def _rpc_archive_signing_sessions(self, args):
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) - _interval(args.get("older_than_input") or "30 days")).isoformat()
+        signed = {g["signing_session_id"] for g in self.tables["signatures"].values()}
+        old = sorted((s for s in self.tables["signing_sessions"].values()
+                      if s["status"] == "expired" and s["expires_at"] < cutoff and s["id"] not in signed), key=lambda s: s["expires_at"])
+        batch = old[:args.get("batch_size_input", 1000)]
+        for session in batch:
+            self.tables["signing_sessions"].pop(session["id"])
+            self.tables["signing_sessions_archive"][session["id"]] = {
+                "id": session["id"], "proposal_version_id": session["proposal_version_id"], "token": session["token"],
+                "status": session["status"], "expires_at": session["expires_at"], "archived_at": _now(), "session": session,
+            }
+        return len(batch)
+
+    def _session(self, token: str, statuses: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        now = _now()
+        for session in self.tables["signing_sessions"].values():
+            if session["token"] == token and session["expires_at"] > now and session["status"] in statuses:
+                return session
+        return None
+
+    def _rpc_get_proposal_for_signing(self, args):
+        session = self._session(args["token_input"], ("pending", "viewed", "signed", "declined"))
+        if session is None:
+            return []
+        if session["status"] == "pending":
+            session.update(status="viewed", opened_at=_now())
+        version = self.tables["proposal_versions"][session["proposal_version_id"]]
+        proposal = self.tables["proposals"][version["proposal_id"]]
+        return [{
+            "proposal_title": proposal.get("title") or proposal.get("name"),
+            "content_json": version["content_json"],
+            "status": session["status"],
+            "signer_email": session.get("signer_email"),
+            "proposal_id": version["proposal_id"],
+            "org_id": proposal.get("org_id"),
+        }]
+
+    def _rpc_sign_proposal_with_token(self, args):
+        session = self._session(args["token_input"], ("pending", "viewed"))
+        if session is None:
+            return False
+        self._insert_row("signatures", {
+            "signing_session_id": session["id"], "signer_name": args["signature_name_input"],
+            "signature_type": args["signature_type_input"], "signature_data": args["signature_data_input"],
+            "consent_agreed": args["consent_input"], "ip_address": "public_ip",
+        }, upsert=None)
+        session.update(status="signed", signed_at=_now(), viewer_user_agent=args.get("user_agent_input"),
+                       finalization_status="pending")
+        version = self.tables["proposal_versions"][session["proposal_version_id"]]
+        self.tables["proposals"][version["proposal_id"]]["status"] = "signed"
+        return True
@@ -1,5 +1,7 @@
 from fastapi.testclient import TestClient
 from orchestration.api_server import app
+import execution.pdf_cache as pdf_cache
+import execution.render_service as render_service
 import uuid
 
 client = TestClient(app)
@@ -44,8 +46,18 @@ def test_create_signing_link_mock():
     else:
         print(f"SIGNING LINK: FAILED (Status {response.status_code})")
 
+def test_pdf_job_ids_must_be_cache_keys():
+    # Job ids name files in the PDF cache, so anything but a sha256 hex key is unknown
+    for job_id in ("..x", "job.pending", "F" * 64, "f" * 63):
+        assert client.get(f"/workflow/proposals/p/pdf/jobs/{job_id}").status_code == 404
+        assert client.get(f"/workflow/proposals/p/pdf/jobs/{job_id}/result").status_code == 404
+    assert pdf_cache.get("../../etc/passwd") is None
+    assert render_service.job_status("../x")["status"] == "unknown"
+    assert client.get(f"/workflow/proposals/p/pdf/jobs/{'0' * 64}").status_code == 404
+
 if __name__ == "__main__":
     print("--- STARTING API TEST ---")
     test_root()
     test_create_signing_link_mock()
+    test_pdf_job_ids_must_be_cache_keys()
     print("--- END API TEST ---")
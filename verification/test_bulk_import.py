@@ -0,0 +1,93 @@
+"""
+Tests for bulk client/project creation (execution/bulk_import.py and the
+/workflow/*/bulk routes): per-row validation errors, chunked inserts that
+isolate rows the database refuses, import_key idempotency and NDJSON uploads.
+No database needed: the insert is replaced by an in-memory table that
+enforces primary keys and the projects -> clients foreign key.
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+import execution.bulk_import as bulk_import
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    tables = {"clients": {}, "projects": {}}
+    statements = []
+
+    async def insert(table, records):
+        statements.append((table, len(records)))
+        for record in records:
+            if table == "projects" and record.get("client_id") and record["client_id"] not in tables["clients"]:
+                raise APIError({"message": "violates foreign key constraint", "code": "23503"})
+        created = [r for r in records if r["id"] not in tables[table]]
+        tables[table].update((r["id"], r) for r in created)
+        return [r["id"] for r in created]
+
+    monkeypatch.setattr(bulk_import, "_insert", insert)
+    monkeypatch.setattr(bulk_import, "IMPORT_BATCH_SIZE", 3)
+    tables["statements"] = statements
+    return tables
+
+
+def test_rows_are_validated_and_written_in_chunks(tables):
+    rows = [{"name": f"Client {i}", "email": f"c{i}@example.com", "import_key": f"crm-{i}"} for i in range(7)]
+    rows[2] = {"email": "no-name@example.com"}
+    rows[4] = {"name": "Typo", "emial": "x@example.com"}
+    rows.append({"name": "Again", "import_key": "crm-0"})
+
+    report = bulk_import.bulk_create("clients", ORG, rows)
+
+    assert (report["created"], report["existing"], report["failed"]) == (5, 0, 3)
+    assert [r["index"] for r in report["results"]] == list(range(8))
+    errors = {r["index"]: r["error"] for r in report["results"] if r["status"] == "error"}
+    assert errors == {2: "name is required", 4: "unknown fields: emial", 7: "duplicate import_key in this request"}
+    assert tables["statements"] == [("clients", 3), ("clients", 2)]
+    assert report["results"][0]["id"] == bulk_import.import_id(ORG, "clients", "crm-0")
+
+
+def test_retried_import_does_not_duplicate(tables):
+    rows = [{"name": f"Client {i}", "import_key": f"crm-{i}"} for i in range(4)]
+    bulk_import.bulk_create("clients", ORG, rows[:2])
+
+    report = bulk_import.bulk_create("clients", ORG, rows)
+    assert [r["status"] for r in report["results"]] == ["existing", "existing", "created", "created"]
+    assert len(tables["clients"]) == 4
+
+
+def test_refused_row_fails_alone(tables):
+    bulk_import.bulk_create("clients", ORG, [{"name": "Acme", "import_key": "crm-1"}])
+    rows = [
+        {"name": "Deck", "client_import_key": "crm-1"},
+        {"name": "Roof", "client_id": "00000000-0000-0000-0000-000000000001"},
+        {"name": "Kitchen", "status": "active"},
+        {"name": "Bath", "status": "paused"},
+    ]
+
+    report = bulk_import.bulk_create("projects", ORG, rows)
+    assert [r["status"] for r in report["results"]] == ["created", "error", "created", "error"]
+    assert "foreign key" in report["results"][1]["error"]
+    linked = tables["projects"][report["results"][0]["id"]]
+    assert linked["client_id"] == bulk_import.import_id(ORG, "clients", "crm-1")
+
+
+def test_ndjson_upload(tables):
+    lines = [json.dumps({"name": "Acme", "import_key": "crm-1"}), "", "{not json", json.dumps({"name": "Globex"})]
+    client = TestClient(app)
+
+    response = client.post(f"/workflow/clients/bulk?org_id={ORG}", content="\n".join(lines),
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["failed"]) == (2, 1)
+    assert report["results"][1]["error"].startswith("invalid JSON")
+
+    assert client.post("/workflow/clients/bulk", content=lines[0], headers={"content-type": "application/x-ndjson"}).status_code == 400
+    assert client.post("/workflow/clients/bulk", json={"rows": []}).status_code == 422
@@ -0,0 +1,168 @@
+"""
+Tests for the dashboard counters in execution/schema.sql: the statement
+triggers (maintain_dashboard_counters) must keep org_dashboard_counters equal
+to a full recount (rebuild_dashboard_counters) through inserts, multi-row
+batches, status changes, moves between orgs and deletes.
+
+Runs against a plain local Postgres like test_version_append.py: set
+TEST_DATABASE_URL. The functions and triggers are loaded from schema.sql into
+a throwaway schema with minimal tables.
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from verification.conftest import connect, schema_sql
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+MINIMAL_TABLES = """
+create table organizations (id uuid primary key);
+create table clients (id uuid primary key default gen_random_uuid(), org_id uuid references organizations(id) not null);
+create table projects (
+  id uuid primary key default gen_random_uuid(),
+  org_id uuid references organizations(id) not null,
+  status text default 'lead'
+);
+create table proposals (
+  id uuid primary key default gen_random_uuid(),
+  org_id uuid references organizations(id) not null,
+  status text default 'draft',
+  total numeric
+);
+create table proposal_versions (
+  id uuid primary key default gen_random_uuid(),
+  proposal_id uuid references proposals(id) not null,
+  org_id uuid
+);
+create table signing_sessions (
+  id uuid primary key default gen_random_uuid(),
+  proposal_version_id uuid references proposal_versions(id) not null,
+  status text not null default 'pending'
+);
+create table signing_sessions_archive (
+  id uuid primary key,
+  proposal_version_id uuid not null,
+  token text not null default '',
+  status text not null,
+  expires_at timestamptz,
+  archived_at timestamptz not null default now(),
+  session jsonb not null default '{}'
+);
+create table org_dashboard_counters (
+  org_id uuid references organizations(id) on delete cascade not null,
+  kind text not null,
+  status text not null,
+  row_count bigint not null default 0,
+  value_total numeric not null default 0,
+  updated_at timestamptz default now(),
+  primary key (org_id, kind, status)
+);
+"""
+
+
+@pytest.fixture
+def db_schema(pg_schema):
+    triggers = schema_sql(r"do \$\$\ndeclare\n  source record;.*?\nend\$\$;")
+    return pg_schema("dashboard_test", MINIMAL_TABLES, ("maintain_dashboard_counters", "rebuild_dashboard_counters"), (triggers,))
+
+
+def _counters(cur):
+    cur.execute("select org_id, kind, status, row_count, value_total from org_dashboard_counters where row_count <> 0 or value_total <> 0")
+    return {(str(org), kind, status): (count, float(total)) for org, kind, status, count, total in cur.fetchall()}
+
+
+def _assert_matches_recount(cur):
+    maintained = _counters(cur)
+    cur.execute("select rebuild_dashboard_counters()")
+    assert maintained == _counters(cur)
+
+
+def _new_org(cur) -> str:
+    org_id = str(uuid.uuid4())
+    cur.execute("insert into organizations (id) values (%s)", (org_id,))
+    return org_id
+
+
+def test_counters_follow_writes(db_schema):
+    conn = connect(db_schema)
+    with conn.cursor() as cur:
+        org, other = _new_org(cur), _new_org(cur)
+
+        # A seed-style batch: one statement, many rows
+        cur.execute("insert into clients (org_id) select %s from generate_series(1, 5)", (org,))
+        cur.execute("insert into projects (org_id, status) select %s, s from unnest(array['lead', 'lead', 'active']) s", (org,))
+        cur.execute("""
+            insert into proposals (org_id, status, total)
+            select %s, s, t from unnest(array['draft', 'sent', 'sent', 'signed'], array[100, 250, 50, 1000]) as x(s, t)
+            returning id
+        """, (org,))
+        proposal_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("insert into proposal_versions (proposal_id, org_id) select unnest(%s::uuid[]), %s returning id", (proposal_ids, org))
+        version_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("insert into signing_sessions (proposal_version_id) select unnest(%s::uuid[])", (version_ids[1:],))
+
+        counters = _counters(cur)
+        assert counters[(org, "client", "all")] == (5, 0)
+        assert counters[(org, "project", "lead")] == (2, 0)
+        assert counters[(org, "proposal", "sent")] == (2, 300)
+        assert counters[(org, "proposal", "signed")] == (1, 1000)
+        assert counters[(org, "signing_link", "pending")] == (3, 0)
+
+        # Status changes, value edits, no-op updates and a move between orgs
+        cur.execute("update signing_sessions set status = 'viewed' where proposal_version_id = %s", (version_ids[1],))
+        cur.execute("update signing_sessions set status = 'signed' where proposal_version_id = %s", (version_ids[2],))
+        cur.execute("update proposals set status = 'signed', total = 75 where id = %s", (proposal_ids[2],))
+        cur.execute("update proposals set status = status where org_id = %s", (org,))
+        cur.execute("update projects set org_id = %s where status = 'active'", (other,))
+        _assert_matches_recount(cur)
+
+        counters = _counters(cur)
+        assert counters[(org, "proposal", "signed")] == (2, 1075)
+        assert counters[(org, "signing_link", "signed")] == (1, 0)
+        assert counters[(other, "project", "active")] == (1, 0)
+        assert (org, "project", "active") not in counters
+
+        # Archiving moves links to another table; they still count
+        cur.execute("""
+            with moved as (delete from signing_sessions where status = 'signed' returning *)
+            insert into signing_sessions_archive (id, proposal_version_id, status) select id, proposal_version_id, status from moved
+        """)
+        assert _counters(cur)[(org, "signing_link", "signed")] == (1, 0)
+        _assert_matches_recount(cur)
+
+        # Deletes take rows back out
+        cur.execute("delete from signing_sessions")
+        cur.execute("delete from clients where id in (select id from clients limit 2)")
+        _assert_matches_recount(cur)
+        assert _counters(cur)[(org, "client", "all")] == (3, 0)
+    conn.close()
+
+
+def test_concurrent_writers_keep_counters_exact(db_schema):
+    setup = connect(db_schema)
+    with setup.cursor() as cur:
+        orgs = [_new_org(cur) for _ in range(3)]
+
+    def writer(worker: int):
+        conn = connect(db_schema)
+        with conn.cursor() as cur:
+            for i in range(20):
+                org = orgs[(worker + i) % len(orgs)]
+                cur.execute("insert into proposals (org_id, status, total) values (%s, 'draft', 10) returning id", (org,))
+                proposal_id = cur.fetchone()[0]
+                if i % 3 == 0:
+                    cur.execute("update proposals set status = 'sent' where id = %s", (proposal_id,))
+                # Multi-org statements take counter locks in key order (no deadlocks)
+                cur.execute("insert into projects (org_id) select unnest(%s::uuid[])", (orgs,))
+        conn.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(writer, range(8)))
+
+    with setup.cursor() as cur:
+        cur.execute("select sum(row_count), sum(value_total) from org_dashboard_counters where kind = 'proposal'")
+        assert cur.fetchone() == (160, 1600)
+        _assert_matches_recount(cur)
+    setup.close()
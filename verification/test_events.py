@@ -0,0 +1,120 @@
+"""
+Tests for the event log writer (execution/events.py): batching, the queue
+bound, rows the database refuses, and replay of spool segments left by a
+dead worker. No database needed: the insert is replaced, and the flusher
+thread is not started so each test drives the flushes itself.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+from postgrest.exceptions import APIError
+
+import execution.events as events
+
+
+@pytest.fixture
+def writer(monkeypatch, tmp_path):
+    inserted = []
+
+    def insert(rows):
+        if any(row["event_type"] == "bad" for row in rows):
+            raise APIError({"message": "invalid input", "code": "22P02"})
+        inserted.append([row["id"] for row in rows])
+
+    monkeypatch.setattr(events, "_insert", insert)
+    monkeypatch.setattr(events, "SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(events, "_flusher", object()) # counts as started
+    monkeypatch.setattr(events, "_pid", os.getpid())
+    monkeypatch.setattr(events, "_segment", None)
+    monkeypatch.setattr(events, "_segment_path", None)
+    monkeypatch.setattr(events, "_in_flight", 0)
+    monkeypatch.setattr(events, "_stats", dict.fromkeys(events._stats, 0))
+    events._queue.clear()
+    yield inserted
+    events._rotate()
+    events._queue.clear()
+
+
+def _spooled(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith(".ndjson"))
+
+
+def test_events_are_written_in_batches(writer, monkeypatch, tmp_path):
+    monkeypatch.setattr(events, "EVENTS_BATCH_SIZE", 3)
+    for i in range(7):
+        assert events.emit("proposal_sent", "org-1", "proposal", f"p-{i}")
+    assert len(_spooled(tmp_path)) == 1
+
+    assert events.flush()
+    assert [len(batch) for batch in writer] == [3, 3, 1]
+    assert _spooled(tmp_path) == []
+    assert events.stats()["flushed"] == 7 and events.stats()["batches"] == 3
+
+
+def test_full_queue_drops_and_events_need_an_org(writer, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 2)
+    assert events.emit("proposal_sent", "org-1")
+    assert events.emit("proposal_sent", "org-1")
+    assert not events.emit("proposal_sent", "org-1")
+    assert not events.emit("proposal_sent", None)
+    assert events.stats()["dropped"] == 1
+
+    events.flush()
+    assert events.emit("proposal_sent", "org-1")
+
+
+def test_block_policy_never_waits_on_the_event_loop(writer, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 1)
+    monkeypatch.setattr(events, "EVENTS_FULL_POLICY", "block")
+    monkeypatch.setattr(events, "EVENTS_BLOCK_SECONDS", 1.0)
+    assert events.emit("proposal_sent", "org-1")
+
+    # A worker thread waits for room (none comes here, so it times out)...
+    started = time.monotonic()
+    assert not events.emit("proposal_sent", "org-1")
+    assert time.monotonic() - started >= 1.0 and events.stats()["blocked"] == 1
+
+    # ...an async handler drops straight away instead of stalling the loop
+    async def handler():
+        started = time.monotonic()
+        return events.emit("proposal_sent", "org-1"), time.monotonic() - started
+
+    queued, waited = asyncio.run(handler())
+    assert not queued and waited < 0.1
+    assert events.stats()["blocked"] == 1 and events.stats()["dropped"] == 2
+
+
+def test_refused_row_does_not_hold_back_the_batch(writer):
+    for event_type in ("proposal_created", "bad", "proposal_sent"):
+        events.emit(event_type, "org-1")
+    assert events.flush()
+    assert sum(len(batch) for batch in writer) == 2
+    assert events.stats()["rejected"] == 1
+
+
+def test_unreachable_database_keeps_the_spool(writer, monkeypatch, tmp_path):
+    def down(rows):
+        raise ConnectionError("connection refused")
+
+    monkeypatch.setattr(events, "_insert", down)
+    events.emit("proposal_sent", "org-1")
+    events.flush()
+    assert len(_spooled(tmp_path)) == 1
+    assert events.stats()["flush_failures"] == 1
+
+
+def test_orphaned_spool_is_replayed(writer, tmp_path):
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    dead_pid = int(dead.stdout)
+    lines = [json.dumps({"id": f"e-{i}", "org_id": "org-1", "event_type": "proposal_sent"}) for i in range(2)]
+    (tmp_path / f"events-{dead_pid}-1.ndjson").write_text("\n".join(lines) + '\n{"id": "e-2", "org')
+
+    events._recover_orphans()
+    assert writer == [["e-0", "e-1"]]
+    assert _spooled(tmp_path) == []
+    assert events.stats()["recovered"] == 2
@@ -0,0 +1,78 @@
+"""
+Startup budget for the API: importing orchestration.api_server (what every
+gunicorn worker does on boot) must stay cheap and must not need credentials.
+
+Measured in a fresh interpreter with `python -X importtime`. The budget is
+IMPORT_BUDGET_MS (default 1500; CPython + FastAPI + supabase-py account for
+most of it). Run this file directly for the slowest imports:
+
+    python -m verification.test_import_time
+"""
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# Loaded on demand only: the PDF stack lives in the render processes, seeding
+# is an occasional admin call
+LAZY_MODULES = ("weasyprint", "execution.seed_data")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_PROBE = """
+import sys
+import {module}
+import execution.supabase_client as sc
+print("client_built=" + str(sc._client is not None))
+print("loaded=" + ",".join(m for m in {lazy!r} if m in sys.modules))
+"""
+
+
+def measure_imports(module: str = "orchestration.api_server") -> Tuple[List[Tuple[str, int, int]], Dict[str, str]]:
+    """
+    Imports `module` in a fresh interpreter without Supabase credentials.
+    Returns [(module, self_us, cumulative_us)] in import order, plus the
+    probe's key=value output.
+    """
+    env = {k: v for k, v in os.environ.items() if k not in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY")}
+    probe = _PROBE.format(module=module, lazy=LAZY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    timings = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            timings.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    probe_output = dict(line.split("=", 1) for line in result.stdout.splitlines() if "=" in line)
+    return timings, probe_output
+
+
+def test_api_import_is_lazy_and_within_budget():
+    timings, probe = measure_imports()
+
+    # No Supabase client is built (or credentials required) just by importing
+    assert probe["client_built"] == "False"
+    assert probe["loaded"] == "", f"imported eagerly: {probe['loaded']}"
+
+    total_ms = next(cumulative for name, _, cumulative in timings if name == "orchestration.api_server") / 1000
+    slowest = sorted(timings, key=lambda t: t[2], reverse=True)[:10]
+    assert total_ms <= IMPORT_BUDGET_MS, (
+        f"importing the API took {total_ms:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms); slowest: "
+        + ", ".join(f"{name} {cumulative / 1000:.0f}ms" for name, _, cumulative in slowest)
+    )
+
+
+if __name__ == "__main__":
+    timings, probe = measure_imports()
+    print(f"{'module':<48} {'self ms':>8} {'total ms':>9}")
+    for name, self_us, cumulative_us in sorted(timings, key=lambda t: t[2], reverse=True)[:25]:
+        print(f"{name:<48} {self_us / 1000:>8.1f} {cumulative_us / 1000:>9.1f}")
+    print(probe)
@@ -0,0 +1,67 @@
+"""
+Tests for keyset pagination on the list routes (execution/pagination.py):
+pages stay plain JSON arrays with the next cursor and count in headers,
+and cursors and filter values are validated before they reach a PostgREST
+filter. Runs against the in-memory PostgREST stand-in.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.pagination as pagination
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture
+def fake(fake_supabase):
+    fake_supabase.load("clients", [
+        {"id": f"00000000-0000-0000-0000-{i:012d}", "org_id": ORG, "name": f"Client {i}",
+         "created_at": f"2026-01-0{1 + i // 2}T00:00:00+00:00"}
+        for i in range(5)
+    ])
+    return fake_supabase
+
+
+def test_pages_are_arrays_with_the_cursor_in_headers(fake):
+    client = TestClient(app)
+    seen = []
+    response = client.get(f"/workflow/clients?org_id={ORG}&limit=2&count=exact")
+    assert response.headers["X-Total-Count"] == "5"
+    while True:
+        assert isinstance(response.json(), list)
+        seen += [row["id"] for row in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        assert response.headers["Link"].endswith('>; rel="next"') and f"cursor={cursor}" in response.headers["Link"]
+        response = client.get(f"/workflow/clients?org_id={ORG}&limit=2&cursor={cursor}")
+        # Only the first page is counted
+        assert "X-Total-Count" not in response.headers
+    assert sorted(seen) == sorted(c["id"] for c in fake.rows("clients"))
+    assert len(seen) == len(set(seen))
+
+
+def test_cursors_only_carry_a_timestamp_and_uuid(fake):
+    client = TestClient(app)
+    forged = [
+        ["2026-01-01T00:00:00+00:00", 'x",id.neq."x'],
+        ['2026-01-01",org_id.neq."x', str(uuid.uuid4())],
+        [None, str(uuid.uuid4())],
+    ]
+    for created_at, row_id in forged:
+        cursor = pagination.encode_cursor({"created_at": created_at, "id": row_id})
+        assert client.get(f"/workflow/clients?org_id={ORG}&cursor={cursor}").status_code == 400
+    assert client.get(f"/workflow/clients?org_id={ORG}&cursor=not-base64!").status_code == 400
+
+
+def test_filter_values_are_validated(fake):
+    client = TestClient(app)
+    assert client.get(f"/workflow/clients?org_id={ORG}&created_after=2026-01-02").json()
+    for query in (f"org_id={ORG}&created_after=yesterday", f"org_id={ORG}&created_before=2026-13-01", "org_id=acme"):
+        assert client.get(f"/workflow/clients?{query}").status_code == 400, query
+    assert client.get(f"/workflow/projects?org_id={ORG}&client_id=nope").status_code == 400
+    assert client.get(f"/workflow/proposals?org_id={ORG}&created_before=soon").status_code == 400
+    assert fake.requests["GET:projects"] == fake.requests["GET:proposals"] == 0
@@ -0,0 +1,120 @@
+"""
+Tests for the rendered-PDF cache (execution/pdf_cache.py): memory then disk
+lookups, single renders on a miss, pruning the disk tier oldest first, and
+ETag / If-None-Match revalidation on GET /workflow/proposals/{id}/pdf.
+The endpoint tests run against the in-memory PostgREST stand-in.
+"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.pdf_cache as pdf_cache
+import execution.render_service as render_service
+import execution.template_cache as template_cache
+import execution.workflow_proposals as wp
+from execution.cache import LRUCache
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+def _key(n: int) -> str:
+    return hashlib.sha256(str(n).encode()).hexdigest()
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "_memory", LRUCache(maxsize=8))
+    return tmp_path
+
+
+@pytest.fixture
+def fake(fake_supabase, cache, monkeypatch):
+    monkeypatch.setattr(template_cache, "_cache", LRUCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(template_cache, "_generations", {})
+    monkeypatch.setattr(wp, "schedule_version_pdf", lambda version_id, pdf_bytes=None: None)
+    rendered = []
+
+    async def render_async(html, timeout=None):
+        rendered.append(html)
+        return b"%PDF rendered"
+
+    monkeypatch.setattr(render_service, "render_async", render_async)
+    fake_supabase.rendered = rendered
+    fake_supabase.load("proposals", [{"id": "proposal-1", "org_id": ORG, "project_id": "project-1", "name": "Deck"}])
+    fake_supabase.load("proposal_versions", [{"id": "version-1", "proposal_id": "proposal-1", "org_id": ORG,
+                                              "version_number": 1, "content_json": {"sections": []}}])
+    return fake_supabase
+
+
+def test_memory_then_disk(cache, monkeypatch):
+    key = _key(1)
+    pdf_cache.put(key, b"%PDF one")
+    assert pdf_cache.get(key) == b"%PDF one"
+    assert os.path.exists(os.path.join(cache, key[:2], f"{key}.pdf"))
+
+    # A fresh process (empty memory tier) finds it on disk and promotes it
+    monkeypatch.setattr(pdf_cache, "_memory", LRUCache(maxsize=8))
+    hits = pdf_cache.stats()["disk_hits"]
+    assert pdf_cache.get(key) == b"%PDF one"
+    assert pdf_cache.stats()["disk_hits"] == hits + 1
+    assert pdf_cache._memory.get(key) == b"%PDF one"
+
+    assert pdf_cache.get(_key(2)) is None
+    assert pdf_cache.get("../../etc/passwd") is None
+
+
+def test_miss_renders_once(cache):
+    calls = []
+    render = lambda: calls.append(1) or b"%PDF sync"
+    assert pdf_cache.get_or_render(_key(3), render) == pdf_cache.get_or_render(_key(3), render) == b"%PDF sync"
+
+    async def render_async():
+        calls.append(1)
+        return b"%PDF async"
+
+    async def twice():
+        return [await pdf_cache.get_or_render_async(_key(4), render_async) for _ in range(2)]
+
+    assert asyncio.run(twice()) == [b"%PDF async"] * 2
+    assert len(calls) == 2
+
+
+def test_disk_tier_is_pruned_oldest_first(cache, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "PRUNE_EVERY", 1)
+    monkeypatch.setattr(pdf_cache, "DISK_MAX_BYTES", 250)
+    for n in range(3):
+        pdf_cache.put(_key(n), b"x" * 100)
+        path = pdf_cache._disk_path(_key(n))
+        os.utime(path, (1_000_000 + n, 1_000_000 + n))
+
+    # Third write took the tier to 300 bytes: the oldest file goes
+    on_disk = {n for n in range(3) if os.path.exists(pdf_cache._disk_path(_key(n)))}
+    assert on_disk == {1, 2}
+
+    monkeypatch.setattr(pdf_cache, "_memory", LRUCache(maxsize=8))
+    assert pdf_cache.get(_key(0)) is None and pdf_cache.get(_key(2)) == b"x" * 100
+
+
+def test_pdf_endpoint_revalidates_with_etag(fake):
+    client = TestClient(app)
+    first = client.get("/workflow/proposals/proposal-1/pdf")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and len(fake.rendered) == 1
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/workflow/proposals/proposal-1/pdf", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304 and response.content == b"", if_none_match
+        assert response.headers["ETag"] == etag
+
+    assert client.get("/workflow/proposals/proposal-1/pdf", headers={"If-None-Match": '"other"'}).content == b"%PDF rendered"
+    # Revalidations and the cached response never rendered again
+    assert len(fake.rendered) == 1
+
+    fake.tables["proposal_versions"]["version-1"]["content_json"] = {"sections": [{"title": "New", "content": ""}]}
+    response = client.get("/workflow/proposals/proposal-1/pdf", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
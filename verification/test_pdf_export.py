@@ -0,0 +1,85 @@
+"""
+Tests for the ZIP export of an org's proposal PDFs (execution/pdf_export.py):
+proposals are keyset-paged with only their latest version embedded, and a
+row whose PDF can't even be started is recorded in the manifest instead of
+aborting the archive. Runs against the in-memory PostgREST stand-in.
+"""
+import io
+import json
+import zipfile
+from concurrent.futures import Future
+
+import pytest
+
+import execution.pdf_cache as pdf_cache
+import execution.pdf_export as pdf_export
+import execution.pdf_generator as pdf
+import execution.render_service as render_service
+import execution.workflow_proposals as wp
+from execution.cache import LRUCache
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+PROPOSALS = [f"00000000-0000-0000-0000-{i:012d}" for i in range(5)]
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_export, "PAGE_SIZE", 2)
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "_memory", LRUCache(maxsize=8))
+    monkeypatch.setattr(wp, "schedule_version_pdf", lambda version_id, pdf_bytes: None)
+    rendered = []
+
+    def submit(html, block=False):
+        rendered.append(html)
+        future = Future()
+        future.set_result(f"%PDF {len(rendered)}".encode())
+        return future
+
+    monkeypatch.setattr(render_service, "submit", submit)
+    fake_supabase.rendered = rendered
+
+    # Pairs of proposals share a created_at, so pages split timestamp ties
+    fake_supabase.load("proposals", [
+        {"id": proposal_id, "org_id": ORG, "name": f"Proposal {i}", "status": "sent",
+         "created_at": f"2026-01-0{1 + i // 2}T00:00:00+00:00"}
+        for i, proposal_id in enumerate(PROPOSALS)
+    ])
+    fake_supabase.load("proposal_versions", [
+        {"id": f"{proposal_id}-v{n}", "proposal_id": proposal_id, "org_id": ORG, "version_number": n,
+         "content_json": {"sections": [{"title": f"Version {n}", "content": ""}]}}
+        for proposal_id in PROPOSALS for n in (1, 2)
+    ])
+    return fake_supabase
+
+
+def _manifest(org_id=ORG):
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(pdf_export.stream_proposals_zip(org_id))))
+    return archive, json.loads(archive.read("manifest.json"))
+
+
+def test_export_keyset_pages_latest_versions(fake):
+    archive, manifest = _manifest()
+
+    assert sorted(entry["proposal_id"] for entry in manifest) == PROPOSALS
+    assert all("file" in entry and archive.read(entry["file"]).startswith(b"%PDF") for entry in manifest)
+    assert len(fake.rendered) == 5
+    assert all("Version 2" in html and "Version 1" not in html for html in fake.rendered)
+    # Two full pages and a short one
+    assert fake.requests["GET:proposals"] == 3
+
+
+def test_row_that_fails_to_start_is_recorded(fake, monkeypatch):
+    render = pdf.render_proposal_html
+
+    def render_or_fail(proposal, *args, **kwargs):
+        if proposal["id"] == PROPOSALS[2]:
+            raise ValueError("layout failed for this row")
+        return render(proposal, *args, **kwargs)
+
+    monkeypatch.setattr(pdf, "render_proposal_html", render_or_fail)
+    archive, manifest = _manifest()
+
+    errors = [entry for entry in manifest if "error" in entry]
+    assert errors == [{"proposal_id": PROPOSALS[2], "error": "layout failed for this row"}]
+    assert len([entry for entry in manifest if "file" in entry]) == 4
@@ -0,0 +1,50 @@
+"""
+Tests for org PDF layouts (execution/pdf_generator.py): layout_html from a
+pdf_layout template is compiled in a sandboxed Jinja environment, and the
+template routes reject layouts that don't compile before anything is stored.
+Runs against the in-memory PostgREST stand-in.
+"""
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from jinja2.sandbox import SecurityError
+
+import execution.pdf_generator as pdf
+import execution.template_cache as template_cache
+from execution.cache import LRUCache
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    monkeypatch.setattr(template_cache, "_cache", LRUCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(template_cache, "_generations", {})
+    monkeypatch.setattr(pdf, "_override_templates", LRUCache(maxsize=64))
+    fake_supabase.load("proposal_templates", [
+        {"id": str(uuid.uuid4()), "org_id": ORG, "name": "Layout", "template_type": "pdf_layout",
+         "content_json": {"layout_html": "<p>{{ title }}</p>"}}
+    ])
+    return fake_supabase
+
+
+def test_layouts_are_sandboxed():
+    escape = "{{ cycler.__init__.__globals__.os.popen('id').read() }}"
+    with pytest.raises(SecurityError):
+        pdf.get_template({"id": "t", "updated_at": "1", "content_json": {"layout_html": escape}}).render()
+    layout = {"id": "t", "updated_at": "2", "content_json": {"layout_html": "{{ total | money }} <b>{{ name }}</b>"}}
+    assert pdf.get_template(layout).render(total=1234.5, name="<i>") == "$1,234.50 <b>&lt;i&gt;</b>"
+
+
+def test_layouts_are_checked_on_save(fake):
+    client = TestClient(app)
+    broken = {"layout_html": "{% for x in %}"}
+    response = client.post("/workflow/templates", json={"org_id": ORG, "name": "Broken", "content": broken, "template_type": "pdf_layout"})
+    assert response.status_code == 400 and "layout_html" in response.json()["detail"]
+    template_id = fake.rows("proposal_templates")[0]["id"]
+    assert client.patch(f"/workflow/templates/{template_id}", json={"content": broken}).status_code == 400
+    assert client.patch(f"/workflow/templates/{template_id}", json={"content": {"layout_html": "<p>ok</p>"}}).status_code == 200
+    assert fake.requests["POST:proposal_templates"] == 0
+    assert fake.rows("proposal_templates")[0]["content_json"] == {"layout_html": "<p>ok</p>"}
@@ -0,0 +1,80 @@
+"""
+Tests for batch proposal creation (POST /workflow/proposals/batch): one
+create_proposals_from_template call per chunk, per-project errors, signing
+links addressed to each project's client and the streamed NDJSON results.
+Runs against the in-memory PostgREST stand-in; the SQL function itself is
+covered by applying schema.sql to a real database.
+"""
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.events as events
+import execution.workflow_proposals as wp
+from execution.cache import LRUCache
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+OTHER_ORG = "0b9c8d7e-6f5a-4b3c-9d2e-1f0a9b8c7d6e"
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    fake = fake_supabase
+    monkeypatch.setattr("execution.template_cache._cache", LRUCache(maxsize=100))
+    monkeypatch.setattr(wp, "schedule_version_pdf", lambda version_id: None)
+    monkeypatch.setattr(wp, "PROPOSAL_BATCH_SIZE", 2)
+    emitted = []
+    monkeypatch.setattr(events, "emit", lambda event_type, *args, **kwargs: emitted.append(event_type) or True)
+    fake.emitted = emitted
+
+    fake.load("proposal_templates", [{"id": "tmpl-1", "org_id": ORG, "name": "Spring", "content_json": {"sections": []}}])
+    fake.load("clients", [{"id": "client-1", "org_id": ORG, "name": "Acme", "email": "ops@acme.test"}])
+    fake.load("projects", [
+        {"id": f"project-{i}", "org_id": ORG, "client_id": "client-1" if i % 2 else None, "name": f"Job {i}"}
+        for i in range(5)
+    ])
+    fake.load("projects", [{"id": "project-other", "org_id": OTHER_ORG, "name": "Not ours"}])
+    return fake
+
+
+def _post(payload):
+    response = TestClient(app).post("/workflow/proposals/batch", json=payload)
+    lines = [json.loads(line) for line in response.text.splitlines()] if response.status_code == 200 else []
+    return response, lines
+
+
+def test_batch_creates_proposals_and_links(fake):
+    project_ids = [f"project-{i}" for i in range(5)] + ["project-other", "project-0"]
+    response, lines = _post({"org_id": ORG, "template_id": "tmpl-1", "project_ids": project_ids,
+                             "title": "Spring offer: {project}", "user_id": "user-7", "create_links": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    *results, summary = lines
+    assert summary == {"done": True, "created": 5, "failed": 1}
+    assert {r["project_id"] for r in results} == set(project_ids)
+    assert [r["error"] for r in results if "error" in r] == ["Project not found"]
+    # Three chunks of (up to) two distinct projects, one RPC and one link insert each
+    assert fake.requests["rpc:create_proposals_from_template"] == 3
+    assert fake.requests["POST:signing_sessions"] == 3
+
+    by_project = {r["project_id"]: r for r in results}
+    assert by_project["project-1"]["signer_email"] == "ops@acme.test"
+    assert by_project["project-0"]["signer_email"] is None
+    names = sorted(p["name"] for p in fake.rows("proposals"))
+    assert names == [f"Spring offer: Job {i}" for i in range(5)]
+    versions = fake.rows("proposal_versions")
+    assert all(v["created_by"] == "user-7" and v["pinned"] for v in versions)
+    assert {s["token"] for s in fake.rows("signing_sessions")} == {r["token"] for r in results if "token" in r}
+    assert fake.emitted.count("proposal_created") == 5 and fake.emitted.count("proposal_sent") == 5
+
+
+def test_batch_rejects_bad_requests(fake):
+    base = {"org_id": ORG, "template_id": "tmpl-1", "project_ids": ["project-0"], "title": "x"}
+    assert _post({**base, "template_id": str(uuid.uuid4())})[0].status_code == 404
+    assert _post({**base, "org_id": OTHER_ORG})[0].status_code == 404
+    assert _post({**base, "project_ids": []})[0].status_code == 400
+    assert fake.requests["rpc:create_proposals_from_template"] == 0
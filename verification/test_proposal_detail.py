@@ -0,0 +1,80 @@
+"""
+Tests for the proposal detail read (execution/workflow_proposals.py
+get_proposal_full_async and GET /workflow/proposals/{id}): one embedded
+PostgREST round trip returning what the separate proposal and version
+queries used to, with version history paged and metadata-only by default.
+Runs against the in-memory PostgREST stand-in.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.workflow_proposals as wp
+from execution.supabase_client import get_client
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture
+def fake(fake_supabase):
+    fake_supabase.load("clients", [{"id": "client-1", "org_id": ORG, "name": "Jane", "email": "jane@example.com"}])
+    fake_supabase.load("projects", [{"id": "project-1", "org_id": ORG, "client_id": "client-1", "name": "Kitchen"}])
+    fake_supabase.load("proposals", [{"id": "proposal-1", "org_id": ORG, "client_id": "client-1",
+                                      "project_id": "project-1", "name": "Deck", "total": 500}])
+    fake_supabase.load("files", [{"id": "file-3", "org_id": ORG, "storage_path": "v3.pdf", "sha256": "0" * 64, "size_bytes": 10}])
+    fake_supabase.load("proposal_versions", [
+        {"id": f"version-{n}", "proposal_id": "proposal-1", "org_id": ORG, "version_number": n,
+         "content_json": {"sections": [{"title": f"v{n}"}]}, "created_at": f"2026-01-0{n}T00:00:00+00:00",
+         "created_by": None, "pdf_file_id": "file-3" if n == 3 else None}
+        for n in (1, 2, 3)
+    ])
+    fake_supabase.load("proposal_working_drafts", [{"proposal_id": "proposal-1", "user_id": "user-1",
+                                                    "content_json": {"sections": [{"title": "draft"}]}}])
+    return fake_supabase
+
+
+def _round_trips(fake):
+    return sum(fake.requests.values())
+
+
+def test_detail_is_one_round_trip_with_the_old_shape(fake):
+    data = wp.get_proposal_full("proposal-1", include_versions_content=True)
+    assert _round_trips(fake) == 1 and fake.requests["GET:proposals"] == 1
+
+    # What the separate proposal and versions queries returned
+    proposal = get_client().table("proposals").select(
+        "*, clients(id, name, email), projects(id, name)"
+    ).eq("id", "proposal-1").single().execute().data
+    versions = get_client().table("proposal_versions").select(
+        "*, files(id, storage_path, sha256, size_bytes)"
+    ).eq("proposal_id", "proposal-1").order("version_number", desc=True).execute().data
+
+    assert data["proposal"] == proposal
+    assert data["client"] == proposal["clients"] and data["project"] == proposal["projects"]
+    assert data["latest_version"] == versions[0] and data["latest_version"]["files"]["sha256"] == "0" * 64
+    assert data["versions"] == [{k: v for k, v in version.items() if k != "files"} for version in versions]
+    assert data["versions_page"] == {"limit": 20, "offset": 0, "total": 3}
+    assert [d["user_id"] for d in data["working_drafts"]] == ["user-1"]
+
+
+def test_version_history_is_paged_metadata(fake):
+    data = wp.get_proposal_full("proposal-1", versions_limit=2, versions_offset=1)
+    assert [v["version_number"] for v in data["versions"]] == [2, 1]
+    assert all(set(v) == {f.strip() for f in wp.VERSION_METADATA_FIELDS.split(",")} for v in data["versions"])
+    assert data["versions_page"]["total"] == 3 and data["latest_version"]["version_number"] == 3
+
+    # What the PDF route loads: no history, no drafts
+    data = wp.get_proposal_full("proposal-1", versions_limit=0, include_working_drafts=False)
+    assert data["versions"] == [] and "working_drafts" in data and data["working_drafts"] == []
+    assert data["latest_version"]["content_json"] == {"sections": [{"title": "v3"}]}
+    assert _round_trips(fake) == 2
+
+
+def test_detail_route(fake):
+    client = TestClient(app)
+    response = client.get("/workflow/proposals/proposal-1?versions_limit=1")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["proposal"]["name"] == "Deck" and [v["version_number"] for v in body["versions"]] == [3]
+    assert _round_trips(fake) == 1
+    assert client.get("/workflow/proposals/proposal-9").status_code == 404
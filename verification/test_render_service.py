@@ -0,0 +1,56 @@
+"""
+Tests for the render pool (execution/render_service.py): a render that runs
+past its timeout must not keep its worker process or its render slot.
+
+Uses real spawned processes; the layout function is swapped for time.sleep
+so the "render" is stuck for as long as the test wants.
+"""
+import threading
+import time
+import types
+
+import pytest
+
+import execution.render_service as render_service
+
+
+@pytest.fixture
+def stuck_pool(monkeypatch):
+    monkeypatch.setattr(render_service, "RENDER_WORKERS", 1)
+    monkeypatch.setattr(render_service, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(render_service, "pdf", types.SimpleNamespace(generate_pdf_from_html=time.sleep))
+    render_service._reset_executor(kill=True)
+    yield
+    render_service._reset_executor(kill=True)
+
+
+def _wait_for(condition, seconds=15):
+    deadline = time.monotonic() + seconds
+    while True:
+        result = condition()
+        if result or time.monotonic() > deadline:
+            return result
+        time.sleep(0.05)
+
+
+def test_timed_out_render_frees_its_slot_and_process(stuck_pool, monkeypatch):
+    processes = []
+    abandon = render_service._abandon
+
+    def spy(future):
+        processes.extend(render_service._executor._processes.values())
+        abandon(future)
+
+    monkeypatch.setattr(render_service, "_abandon", spy)
+    with pytest.raises(render_service.RenderTimeout):
+        render_service.render(60, timeout=3)
+
+    # The stuck process is killed and the slot comes back, instead of both
+    # being held for the rest of the minute
+    assert processes and _wait_for(lambda: not any(p.is_alive() for p in processes))
+    assert _wait_for(lambda: render_service._slots.acquire(blocking=False))
+    render_service._slots.release()
+    assert render_service.stats()["recycled"] >= 1
+
+    # A fresh pool takes the next render
+    assert render_service.render(0, timeout=30) is None
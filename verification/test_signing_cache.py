@@ -0,0 +1,132 @@
+"""
+Tests for the public signing-view cache (execution/workflow_signing.py):
+views and unknown tokens are cached for their TTLs, a lookup racing an
+invalidation can't store the stale view, concurrent misses share one RPC,
+and signing_sessions changes made elsewhere invalidate over NOTIFY.
+
+The NOTIFY test needs a plain local Postgres like test_template_cache.py
+(TEST_DATABASE_URL); the rest run against the in-memory PostgREST stand-in.
+"""
+import asyncio
+import time
+
+import pytest
+
+import execution.events as events
+import execution.template_cache as template_cache
+import execution.workflow_signing as ws
+from execution.cache import LRUCache
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    monkeypatch.setattr(ws, "SIGNING_CACHE_TTL_SECONDS", 60)
+    monkeypatch.setattr(ws, "SIGNING_CACHE_NEGATIVE_TTL_SECONDS", 0.2)
+    monkeypatch.setattr(ws, "_signing_cache", LRUCache(maxsize=100))
+    monkeypatch.setattr(ws, "_invalidated_at", LRUCache(maxsize=100))
+    fake_supabase.load("proposals", [{"id": "proposal-1", "org_id": ORG, "name": "Deck"}])
+    fake_supabase.load("proposal_versions", [{"id": "version-1", "proposal_id": "proposal-1", "org_id": ORG,
+                                              "version_number": 1, "content_json": {"sections": []}}])
+    fake_supabase.load("signing_sessions", [{"id": "session-1", "proposal_version_id": "version-1", "token": "t-1",
+                                             "status": "pending", "expires_at": "2999-01-01T00:00:00+00:00"}])
+    return fake_supabase
+
+
+def _lookups(fake):
+    return fake.requests["rpc:get_proposal_for_signing"]
+
+
+def test_views_are_cached_for_their_ttl(fake, monkeypatch):
+    assert ws.get_proposal_for_signing("t-1")["proposal_title"] == "Deck"
+    assert ws.get_proposal_for_signing("t-1")["proposal_title"] == "Deck"
+    assert _lookups(fake) == 1
+    # Held under the token's hash, never the token itself
+    assert "t-1" not in ws._signing_cache and ws._cache_key("t-1") in ws._signing_cache
+
+    # Unknown tokens only for the (shorter) negative TTL
+    assert ws.get_proposal_for_signing("nope") is None
+    assert ws.get_proposal_for_signing("nope") is None
+    assert _lookups(fake) == 2
+    time.sleep(0.25)
+    assert ws.get_proposal_for_signing("nope") is None
+    assert ws.get_proposal_for_signing("t-1") is not None
+    assert _lookups(fake) == 3
+
+
+def test_signing_drops_the_cached_view(fake, monkeypatch):
+    monkeypatch.setattr(events, "emit", lambda *args, **kwargs: True)
+    monkeypatch.setattr("execution.signing_finalize.enqueue", lambda token, delay=0: None)
+    assert ws.get_proposal_for_signing("t-1")["status"] == "viewed"
+    assert ws.sign_proposal("t-1", "Olive Owner", "Olive Owner")
+    assert ws.get_proposal_for_signing("t-1")["status"] == "signed"
+    assert _lookups(fake) == 2
+
+
+def test_lookup_racing_an_invalidation_is_not_cached(fake):
+    lookup = fake.rpcs["get_proposal_for_signing"]
+
+    def lookup_then_invalidate(args):
+        result = lookup(args)
+        # The token is signed (here or on another worker) while the view is on its way back
+        ws.invalidate_signing_cache(args["token_input"])
+        return result
+
+    fake.rpcs["get_proposal_for_signing"] = lookup_then_invalidate
+    assert ws.get_proposal_for_signing("t-1") is not None
+    assert ws._cache_key("t-1") not in ws._signing_cache
+
+    # Nor across a listener reconnect, when every token may be stale
+    fake.rpcs["get_proposal_for_signing"] = lambda args: ws._invalidate_all() or lookup(args)
+    assert ws.get_proposal_for_signing("t-1") is not None
+    assert len(ws._signing_cache) == 0
+
+
+def test_concurrent_misses_share_one_lookup(fake):
+    fake.latency = 0.1
+
+    async def burst():
+        return await asyncio.gather(*(ws.get_proposal_for_signing_async("t-1") for _ in range(5)))
+
+    views = asyncio.run(burst())
+    assert all(view == views[0] for view in views) and views[0] is not None
+    assert _lookups(fake) == 1 and ws._in_flight == {}
+
+
+def test_notify_from_trigger_invalidates(database_url, pg_schema, pg_connect, monkeypatch):
+    schema = pg_schema(
+        "signing_test",
+        "create table signing_sessions (id uuid primary key default gen_random_uuid(), token text not null, "
+        "status text not null default 'pending', expires_at timestamptz not null default now() + interval '7 days')",
+        ("notify_signing_change",),
+        ("create trigger signing_sessions_notify after update on signing_sessions "
+         "for each row execute function notify_signing_change()",),
+    )
+    cur = pg_connect(schema).cursor()
+    cur.execute("insert into signing_sessions (token) values ('t-1')")
+    monkeypatch.setattr(ws, "_signing_cache", LRUCache(maxsize=100))
+
+    monkeypatch.setattr(template_cache, "LISTEN_URL", database_url)
+    monkeypatch.setattr(template_cache, "TEMPLATE_CACHE_LISTEN", True)
+    try:
+        assert template_cache.start_listener()
+        deadline = time.monotonic() + 10
+        while not template_cache._listening and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert template_cache._listening
+
+        ws._signing_cache.set(ws._cache_key("t-1"), {"status": "pending"})
+        ws._signing_cache.set(ws._cache_key("t-2"), {"status": "pending"})
+        notifications = template_cache.stats()["notifications"]
+        # A first view doesn't notify; signing does, naming only that token
+        cur.execute("update signing_sessions set status = 'viewed' where token = 't-1'")
+        cur.execute("update signing_sessions set status = 'signed' where token = 't-1'")
+        while ws._cache_key("t-1") in ws._signing_cache and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert ws._cache_key("t-1") not in ws._signing_cache
+        assert ws._cache_key("t-2") in ws._signing_cache
+        assert template_cache.stats()["notifications"] == notifications + 1
+    finally:
+        template_cache.stop_listener()
+        template_cache._listener.join(timeout=10)
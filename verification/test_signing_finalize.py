@@ -0,0 +1,149 @@
+"""
+Tests for signed-PDF finalization (execution/signing_finalize.py and
+GET /public/proposals/{token}/final): signing queues it without rendering,
+the signed PDF is the stored version PDF plus an incrementally appended
+signature page, and failures are retried then reported. Runs against the
+in-memory PostgREST/Storage stand-in.
+"""
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+from pypdf import PdfReader, PdfWriter
+
+import execution.events as events
+import execution.pdf_cache as pdf_cache
+import execution.pdf_export as pdf_export
+import execution.render_service as render_service
+import execution.signing_finalize as signing_finalize
+import execution.workflow_proposals as wp
+from execution.cache import LRUCache
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+VERSION_PATH = f"org/{ORG}/projects/project-1/proposals/proposal-1/v1.pdf"
+
+
+def _pdf(pages: int, width: float = 612) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width, 792)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    fake = fake_supabase
+    emitted = []
+    monkeypatch.setattr(events, "emit", lambda event_type, *args, **kwargs: emitted.append(event_type) or True)
+    queued = []
+    monkeypatch.setattr(signing_finalize, "enqueue", lambda token, delay=0: queued.append((token, delay)))
+    rendered = []
+    monkeypatch.setattr(render_service, "render", lambda html, block=False, timeout=None: rendered.append(html) or _pdf(1, 300))
+    fake.emitted, fake.queued, fake.rendered = emitted, queued, rendered
+
+    fake.load("proposals", [{"id": "proposal-1", "org_id": ORG, "project_id": "project-1", "name": "Deck", "status": "sent"}])
+    fake.load("proposal_versions", [{"id": "version-1", "proposal_id": "proposal-1", "org_id": ORG, "version_number": 1,
+                                     "content_json": {"sections": []}}])
+    fake.load("signing_sessions", [{"id": "a1b2c3d4-session", "proposal_version_id": "version-1", "token": "t-1",
+                                    "signer_email": "owner@example.com", "expires_at": "2999-01-01T00:00:00+00:00"}])
+    return fake
+
+
+def _store_version_pdf(fake, pdf_bytes):
+    fake.objects[(wp.PDF_BUCKET, VERSION_PATH)] = pdf_bytes
+    fake.load("files", [{"id": "file-1", "org_id": ORG, "storage_path": VERSION_PATH,
+                         "sha256": hashlib.sha256(pdf_bytes).hexdigest()}])
+    fake.tables["proposal_versions"]["version-1"]["pdf_file_id"] = "file-1"
+
+
+def test_sign_queues_then_appends_signature_page(fake):
+    version_pdf = _pdf(2)
+    _store_version_pdf(fake, version_pdf)
+    client = TestClient(app)
+
+    response = client.post("/public/proposals/sign", json={"token": "t-1", "signature_name": "Olive Owner", "signature_data": "Olive Owner"})
+    assert response.json() == {"status": "signed", "final_url": "/public/proposals/t-1/final"}
+    assert fake.queued == [("t-1", 0)] and fake.rendered == []
+
+    response = client.get("/public/proposals/t-1/final")
+    assert response.json() == {"status": "pending"}
+    assert response.headers["Retry-After"] == str(signing_finalize.POLL_AFTER_SECONDS)
+
+    file_row = signing_finalize.finalize("t-1")
+    signed_pdf = fake.objects[(wp.PDF_BUCKET, signing_finalize.signed_pdf_path(VERSION_PATH, "a1b2c3d4-session"))]
+    # Incremental update: the version PDF's bytes are untouched, one page is added
+    assert signed_pdf.startswith(version_pdf)
+    assert len(PdfReader(io.BytesIO(signed_pdf)).pages) == 3
+    assert file_row["sha256"] == hashlib.sha256(signed_pdf).hexdigest()
+    # Only the signature page was laid out, from the stored version PDF
+    assert len(fake.rendered) == 1 and "Olive Owner" in fake.rendered[0]
+    assert hashlib.sha256(version_pdf).hexdigest() in fake.rendered[0]
+    assert "proposal_finalized" in fake.emitted
+
+    response = client.get("/public/proposals/t-1/final").json()
+    assert response["status"] == "done" and response["sha256"] == file_row["sha256"]
+    assert response["url"]
+    # Finalized once
+    assert signing_finalize.finalize("t-1") is None
+    assert len(fake.rows("files")) == 2
+
+
+def test_missing_version_pdf_is_stored_first(fake):
+    fake.rpcs["sign_proposal_with_token"]({"token_input": "t-1", "signature_name_input": "Olive Owner", "consent_input": True,
+                                           "signature_type_input": "text", "signature_data_input": "Olive Owner"})
+    signing_finalize.finalize("t-1")
+
+    version = fake.tables["proposal_versions"]["version-1"]
+    assert version["pdf_file_id"] is not None
+    assert len(fake.rendered) == 2
+    session = fake.tables["signing_sessions"]["a1b2c3d4-session"]
+    assert session["finalization_status"] == "done" and session["finalization_attempts"] == 1
+
+
+def test_failures_retry_then_fail(fake, monkeypatch):
+    _store_version_pdf(fake, b"not a pdf")
+    monkeypatch.setattr(signing_finalize, "FINALIZE_MAX_ATTEMPTS", 2)
+    fake.rpcs["sign_proposal_with_token"]({"token_input": "t-1", "signature_name_input": "Olive Owner", "consent_input": True,
+                                           "signature_type_input": "text", "signature_data_input": "Olive Owner"})
+    session = fake.tables["signing_sessions"]["a1b2c3d4-session"]
+
+    assert signing_finalize.finalize("t-1") is None
+    assert session["finalization_status"] == "pending" and session["finalization_error"]
+    assert fake.queued == [("t-1", signing_finalize.FINALIZE_RETRY_SECONDS)]
+
+    assert signing_finalize.finalize("t-1") is None
+    assert session["finalization_status"] == "failed" and session["finalization_attempts"] == 2
+    assert len(fake.queued) == 1
+
+    client = TestClient(app)
+    assert client.get("/public/proposals/t-1/final").json() == {"status": "failed"}
+    assert client.get("/public/proposals/unknown/final").status_code == 404
+
+
+def test_tampered_version_pdf_is_never_cached_or_signed(fake, monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "_memory", LRUCache(maxsize=8))
+    _store_version_pdf(fake, _pdf(3))
+    fake.objects[(wp.PDF_BUCKET, VERSION_PATH)] = _pdf(4)
+    sha256 = fake.rows("files")[0]["sha256"]
+
+    # Every path that reads the stored PDF checks it before caching it
+    response = TestClient(app).get("/workflow/proposals/proposal-1/pdf")
+    assert response.status_code == 502 and "sha256" in response.json()["detail"]
+    manifest = zipfile.ZipFile(io.BytesIO(b"".join(pdf_export.stream_proposals_zip(ORG)))).read("manifest.json")
+    assert "sha256" in json.loads(manifest)[0]["error"]
+    assert pdf_cache.get(sha256) is None
+
+    fake.rpcs["sign_proposal_with_token"]({"token_input": "t-1", "signature_name_input": "Olive Owner", "consent_input": True,
+                                           "signature_type_input": "text", "signature_data_input": "Olive Owner"})
+    assert signing_finalize.finalize("t-1") is None
+    session = fake.tables["signing_sessions"]["a1b2c3d4-session"]
+    assert session["finalization_status"] == "pending" and "sha256" in session["finalization_error"]
+    assert fake.rendered == [] and len(fake.rows("files")) == 1
+    assert pdf_cache.get(sha256) is None
@@ -0,0 +1,98 @@
+"""
+Tests for bulk signing links (POST /workflow/signing-links/bulk) and in-place
+renewal (POST /workflow/signing-links/renew): one pin call and one insert per
+request, per-link errors, and renewal that keeps tokens, revives expired
+links and leaves signed ones alone. Runs against the in-memory PostgREST
+stand-in; the SQL functions are covered by applying schema.sql.
+"""
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.events as events
+import execution.workflow_proposals as wp
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+VERSION_1 = "5d3a1c7e-0f2b-4a6d-9e8c-1b2a3c4d5e01"
+VERSION_2 = "5d3a1c7e-0f2b-4a6d-9e8c-1b2a3c4d5e02"
+MISSING_VERSION = "5d3a1c7e-0f2b-4a6d-9e8c-1b2a3c4d5e09"
+
+
+def _in(hours: float) -> str:
+    return (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=hours)).isoformat()
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    fake = fake_supabase
+    monkeypatch.setattr(events, "emit", lambda *args, **kwargs: True)
+
+    fake.load("proposals", [{"id": "proposal-1", "org_id": ORG, "name": "Deck"}])
+    fake.load("proposal_versions", [
+        {"id": version_id, "proposal_id": "proposal-1", "org_id": ORG, "version_number": n, "content_json": {}}
+        for n, version_id in ((1, VERSION_1), (2, VERSION_2))
+    ])
+    return fake
+
+
+def test_bulk_links_in_one_insert(fake):
+    links = [
+        {"proposal_version_id": VERSION_2, "signer_email": "owner@example.com"},
+        {"proposal_version_id": VERSION_2, "signer_email": "partner@example.com", "expires_in_days": 14},
+        {"proposal_version_id": MISSING_VERSION, "signer_email": "ghost@example.com"},
+        {"proposal_version_id": "version-2", "signer_email": "typo@example.com"},
+    ]
+    response = TestClient(app).post("/workflow/signing-links/bulk", json={"links": links})
+    assert response.status_code == 200
+
+    results = response.json()["links"]
+    assert [r.get("signer_email") for r in results[:2]] == ["owner@example.com", "partner@example.com"]
+    assert results[2] == {"proposal_version_id": MISSING_VERSION, "error": "Version not found"}
+    assert results[3] == {"proposal_version_id": "version-2", "error": "Version not found"}
+    assert all(r["url"].endswith(f"token={r['token']}") for r in results[:2])
+    assert fake.requests["rpc:pin_proposal_versions"] == 1
+    assert fake.requests["POST:signing_sessions"] == 1
+    assert len(fake.rows("signing_sessions")) == 2
+    assert fake.tables["proposal_versions"][VERSION_2]["pinned"]
+
+
+def test_failed_insert_is_reported_per_link(fake, monkeypatch):
+    fake.load("signing_sessions", [{"id": "s-taken", "proposal_version_id": VERSION_1, "token": "t-taken",
+                                    "status": "pending", "expires_at": _in(1)}])
+    new_session = wp._new_signing_session
+    monkeypatch.setattr(wp, "_new_signing_session", lambda *args: {**new_session(*args), "id": "s-taken"})
+    links = [{"proposal_version_id": VERSION_2}, {"proposal_version_id": "nope"}]
+
+    response = TestClient(app).post("/workflow/signing-links/bulk", json={"links": links})
+    assert response.status_code == 200
+    results = response.json()["links"]
+    assert results[0]["proposal_version_id"] == VERSION_2 and "duplicate key" in results[0]["error"]
+    assert results[1] == {"proposal_version_id": "nope", "error": "Version not found"}
+    assert len(fake.rows("signing_sessions")) == 1
+
+def test_renew_in_place(fake):
+    fake.load("signing_sessions", [
+        {"id": "s-soon", "proposal_version_id": VERSION_1, "token": "t-soon", "status": "pending", "expires_at": _in(2)},
+        {"id": "s-expired", "proposal_version_id": VERSION_1, "token": "t-expired", "status": "expired",
+         "opened_at": _in(-48), "expires_at": _in(-24)},
+        {"id": "s-later", "proposal_version_id": VERSION_1, "token": "t-later", "status": "pending", "expires_at": _in(24 * 30)},
+        {"id": "s-signed", "proposal_version_id": VERSION_1, "token": "t-signed", "status": "signed", "expires_at": _in(1)},
+    ])
+    fake.tables["proposals"]["proposal-1"]["status"] = "expired"
+    client = TestClient(app)
+
+    response = client.post("/workflow/signing-links/renew", json={"org_id": ORG, "expiring_within_hours": 48})
+    renewed = {link["token"]: link for link in response.json()["links"]}
+    assert set(renewed) == {"t-soon", "t-expired"}
+    assert renewed["t-expired"]["status"] == "viewed"
+    # The opened link is live again, so its proposal is back to viewed
+    assert fake.tables["proposals"]["proposal-1"]["status"] == "viewed"
+    assert all(link["expires_at"] > _in(24 * 6.9) for link in renewed.values())
+
+    response = client.post("/workflow/signing-links/renew", json={"org_id": ORG, "tokens": ["t-signed", "t-later"]})
+    assert [link["token"] for link in response.json()["links"]] == ["t-later"]
+    assert fake.tables["signing_sessions"]["s-later"]["expires_at"] > _in(24 * 29)
+
+    assert client.post("/workflow/signing-links/renew", json={"org_id": ORG}).status_code == 400
@@ -0,0 +1,70 @@
+"""
+Tests for the async data-access layer (execution/supabase_client.py): one
+pooled client per event loop, sync wrappers that keep reusing one
+background loop (and so one pool), and async handlers whose Supabase round
+trips overlap instead of queueing. Runs against the in-memory PostgREST
+stand-in.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import execution.supabase_client as sc
+import execution.workflow_core as wc
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture
+def fake(fake_supabase):
+    fake_supabase.load("clients", [
+        {"id": f"00000000-0000-0000-0000-{i:012d}", "org_id": ORG, "name": f"Client {i}",
+         "created_at": "2026-01-01T00:00:00+00:00"}
+        for i in range(3)
+    ])
+    return fake_supabase
+
+
+def test_one_client_per_event_loop(fake):
+    async def clients_on_this_loop():
+        first = sc.get_async_client()
+        assert sc.get_async_client() is first
+        http = first.options.httpx_client
+        await sc.close_async_client()
+        return first, http
+
+    first, first_http = asyncio.run(clients_on_this_loop())
+    second, _ = asyncio.run(clients_on_this_loop())
+    assert first is not second
+    # Closing on shutdown releases the pool and forgets the client
+    assert first_http.is_closed and len(sc._async_clients) == 0
+
+
+def test_sync_wrappers_reuse_one_loop_and_pool(fake):
+    assert len(wc.list_clients(ORG)["data"]) == 3
+    loop = sc._sync_loop
+    client = sc._async_clients[loop]
+
+    assert len(wc.list_clients(ORG)["data"]) == 3
+    assert sc._sync_loop is loop and sc._async_clients[loop] is client
+    assert not client.options.httpx_client.is_closed
+    assert fake.requests["GET:clients"] == 2
+
+
+def test_async_handlers_overlap_round_trips(fake):
+    fake.latency = 0.2
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.monotonic()
+            responses = await asyncio.gather(*(client.get(f"/workflow/clients?org_id={ORG}") for _ in range(10)))
+            return time.monotonic() - started, responses
+
+    elapsed, responses = asyncio.run(burst())
+    assert all(r.status_code == 200 and len(r.json()) == 3 for r in responses)
+    # Ten 200ms round trips one after another would take 2s
+    assert elapsed < 1.0
@@ -0,0 +1,145 @@
+"""
+Tests for the expiry sweeper (execution/sweeper.py, POST /workflow/proposals/expire):
+batched expiry of lapsed links and their proposals, archiving of old links,
+and leader election through the Postgres advisory lock.
+
+The sweep test runs against the in-memory PostgREST stand-in; the SQL
+functions and the leader election need a plain local Postgres like
+test_version_append.py (TEST_DATABASE_URL).
+"""
+import datetime
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.sweeper as sweeper
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+MINIMAL_TABLES = """
+create table proposals (id uuid primary key default gen_random_uuid(), status text default 'draft');
+create table proposal_versions (id uuid primary key default gen_random_uuid(), proposal_id uuid references proposals(id) not null);
+create table signing_sessions (
+  id uuid primary key default gen_random_uuid(),
+  proposal_version_id uuid references proposal_versions(id) not null,
+  token text not null default gen_random_uuid()::text,
+  status text not null default 'pending',
+  expires_at timestamptz not null
+);
+create table signatures (id uuid primary key default gen_random_uuid(), signing_session_id uuid references signing_sessions(id) not null);
+create table signing_sessions_archive (
+  id uuid primary key,
+  proposal_version_id uuid not null,
+  token text not null,
+  status text not null,
+  expires_at timestamptz,
+  archived_at timestamptz not null default now(),
+  session jsonb not null
+);
+"""
+
+
+def _in(days: float) -> str:
+    return (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=days)).isoformat()
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    fake = fake_supabase
+    monkeypatch.setattr(sweeper, "SWEEP_BATCH_SIZE", 2)
+
+    fake.load("proposals", [{"id": f"proposal-{i}", "org_id": ORG, "status": "sent"} for i in range(3)])
+    fake.load("proposal_versions", [{"id": f"version-{i}", "proposal_id": f"proposal-{i}", "version_number": 1} for i in range(3)])
+    fake.load("signing_sessions", [
+        # proposal-0: every link lapsed; one long ago
+        {"id": "s-0a", "proposal_version_id": "version-0", "token": "t-0a", "status": "pending", "expires_at": _in(-1)},
+        {"id": "s-0b", "proposal_version_id": "version-0", "token": "t-0b", "status": "viewed", "expires_at": _in(-45)},
+        # proposal-1: one lapsed, one still open
+        {"id": "s-1a", "proposal_version_id": "version-1", "token": "t-1a", "status": "pending", "expires_at": _in(-2)},
+        {"id": "s-1b", "proposal_version_id": "version-1", "token": "t-1b", "status": "pending", "expires_at": _in(3)},
+        # proposal-2: already signed
+        {"id": "s-2a", "proposal_version_id": "version-2", "token": "t-2a", "status": "signed", "expires_at": _in(-40)},
+    ])
+    return fake
+
+
+def test_sweep_expires_and_archives_in_batches(fake):
+    response = TestClient(app).post("/workflow/proposals/expire")
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["sessions_expired"], result["proposals_expired"], result["sessions_archived"]) == (3, 1, 1)
+
+    statuses = {s["id"]: s["status"] for s in fake.rows("signing_sessions")}
+    assert statuses == {"s-0a": "expired", "s-1a": "expired", "s-1b": "pending", "s-2a": "signed"}
+    assert [p["status"] for p in sorted(fake.rows("proposals"), key=lambda p: p["id"])] == ["expired", "sent", "sent"]
+    assert [a["token"] for a in fake.rows("signing_sessions_archive")] == ["t-0b"]
+    # Batches of two until one comes back short
+    assert fake.requests["rpc:expire_signing_sessions"] == 2
+    assert sweeper.stats()["last_sweep"]["sessions_expired"] == 3
+
+    result = TestClient(app).post("/workflow/proposals/expire").json()
+    assert (result["sessions_expired"], result["proposals_expired"], result["sessions_archived"]) == (0, 0, 0)
+
+
+def test_sql_functions(pg_schema, pg_connect):
+    schema = pg_schema("sweeper_test", MINIMAL_TABLES, ("expire_signing_sessions", "archive_signing_sessions"))
+    with pg_connect(schema).cursor() as cur:
+        cur.execute("insert into proposals (status) values ('sent'), ('viewed') returning id")
+        (lapsed,), (open_,) = cur.fetchall()
+        cur.execute("insert into proposal_versions (proposal_id) values (%s), (%s) returning id", (lapsed, open_))
+        (v_lapsed,), (v_open,) = cur.fetchall()
+        cur.execute("""insert into signing_sessions (proposal_version_id, status, expires_at) values
+            (%(l)s, 'pending', now() - interval '1 day'), (%(l)s, 'viewed', now() - interval '40 days'),
+            (%(o)s, 'pending', now() - interval '2 hours'), (%(o)s, 'viewed', now() + interval '1 day'),
+            (%(o)s, 'expired', now() - interval '60 days')
+            returning id""", {"l": v_lapsed, "o": v_open})
+        signed_session = cur.fetchall()[-1][0]
+        cur.execute("insert into signatures (signing_session_id) values (%s)", (signed_session,))
+
+        cur.execute("select * from expire_signing_sessions(2)")
+        assert cur.fetchone() == (2, 1)
+        cur.execute("select * from expire_signing_sessions(2)")
+        assert cur.fetchone() == (1, 0)
+        cur.execute("select id, status from proposals")
+        assert dict(cur.fetchall()) == {lapsed: "expired", open_: "viewed"}
+
+        # The one with a signature stays put
+        cur.execute("select archive_signing_sessions(interval '30 days', 10)")
+        assert cur.fetchone() == (1,)
+        cur.execute("select status, session->>'proposal_version_id' from signing_sessions_archive")
+        assert cur.fetchall() == [("expired", v_lapsed)]
+
+
+def test_only_the_lock_holder_sweeps(database_url, monkeypatch):
+    import psycopg2
+    sweeps = []
+    monkeypatch.setattr(sweeper, "sweep", lambda: sweeps.append(1))
+    monkeypatch.setattr(sweeper, "LOCK_URL", database_url)
+    monkeypatch.setattr(sweeper, "LOCK_KEY", int(uuid.uuid4().int % 2**62))
+    monkeypatch.setattr(sweeper, "SWEEP_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(sweeper, "SWEEP_ENABLED", True)
+
+    # Another worker is the leader
+    other = psycopg2.connect(database_url)
+    other.autocommit = True
+    with other.cursor() as cur:
+        cur.execute("select pg_advisory_lock(%s)", (sweeper.LOCK_KEY,))
+    try:
+        assert sweeper.start()
+        time.sleep(0.5)
+        assert not sweeper._leader and not sweeps
+
+        # It goes away; this worker takes over
+        other.close()
+        deadline = time.monotonic() + 10
+        while not sweeps and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert sweeper._leader and sweeps
+    finally:
+        sweeper.stop()
+        sweeper._scheduler.join(timeout=10)
+        other.close()
+    assert not sweeper._leader
@@ -0,0 +1,104 @@
+"""
+Tests for the per-org template cache (execution/template_cache.py): reads
+are served from cache until the org's templates change, a read racing an
+invalidation can't store stale data, the API's own writes invalidate, and
+NOTIFYs from the proposal_templates trigger reach the listener.
+
+The listener test needs a plain local Postgres like test_version_append.py
+(TEST_DATABASE_URL); the rest run against the in-memory PostgREST stand-in.
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+import execution.template_cache as template_cache
+from execution.cache import LRUCache
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(template_cache, "_cache", LRUCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(template_cache, "_generations", {})
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch):
+    fake = fake_supabase
+    fake.load("proposal_templates", [
+        {"id": str(uuid.uuid4()), "org_id": ORG, "name": f"Template {i}", "content_json": {"sections": []}}
+        for i in range(3)
+    ])
+    return fake
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    loads = []
+
+    async def load():
+        loads.append(1)
+        # Someone changes the org's templates while this read is in flight
+        template_cache.invalidate(ORG)
+        return "stale"
+
+    async def scenario():
+        assert await template_cache.get_or_load(ORG, ("layout",), load) == "stale"
+
+        async def fresh():
+            return "fresh"
+        assert await template_cache.get_or_load(ORG, ("layout",), fresh) == "fresh"
+        assert await template_cache.get_or_load(ORG, ("layout",), fresh) == "fresh"
+
+    asyncio.run(scenario())
+    assert len(loads) == 1
+
+
+def test_reads_are_cached_until_the_org_changes(fake):
+    client = TestClient(app)
+    first = client.get(f"/workflow/templates?org_id={ORG}").json()
+    assert client.get(f"/workflow/templates?org_id={ORG}").json() == first
+    assert fake.requests["GET:proposal_templates"] == 1
+
+    template_id = first[0]["id"]
+    response = client.patch(f"/workflow/templates/{template_id}", json={"name": "Renamed"})
+    assert response.status_code == 200
+    names = {t["name"] for t in client.get(f"/workflow/templates?org_id={ORG}").json()}
+    assert "Renamed" in names
+    assert fake.requests["GET:proposal_templates"] == 2
+
+    assert client.patch(f"/workflow/templates/{template_id}", json={}).status_code == 400
+    assert client.patch(f"/workflow/templates/{uuid.uuid4()}", json={"name": "x"}).status_code == 404
+
+
+def test_notify_from_trigger_invalidates(database_url, pg_schema, pg_connect, monkeypatch):
+    schema = pg_schema(
+        "template_test",
+        "create table proposal_templates (id uuid primary key default gen_random_uuid(), org_id uuid not null, name text)",
+        ("notify_template_change",),
+        ("create trigger proposal_templates_notify after insert or update or delete on proposal_templates "
+         "for each row execute function notify_template_change()",),
+    )
+    cur = pg_connect(schema).cursor()
+
+    monkeypatch.setattr(template_cache, "LISTEN_URL", database_url)
+    monkeypatch.setattr(template_cache, "TEMPLATE_CACHE_LISTEN", True)
+    try:
+        assert template_cache.start_listener()
+        deadline = time.monotonic() + 10
+        while not template_cache._listening and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert template_cache._listening
+
+        cur.execute("insert into proposal_templates (org_id, name) values (%s, 'a'), (%s, 'b')", (ORG, ORG))
+        while template_cache._generations.get(ORG) != 1 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        # Two rows in one statement, one notification
+        assert template_cache._generations.get(ORG) == 1
+    finally:
+        template_cache.stop_listener()
+        template_cache._listener.join(timeout=10)
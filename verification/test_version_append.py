@@ -0,0 +1,356 @@
+"""
+Tests for the proposal version functions in execution/schema.sql:
+append_proposal_version (concurrency, snapshot/delta storage),
+get_proposal_version_content, compact_proposal_versions and the autosave
+path (save_proposal_draft / flush_working_drafts).
+
+Runs against a plain local Postgres (no Supabase needed): set
+TEST_DATABASE_URL, e.g. postgresql://postgres@localhost:5432/postgres.
+The functions are loaded from schema.sql into a throwaway schema with
+minimal proposals / proposal_versions tables.
+"""
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from execution.json_delta import apply_delta
+from verification.conftest import connect
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+WORKERS = 16
+SAVES_PER_WORKER = 10
+
+FUNCTIONS = (
+    "jsonb_diff", "jsonb_patch", "jsonb_content_hash", "get_proposal_version_content",
+    "pin_proposal_version", "append_proposal_version", "compact_proposal_versions",
+    "save_proposal_draft", "flush_working_drafts",
+)
+
+MINIMAL_TABLES = """
+create table proposals (
+  id uuid primary key,
+  org_id uuid not null,
+  updated_at timestamptz default now()
+);
+create table proposal_versions (
+  id uuid primary key default gen_random_uuid(),
+  proposal_id uuid references proposals(id) not null,
+  org_id uuid,
+  version_number int not null default 1,
+  content_json jsonb,
+  content_hash text,
+  storage_kind text not null default 'snapshot',
+  delta_json jsonb,
+  pinned boolean not null default false,
+  pdf_file_id uuid,
+  created_at timestamptz default now(),
+  created_by uuid
+);
+create unique index proposal_versions_proposal_number_key on proposal_versions (proposal_id, version_number);
+create table proposal_working_drafts (
+  proposal_id uuid references proposals(id) on delete cascade not null,
+  user_id uuid not null,
+  content_json jsonb not null,
+  content_hash text not null,
+  first_saved_at timestamptz default now(),
+  updated_at timestamptz default now(),
+  primary key (proposal_id, user_id)
+);
+"""
+
+
+@pytest.fixture
+def db_schema(pg_schema):
+    return pg_schema("append_test", MINIMAL_TABLES, FUNCTIONS)
+
+
+def _new_proposal(conn) -> str:
+    proposal_id = str(uuid.uuid4())
+    with conn.cursor() as cur:
+        cur.execute("insert into proposals (id, org_id, updated_at) values (%s, %s, now() - interval '1 day')", (proposal_id, str(uuid.uuid4())))
+    return proposal_id
+
+
+def _edits(count: int):
+    """A proposal being edited: sections added, rewritten, reordered and dropped."""
+    doc = {
+        "title": "Kitchen remodel",
+        "sections": [{"title": f"Intro {n}", "content": "Lorem ipsum " * 20} for n in range(6)],
+        "pricing": [{"item": "Demo", "amount": 1000}],
+        "notes": None,
+    }
+    for i in range(count):
+        doc = json.loads(json.dumps(doc))
+        if i % 7 == 3 and doc["sections"]:
+            doc["sections"].pop()
+        elif i % 5 == 0:
+            doc["sections"].append({"title": f"Section {i}", "content": "Lorem ipsum " * 20})
+        else:
+            if doc["sections"]:
+                doc["sections"][i % len(doc["sections"])]["content"] += f" edit {i}"
+            doc["pricing"][0]["amount"] += i
+        if i % 11 == 10:
+            doc.pop("notes", None) if "notes" in doc else doc.update(notes={"n": i})
+        if i % 13 == 12:
+            doc["sections"].reverse()
+        yield doc
+
+
+def _save_many(schema: str, proposal_id: str, worker: int):
+    conn = connect(schema)
+    numbers = []
+    try:
+        with conn.cursor() as cur:
+            for i in range(SAVES_PER_WORKER):
+                cur.execute(
+                    "select version_number from append_proposal_version(%s, %s::jsonb)",
+                    (proposal_id, json.dumps({"worker": worker, "save": i})),
+                )
+                numbers.append(cur.fetchone()[0])
+    finally:
+        conn.close()
+    return numbers
+
+
+def test_parallel_saves_get_unique_sequential_numbers(db_schema):
+    conn = connect(db_schema)
+    proposal_id = _new_proposal(conn)
+    with conn.cursor() as cur:
+        cur.execute("select org_id::text from proposals where id = %s", (proposal_id,))
+        org_id = cur.fetchone()[0]
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        results = list(pool.map(lambda w: _save_many(db_schema, proposal_id, w), range(WORKERS)))
+
+    total = WORKERS * SAVES_PER_WORKER
+    returned = sorted(n for numbers in results for n in numbers)
+    assert returned == list(range(1, total + 1))
+
+    with conn.cursor() as cur:
+        cur.execute("select count(*), count(distinct version_number), min(org_id::text), max(org_id::text) from proposal_versions where proposal_id = %s", (proposal_id,))
+        count, distinct, min_org, max_org = cur.fetchone()
+        assert count == distinct == total
+        assert min_org == max_org == org_id
+
+        cur.execute("select updated_at > now() - interval '1 minute' from proposals where id = %s", (proposal_id,))
+        assert cur.fetchone()[0]
+    conn.close()
+
+
+def test_missing_proposal_raises(db_schema):
+    conn = connect(db_schema)
+    with conn.cursor() as cur:
+        with pytest.raises(psycopg2.Error) as exc:
+            cur.execute("select * from append_proposal_version(%s, '{}'::jsonb)", (str(uuid.uuid4()),))
+        assert exc.value.pgcode == "P0002"
+    conn.close()
+
+
+def test_versions_stored_as_deltas_reconstruct_exactly(db_schema):
+    conn = connect(db_schema)
+    proposal_id = _new_proposal(conn)
+    saved = list(_edits(40))
+    with conn.cursor() as cur:
+        for doc in saved:
+            cur.execute("select 1 from append_proposal_version(%s, %s::jsonb, null, 10)", (proposal_id, json.dumps(doc)))
+
+        cur.execute(
+            "select version_number, storage_kind, content_json, delta_json from proposal_versions "
+            "where proposal_id = %s order by version_number", (proposal_id,)
+        )
+        rows = cur.fetchall()
+        snapshots = [n for n, kind, _, _ in rows if kind == "snapshot"]
+        # At least every 10th version (more where a delta wasn't smaller)
+        assert snapshots[0] == 1
+        assert all(b - a <= 10 for a, b in zip(snapshots, snapshots[1:] + [41]))
+        assert len(snapshots) < 10
+        # Only snapshots and the latest version keep full content
+        assert [n for n, _, content, _ in rows if content is not None] == snapshots + [40]
+        assert rows[-1][2] == saved[-1]
+
+        for number, doc in enumerate(saved, start=1):
+            cur.execute("select get_proposal_version_content(%s, %s)", (proposal_id, number))
+            assert cur.fetchone()[0] == doc
+
+        # The Python applier agrees with jsonb_patch
+        content = None
+        for number, kind, stored, delta in rows:
+            content = stored if kind == "snapshot" else apply_delta(content, delta)
+            assert content == saved[number - 1]
+
+        cur.execute("select sum(octet_length(coalesce(content_json, delta_json)::text)) from proposal_versions where proposal_id = %s", (proposal_id,))
+        stored_bytes = cur.fetchone()[0]
+        assert stored_bytes < sum(len(json.dumps(doc)) for doc in saved) / 2
+    conn.close()
+
+
+def test_pinned_version_keeps_content(db_schema):
+    conn = connect(db_schema)
+    proposal_id = _new_proposal(conn)
+    saved = list(_edits(4))
+    with conn.cursor() as cur:
+        for doc in saved[:3]:
+            cur.execute("select 1 from append_proposal_version(%s, %s::jsonb)", (proposal_id, json.dumps(doc)))
+        cur.execute("select id from proposal_versions where proposal_id = %s and version_number = 2", (proposal_id,))
+        version_id = cur.fetchone()[0]
+        cur.execute("select pin_proposal_version(%s)", (version_id,))
+        cur.execute("select 1 from append_proposal_version(%s, %s::jsonb)", (proposal_id, json.dumps(saved[3])))
+
+        cur.execute("select version_number, content_json is not null from proposal_versions where proposal_id = %s order by version_number", (proposal_id,))
+        assert cur.fetchall() == [(1, True), (2, True), (3, False), (4, True)]
+        cur.execute("select content_json from proposal_versions where id = %s", (version_id,))
+        assert cur.fetchone()[0] == saved[1]
+    conn.close()
+
+
+def test_compaction_rewrites_full_copies(db_schema):
+    conn = connect(db_schema)
+    proposal_id = _new_proposal(conn)
+    saved = list(_edits(25))
+    with conn.cursor() as cur:
+        # Legacy layout: every version a full copy
+        for number, doc in enumerate(saved, start=1):
+            cur.execute(
+                "insert into proposal_versions (proposal_id, version_number, content_json, pinned) values (%s, %s, %s::jsonb, %s)",
+                (proposal_id, number, json.dumps(doc), number == 7)
+            )
+        cur.execute("select compact_proposal_versions(%s, 10)", (proposal_id,))
+        converted = cur.fetchone()[0]
+        cur.execute("select compact_proposal_versions(%s, 10)", (proposal_id,))
+        assert cur.fetchone()[0] == 0
+
+        cur.execute(
+            "select version_number, storage_kind, content_json is not null from proposal_versions "
+            "where proposal_id = %s order by version_number", (proposal_id,)
+        )
+        rows = cur.fetchall()
+        snapshots = [n for n, kind, _ in rows if kind == "snapshot"]
+        assert converted == 25 - len(snapshots) > 15
+        assert all(b - a <= 10 for a, b in zip(snapshots, snapshots[1:] + [26]))
+        # Pinned (7) and latest (25) versions keep their content
+        assert [n for n, _, has_content in rows if has_content] == sorted(set(snapshots) | {7, 25})
+        for number, doc in enumerate(saved, start=1):
+            cur.execute("select get_proposal_version_content(%s, %s)", (proposal_id, number))
+            assert cur.fetchone()[0] == doc
+
+        # Saving after compaction continues the chain
+        cur.execute("select storage_kind from append_proposal_version(%s, %s::jsonb, null, 10)", (proposal_id, json.dumps(saved[0])))
+        cur.fetchone()
+        cur.execute("select get_proposal_version_content(%s, 26)", (proposal_id,))
+        assert cur.fetchone()[0] == saved[0]
+    conn.close()
+
+
+def _save(cur, proposal_id, doc, user_id=None, coalesce_seconds=0, publish=False):
+    cur.execute(
+        "select save_proposal_draft(%s, %s::jsonb, %s, %s, %s)",
+        (proposal_id, json.dumps(doc), user_id, coalesce_seconds, publish)
+    )
+    return cur.fetchone()[0]
+
+
+def _version_count(cur, proposal_id):
+    cur.execute("select count(*) from proposal_versions where proposal_id = %s", (proposal_id,))
+    return cur.fetchone()[0]
+
+
+def test_identical_saves_are_skipped(db_schema):
+    conn = connect(db_schema)
+    proposal_id = _new_proposal(conn)
+    with conn.cursor() as cur:
+        first = _save(cur, proposal_id, {"b": 1, "a": [1, 2]})
+        assert first["status"] == "created"
+        assert "content_json" not in first["version"]
+        # Same content, different key order
+        again = _save(cur, proposal_id, {"a": [1, 2], "b": 1})
+        assert again["status"] == "unchanged"
+        assert again["version"]["id"] == first["version"]["id"]
+        assert _save(cur, proposal_id, {"a": [1, 2, 3], "b": 1})["status"] == "created"
+        assert _version_count(cur, proposal_id) == 2
+    conn.close()
+
+
+def test_coalesced_saves_flush_to_one_version(db_schema):
+    conn = connect(db_schema)
+    proposal_id, user_id = _new_proposal(conn), str(uuid.uuid4())
+    saved = list(_edits(6))
+    with conn.cursor() as cur:
+        _save(cur, proposal_id, saved[0], user_id)
+        statuses = [_save(cur, proposal_id, doc, user_id, coalesce_seconds=30)["status"] for doc in saved[1:]]
+        assert statuses == ["drafted"] * 5
+        assert _save(cur, proposal_id, saved[-1], user_id, coalesce_seconds=30)["status"] == "unchanged"
+        assert _version_count(cur, proposal_id) == 1
+
+        # Not quiet long enough yet
+        cur.execute("select count(*) from flush_working_drafts(30)")
+        assert cur.fetchone()[0] == 0
+        cur.execute("select version_number, content_json from flush_working_drafts(0)")
+        assert cur.fetchall() == [(2, saved[-1])]
+        cur.execute("select count(*) from proposal_working_drafts")
+        assert cur.fetchone()[0] == 0
+
+        # A draft is also flushed once it is too old, however busy the user is
+        _save(cur, proposal_id, saved[0], user_id, coalesce_seconds=30)
+        cur.execute("select count(*) from flush_working_drafts(3600, 0)")
+        assert cur.fetchone()[0] == 1
+    conn.close()
+
+
+def test_publish_materializes_draft_immediately(db_schema):
+    conn = connect(db_schema)
+    proposal_id, user_id = _new_proposal(conn), str(uuid.uuid4())
+    with conn.cursor() as cur:
+        _save(cur, proposal_id, {"v": 1}, user_id)
+        drafted = _save(cur, proposal_id, {"v": 2}, user_id, coalesce_seconds=30)
+        assert drafted["working_draft"]["user_id"] == user_id
+        published = _save(cur, proposal_id, {"v": 2}, user_id, coalesce_seconds=30, publish=True)
+        assert published["status"] == "created"
+        assert published["version"]["version_number"] == 2
+        assert published["working_draft"] is None
+
+        # Editing back to the saved content drops the pending draft
+        _save(cur, proposal_id, {"v": 3}, user_id, coalesce_seconds=30)
+        assert _save(cur, proposal_id, {"v": 2}, user_id, coalesce_seconds=30)["status"] == "unchanged"
+        cur.execute("select count(*) from flush_working_drafts(0)")
+        assert cur.fetchone()[0] == 0
+        assert _version_count(cur, proposal_id) == 2
+    conn.close()
+
+
+def test_flush_runs_alongside_saves(db_schema):
+    conn = connect(db_schema)
+    proposal_ids = [_new_proposal(conn) for _ in range(4)]
+    users = [str(uuid.uuid4()) for _ in range(4)]
+
+    def edit(worker):
+        c = connect(db_schema)
+        try:
+            with c.cursor() as cur:
+                for i in range(20):
+                    _save(cur, proposal_ids[i % 4], {"worker": worker, "i": i}, users[worker % 4], coalesce_seconds=1, publish=i % 9 == 8)
+        finally:
+            c.close()
+
+    def flush(_):
+        c = connect(db_schema)
+        try:
+            with c.cursor() as cur:
+                for _ in range(20):
+                    cur.execute("select count(*) from flush_working_drafts(0)")
+        finally:
+            c.close()
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        list(pool.map(lambda job: job[0](job[1]), [(edit, w) for w in range(8)] + [(flush, w) for w in range(4)]))
+
+    with conn.cursor() as cur:
+        cur.execute("select count(*) from flush_working_drafts(0)")
+        cur.execute("select count(*) from proposal_working_drafts")
+        assert cur.fetchone()[0] == 0
+        cur.execute("select proposal_id, array_agg(version_number order by version_number) from proposal_versions group by proposal_id")
+        for _, numbers in cur.fetchall():
+            assert numbers == list(range(1, len(numbers) + 1))
+    conn.close()
@@ -0,0 +1,126 @@
+"""
+Tests for stored version PDFs (execution/workflow_proposals.py
+store_version_pdf and GET /workflow/proposals/{id}/pdf): a version's PDF is
+rendered once, uploaded under its own object and linked to the version, the
+endpoint serves the stored object instead of rendering, and a render that
+loses the link race removes its file. Runs against the in-memory
+PostgREST/Storage stand-in.
+"""
+import hashlib
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from pypdf import PdfWriter
+
+import execution.pdf_cache as pdf_cache
+import execution.pdf_generator as pdf
+import execution.render_service as render_service
+import execution.template_cache as template_cache
+import execution.workflow_proposals as wp
+from execution.cache import LRUCache
+from orchestration.api_server import app
+
+ORG = "7c1f8a2e-3b4d-4e5f-8a9b-0c1d2e3f4a5b"
+VERSION_PATH = f"org/{ORG}/projects/project-1/proposals/proposal-1/v1.pdf"
+
+
+def _pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(612, 792)
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+@pytest.fixture
+def fake(fake_supabase, monkeypatch, tmp_path):
+    fake = fake_supabase
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "_memory", LRUCache(maxsize=8))
+    monkeypatch.setattr(template_cache, "_cache", LRUCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(template_cache, "_generations", {})
+    rendered = []
+    monkeypatch.setattr(render_service, "render", lambda html, block=False, timeout=None: rendered.append(html) or _pdf(1))
+
+    async def render_async(html, timeout=None):
+        rendered.append(html)
+        return _pdf(1)
+
+    monkeypatch.setattr(render_service, "render_async", render_async)
+    # Run the background store inline so the test can look at its result
+    monkeypatch.setattr(wp, "schedule_version_pdf", wp._store_version_pdf_safely)
+    fake.rendered = rendered
+
+    fake.load("proposals", [{"id": "proposal-1", "org_id": ORG, "project_id": "project-1", "name": "Deck", "status": "sent"}])
+    fake.load("proposal_versions", [{"id": "version-1", "proposal_id": "proposal-1", "org_id": ORG, "version_number": 1,
+                                     "content_json": {"sections": []}}])
+    return fake
+
+
+def _store_version_pdf(fake, pdf_bytes):
+    fake.objects[(wp.PDF_BUCKET, VERSION_PATH)] = pdf_bytes
+    fake.load("files", [{"id": "file-1", "org_id": ORG, "storage_path": VERSION_PATH,
+                         "sha256": hashlib.sha256(pdf_bytes).hexdigest()}])
+    fake.tables["proposal_versions"]["version-1"]["pdf_file_id"] = "file-1"
+
+
+def test_store_version_pdf_uploads_and_links_once(fake):
+    file_row = wp.store_version_pdf("version-1")
+
+    pdf_bytes = fake.objects[(wp.PDF_BUCKET, file_row["storage_path"])]
+    assert file_row["storage_path"] == wp.version_pdf_path(ORG, "project-1", "proposal-1", 1, file_row["id"])
+    assert file_row["sha256"] == hashlib.sha256(pdf_bytes).hexdigest() and file_row["size_bytes"] == len(pdf_bytes)
+    assert fake.tables["proposal_versions"]["version-1"]["pdf_file_id"] == file_row["id"]
+
+    # Already linked: no second render or file
+    assert wp.store_version_pdf("version-1") is None
+    assert len(fake.rendered) == 1 and len(fake.rows("files")) == 1
+
+
+def test_pdf_endpoint_serves_the_stored_pdf(fake):
+    _store_version_pdf(fake, _pdf(2))
+    client = TestClient(app)
+
+    response = client.get("/workflow/proposals/proposal-1/pdf")
+    assert response.status_code == 200 and response.content == _pdf(2)
+    assert response.headers["ETag"] == pdf_cache.etag_for(fake.rows("files")[0]["sha256"])
+
+    response = client.get("/workflow/proposals/proposal-1/pdf?redirect=true", follow_redirects=False)
+    assert response.status_code == 307 and VERSION_PATH in response.headers["location"]
+    assert fake.rendered == []
+
+
+def test_pdf_endpoint_persists_a_render_for_versions_without_one(fake):
+    client = TestClient(app)
+    first = client.get("/workflow/proposals/proposal-1/pdf")
+    assert first.status_code == 200 and len(fake.rendered) == 1
+
+    file_row = fake.rows("files")[0]
+    assert fake.tables["proposal_versions"]["version-1"]["pdf_file_id"] == file_row["id"]
+    assert fake.objects[(wp.PDF_BUCKET, file_row["storage_path"])] == first.content
+
+    # The next request streams the stored object
+    second = client.get("/workflow/proposals/proposal-1/pdf")
+    assert second.content == first.content and second.headers["ETag"] == pdf_cache.etag_for(file_row["sha256"])
+    assert len(fake.rendered) == 1
+
+
+def test_version_pdf_render_losing_the_link_race_cleans_up(fake, monkeypatch):
+    _store_version_pdf(fake, _pdf(1))
+    fake.tables["proposal_versions"]["version-1"]["pdf_file_id"] = None
+    upload = pdf.upload_pdf_to_storage
+
+    def upload_then_lose(client, bucket, path, pdf_bytes):
+        result = upload(client, bucket, path, pdf_bytes)
+        # Another render links its PDF while this one is uploading
+        fake.tables["proposal_versions"]["version-1"]["pdf_file_id"] = "file-1"
+        return result
+
+    monkeypatch.setattr(pdf, "upload_pdf_to_storage", upload_then_lose)
+    assert wp.store_version_pdf("version-1", _pdf(2)) is None
+    assert [f["id"] for f in fake.rows("files")] == ["file-1"]
+    # Each render has its own object; the winner's is untouched and the loser's is gone
+    assert list(fake.objects) == [(wp.PDF_BUCKET, VERSION_PATH)]
+    assert fake.objects[(wp.PDF_BUCKET, VERSION_PATH)] == _pdf(1)